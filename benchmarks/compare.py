@@ -0,0 +1,89 @@
+"""Compare two benchmark JSON reports and flag regressions.
+
+Results are matched on their non-numeric fields (e.g. buffer and obs), and each
+numeric metric is compared. Metrics ending in `_per_second` are better when higher,
+all others (latencies, memory, disk) when lower. Exits with status 1 if any metric
+regressed by more than `--threshold`.
+
+Example:
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+
+def _key(result: dict) -> tuple:
+    return tuple(
+        (k, json.dumps(v))
+        for k, v in sorted(result.items())
+        if not isinstance(v, (int, float)) or isinstance(v, bool)
+    )
+
+
+def _metrics(result: dict) -> dict[str, float]:
+    return {
+        k: v
+        for k, v in result.items()
+        if isinstance(v, (int, float)) and not isinstance(v, bool)
+    }
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[dict]:
+    """Returns the relative change of each metric present in both reports.
+
+    Args:
+        baseline: Baseline report, with a list of `results`.
+        candidate: Candidate report, with a list of `results`.
+        threshold: Relative change above which a worse metric is a regression.
+    """
+    baseline_results = {_key(r): _metrics(r) for r in baseline["results"]}
+    rows = []
+    for result in candidate["results"]:
+        key = _key(result)
+        if key not in baseline_results:
+            continue
+        for metric, value in _metrics(result).items():
+            base = baseline_results[key].get(metric)
+            if base is None or base == 0:
+                continue
+            change = (value - base) / abs(base)
+            higher_is_better = metric.endswith("_per_second")
+            worse = -change if higher_is_better else change
+            rows.append(
+                {
+                    "name": " ".join(f"{k}={json.loads(v)}" for k, v in key),
+                    "metric": metric,
+                    "baseline": base,
+                    "candidate": value,
+                    "change": change,
+                    "regression": worse > threshold,
+                }
+            )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline", type=str)
+    parser.add_argument("candidate", type=str)
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:<32} {row['metric']:<36} {row['baseline']:>12.4g} "
+            f"{row['candidate']:>12.4g} {100 * row['change']:>+8.1f}% {flag}"
+        )
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark the import time of robobase and of each of its optional stacks.
+
+Each stack is imported in a fresh interpreter, after the modules every run imports
+(`--base`, by default `robobase.workspace`), so that its time is the startup cost a
+run pays for using it. For each stack, reports:
+- the import time of the base modules and of the stack, in milliseconds.
+- the number of modules the stack adds to `sys.modules`.
+
+Stacks whose dependencies are not installed are skipped. Results are written as
+JSON, which `benchmarks.compare` compares to a baseline.
+
+Example:
+    python -m benchmarks.import_time --output import_time.json
+    python -m benchmarks.import_time --stacks drqv2 dmc wandb
+    python -m benchmarks.compare baseline.json import_time.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+from pathlib import Path
+
+STACKS = {
+    # Methods and reward models, imported through their Hydra `_target_`.
+    "drqv2": ["robobase.method.drqv2"],
+    "sac_lix": ["robobase.method.sac_lix"],
+    "act": ["robobase.method.act"],
+    "diffusion": ["robobase.method.diffusion"],
+    "markovian_reward": ["robobase.reward_method.markovian"],
+    "preference_transformer": ["robobase.reward_method.preference_transformer"],
+    "vit_encoder": ["timm"],
+    # Env factories, see `robobase.workspace.ENV_FACTORIES`.
+    "dmc": ["robobase.envs.dmc"],
+    "rlbench": ["robobase.envs.rlbench"],
+    "bigym": ["robobase.envs.bigym"],
+    "d4rl": ["robobase.envs.d4rl"],
+    "agym": ["robobase.envs.agym"],
+    "humanoidbench": ["robobase.envs.humanoidbench"],
+    "locomujoco": ["robobase.envs.locomujoco"],
+    "isaaclab": ["robobase.envs.isaaclab"],
+    # Feedback backends and loggers.
+    "gemini": ["google.generativeai"],
+    "human_feedback": ["IPython.display"],
+    "wandb": ["wandb"],
+    "tensorboard": ["torch.utils.tensorboard"],
+}
+
+_CHILD = """
+import importlib
+import json
+import sys
+import time
+
+base, stack = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+start = time.perf_counter()
+for name in base:
+    importlib.import_module(name)
+mid = time.perf_counter()
+num_modules = len(sys.modules)
+for name in stack:
+    importlib.import_module(name)
+end = time.perf_counter()
+print(json.dumps({
+    "base_import_ms": 1000 * (mid - start),
+    "import_ms": 1000 * (end - mid),
+    "num_modules": len(sys.modules) - num_modules,
+}))
+"""
+
+
+def _import_time(base: list[str], modules: list[str]) -> dict | None:
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD, json.dumps(base), json.dumps(modules)],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).resolve().parents[1],
+    )
+    if proc.returncode != 0:
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _benchmark(name: str, args) -> dict | None:
+    runs = [_import_time(args.base, STACKS[name]) for _ in range(args.repeats)]
+    if None in runs:
+        return None
+    # The fastest run is the least disturbed by other processes.
+    result = {"stack": name}
+    for metric in runs[0].keys():
+        result[metric] = min(run[metric] for run in runs)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stacks", nargs="+", choices=list(STACKS), default=None)
+    parser.add_argument("--base", nargs="*", default=["robobase.workspace"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    results = []
+    for name in args.stacks or STACKS:
+        result = _benchmark(name, args)
+        if result is None:
+            print(f"Skipping {name}, which failed to import.", file=sys.stderr)
+            continue
+        results.append(result)
+        print(json.dumps(result))
+    report = {
+        "benchmark": "import_time",
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": multiprocessing.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
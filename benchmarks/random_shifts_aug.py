@@ -0,0 +1,65 @@
+"""Benchmark the grid_sample and crop implementations of the shift augmentations.
+
+Example:
+    python -m benchmarks.random_shifts_aug --batch-size 256 --views 2 --device cuda
+"""
+import argparse
+import json
+import time
+
+import torch
+
+from robobase.method.utils import RandomShiftsAug, TimeConsistentRandomShiftsAug
+
+
+def _time(fn, x, repeats, device):
+    fn(x)  # Warm-up
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(x)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    result = {"ms_per_call": 1000 * (time.perf_counter() - start) / repeats}
+    if device.type == "cuda":
+        result["peak_memory_mb"] = torch.cuda.max_memory_allocated() / 2**20
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--views", type=int, default=1)
+    parser.add_argument("--frames", type=int, default=3)
+    parser.add_argument("--image-size", type=int, default=84)
+    parser.add_argument("--pad", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    size = args.image_size
+    images = torch.rand(
+        args.batch_size * args.views, 3 * args.frames, size, size, device=device
+    )
+    videos = torch.rand(
+        args.batch_size * args.views, args.frames, 3, size, size, device=device
+    )
+    results = []
+    for aug_cls, x in [
+        (RandomShiftsAug, images),
+        (TimeConsistentRandomShiftsAug, videos),
+    ]:
+        for mode in ["grid_sample", "crop"]:
+            aug = aug_cls(pad=args.pad, mode=mode)
+            with torch.no_grad():
+                result = _time(aug, x, args.repeats, device)
+            result.update(aug=aug_cls.__name__, mode=mode, shape=list(x.shape))
+            results.append(result)
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
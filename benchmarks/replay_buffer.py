@@ -0,0 +1,302 @@
+"""Benchmark the throughput, memory and disk footprint of the replay buffers.
+
+Covers uniform, sequential and prioritized replay, and the RLHF query and feedback
+buffers, each with state and pixel observations. For each buffer, reports:
+- add throughput, with per-transition `add` and, where supported, `add_episode`.
+- in-process `sample` and DataLoader batches per second, and for the feedback
+  buffer, the load time and batches per second of `FeedbackEpochSampler`.
+- RSS of the DataLoader workers.
+- latency of loading a stored episode, and of its rewards alone, and the disk
+  footprint of the episodes.
+
+Episodes are written with the codec given by `--episode-codec`.
+
+Results are written as JSON, which `benchmarks.compare` compares to a baseline.
+
+Example:
+    python -m benchmarks.replay_buffer --output replay_buffer.json
+    python -m benchmarks.replay_buffer --buffers uniform prioritized --obs state
+    python -m benchmarks.replay_buffer --episode-codec zlib --output zlib.json
+    python -m benchmarks.compare baseline.json replay_buffer.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from gymnasium import spaces
+from torch.utils.data import DataLoader
+
+from robobase.replay_buffer.episode_codec import CODECS, EpisodeCodec
+from robobase.replay_buffer.prioritized_replay_buffer import PrioritizedReplayBuffer
+from robobase.replay_buffer.rlhf.feedback_replay_buffer import FeedbackReplayBuffer
+from robobase.replay_buffer.rlhf.feedback_sampler import FeedbackEpochSampler
+from robobase.replay_buffer.rlhf.query_replay_buffer import QueryReplayBuffer
+from robobase.replay_buffer.uniform_replay_buffer import (
+    UniformReplayBuffer,
+    load_episode,
+)
+
+BUFFERS = ["uniform", "sequential", "prioritized", "query", "feedback"]
+OBSERVATIONS = ["state", "pixel"]
+ACTION_SHAPE = (1, 8)
+
+
+def _rss_mb(pid: int | str = "self") -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        # /proc is only available on Linux.
+        return None
+
+
+def _observation_space(obs: str, frame_stack: int, image_size: int) -> spaces.Dict:
+    elements = {"low_dim_state": spaces.Box(-1, 1, (frame_stack, 24), np.float32)}
+    if obs == "pixel":
+        elements["rgb_front"] = spaces.Box(
+            0, 255, (frame_stack, 3, image_size, image_size), np.uint8
+        )
+    return spaces.Dict(elements)
+
+
+def _frames(rng: np.random.Generator, length: int, image_size: int) -> np.ndarray:
+    # A moving gradient with a little noise, which compresses like rendered frames
+    # rather than like white noise.
+    x = np.arange(image_size)
+    gradient = (x[:, None] + x[None, :]).astype(np.int64)
+    frames = np.stack([np.roll(gradient, t, axis=1) for t in range(length)])
+    frames = frames[:, None] + np.array([0, 40, 80])[None, :, None, None]
+    frames += rng.integers(0, 8, size=frames.shape)
+    return (frames % 256).astype(np.uint8)
+
+
+def _episode(
+    rng: np.random.Generator, observation_space: spaces.Dict, length: int
+) -> dict:
+    observations = {}
+    for name, space in observation_space.items():
+        if name.startswith("rgb"):
+            observations[name] = _frames(rng, length + 1, space.shape[-1])
+        else:
+            observations[name] = rng.uniform(
+                -1, 1, (length + 1,) + space.shape[1:]
+            ).astype(space.dtype)
+    terminals = np.zeros(length, dtype=np.int8)
+    terminals[-1] = 1
+    return {
+        "observations": {k: v[:-1] for k, v in observations.items()},
+        "final_observation": {k: v[-1] for k, v in observations.items()},
+        "actions": rng.uniform(-1, 1, (length,) + ACTION_SHAPE[1:]).astype(np.float32),
+        "rewards": rng.uniform(0, 1, length).astype(np.float32),
+        "terminals": terminals,
+        "truncateds": np.zeros(length, dtype=np.int8),
+    }
+
+
+def _make_buffer(
+    name: str, observation_space, args, save_dir: Path, num_workers: int = None
+):
+    kwargs = dict(
+        batch_size=args.batch_size,
+        replay_capacity=args.num_episodes * args.episode_length,
+        action_shape=ACTION_SHAPE,
+        observation_elements=observation_space,
+        save_dir=save_dir,
+        num_workers=args.num_workers if num_workers is None else num_workers,
+        episode_codec=EpisodeCodec(args.episode_codec),
+    )
+    if name == "uniform":
+        return UniformReplayBuffer(**kwargs)
+    if name == "sequential":
+        return UniformReplayBuffer(
+            sequential=True, transition_seq_len=args.seq_len, **kwargs
+        )
+    if name == "prioritized":
+        return PrioritizedReplayBuffer(**kwargs)
+    if name == "query":
+        return QueryReplayBuffer(
+            sequential=True, transition_seq_len=args.seq_len, **kwargs
+        )
+    if name == "feedback":
+        return FeedbackReplayBuffer(transition_seq_len=args.seq_len, **kwargs)
+    raise ValueError(f"Unknown buffer: {name}.")
+
+
+def _add(buffer, name: str, episode: dict, use_add_episode: bool):
+    if name == "feedback":
+        # Feedback is added as pairs of segments, taken from the episode here.
+        segment = {
+            k: v[: buffer._transition_seq_len]
+            for k, v in dict(episode["observations"], action=episode["actions"]).items()
+        }
+        for _ in range(len(episode["actions"]) // buffer._transition_seq_len):
+            buffer.add_feedback(segment, segment, np.zeros(1, dtype=np.int64))
+    elif use_add_episode:
+        buffer.add_episode(
+            episode["observations"],
+            episode["actions"],
+            episode["rewards"],
+            episode["terminals"],
+            episode["truncateds"],
+            episode["final_observation"],
+        )
+    else:
+        extra_args = ()
+        for t in range(len(episode["actions"])):
+            if name == "query":
+                extra_args = (t,)
+            buffer.add(
+                {k: v[t] for k, v in episode["observations"].items()},
+                episode["actions"][t],
+                episode["rewards"][t],
+                episode["terminals"][t],
+                episode["truncateds"][t],
+                *extra_args,
+            )
+        buffer.add_final(episode["final_observation"])
+
+
+def _add_throughput(name, observation_space, args, episode, use_add_episode):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        buffer = _make_buffer(name, observation_space, args, Path(tmpdir))
+        start = time.perf_counter()
+        for _ in range(args.num_episodes):
+            _add(buffer, name, episode, use_add_episode)
+        elapsed = time.perf_counter() - start
+        buffer.shutdown()
+    return args.num_episodes * args.episode_length / elapsed
+
+
+def _batches_per_second(batches, num_batches: int) -> float:
+    next(batches)  # Warm-up
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        next(batches)
+    return num_batches / (time.perf_counter() - start)
+
+
+def _benchmark(name: str, obs: str, args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    observation_space = _observation_space(obs, args.frame_stack, args.image_size)
+    episode = _episode(rng, observation_space, args.episode_length)
+    result = {"buffer": name, "obs": obs}
+    result["add_transitions_per_second"] = _add_throughput(
+        name, observation_space, args, episode, use_add_episode=False
+    )
+    if name in ["uniform", "sequential", "query"]:
+        result["add_episode_transitions_per_second"] = _add_throughput(
+            name, observation_space, args, episode, use_add_episode=True
+        )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Buffers sharded across DataLoader workers only sample their own shard, so
+        # in-process sampling is measured on a buffer without workers.
+        save_dir = Path(tmpdir) / "sample"
+        buffer = _make_buffer(name, observation_space, args, save_dir, num_workers=0)
+        for _ in range(args.num_episodes):
+            _add(buffer, name, episode, use_add_episode=False)
+
+        episode_files = sorted(save_dir.glob("*.npz"))
+        start = time.perf_counter()
+        for fn in episode_files:
+            load_episode(fn)
+        result["episode_load_ms"] = (
+            1000 * (time.perf_counter() - start) / len(episode_files)
+        )
+        start = time.perf_counter()
+        for fn in episode_files:
+            load_episode(fn, keys=["reward"])
+        result["reward_load_ms"] = (
+            1000 * (time.perf_counter() - start) / len(episode_files)
+        )
+        result["disk_mb"] = sum(fn.stat().st_size for fn in episode_files) / 2**20
+
+        def samples():
+            while True:
+                yield buffer.sample()
+
+        result["sample_batches_per_second"] = _batches_per_second(
+            samples(), args.num_batches
+        )
+        if name == "feedback":
+            sampler = FeedbackEpochSampler(args.batch_size, seed=args.seed)
+            start = time.perf_counter()
+            sampler.refresh(buffer)
+            result["epoch_sampler_refresh_ms"] = 1000 * (time.perf_counter() - start)
+            result["epoch_sampler_batches_per_second"] = _batches_per_second(
+                sampler, args.num_batches
+            )
+        result["main_rss_mb"] = _rss_mb()
+        buffer.shutdown()
+
+        buffer = _make_buffer(
+            name, observation_space, args, Path(tmpdir) / "dataloader"
+        )
+        for _ in range(args.num_episodes):
+            _add(buffer, name, episode, use_add_episode=False)
+        batches = iter(
+            DataLoader(
+                buffer, batch_size=buffer.batch_size, num_workers=args.num_workers
+            )
+        )
+        result["dataloader_batches_per_second"] = _batches_per_second(
+            batches, args.num_batches
+        )
+        worker_rss = [_rss_mb(p.pid) for p in multiprocessing.active_children()]
+        if worker_rss and None not in worker_rss:
+            result["worker_rss_mb"] = max(worker_rss)
+        del batches
+        buffer.shutdown()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--buffers", nargs="+", choices=BUFFERS, default=BUFFERS)
+    parser.add_argument("--obs", nargs="+", choices=OBSERVATIONS, default=OBSERVATIONS)
+    parser.add_argument("--num-episodes", type=int, default=20)
+    parser.add_argument("--episode-length", type=int, default=100)
+    parser.add_argument("--seq-len", type=int, default=50)
+    parser.add_argument("--frame-stack", type=int, default=3)
+    parser.add_argument("--image-size", type=int, default=84)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--num-batches", type=int, default=20)
+    parser.add_argument("--num-workers", type=int, default=2)
+    parser.add_argument("--episode-codec", choices=CODECS, default="npz")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    results = []
+    for name in args.buffers:
+        for obs in args.obs:
+            result = _benchmark(name, obs, args)
+            results.append(result)
+            print(json.dumps(result))
+    report = {
+        "benchmark": "replay_buffer",
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": multiprocessing.cpu_count(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
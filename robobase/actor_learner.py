@@ -0,0 +1,155 @@
+import collections
+import contextlib
+import threading
+from typing import Any, Callable
+
+
+class Actor:
+    """Runs environment steps on a background thread, concurrently with the learner.
+
+    The actor calls `step_fn(step)` for consecutive steps and hands the results over
+    to the learner, which consumes them one by one with `next`.
+
+    Until the learner starts updating, at most `tolerance` steps wait to be consumed.
+    Once it has started, the actor and learner are rate limited by the ratio of
+    updates to env steps, like the samples per insert of Reverb's
+    `SampleToInsertRatio`. The learner calls `await_update` before and `updated`
+    after every update. The actor blocks while its steps are more than `tolerance`
+    steps ahead of the learner's updates at `updates_per_step`, and the learner
+    blocks while its updates are more than `tolerance` steps ahead of the actor's
+    steps. The actor never blocks while the learner waits for it, so the two cannot
+    deadlock.
+    """
+
+    def __init__(
+        self,
+        step_fn: Callable[[int], Any],
+        start_step: int = 0,
+        updates_per_step: float = 1.0,
+        tolerance: float = 1.0,
+    ):
+        """Init.
+
+        Args:
+            step_fn: Performs the env step with the given index and returns the
+                result handed over to the learner.
+            start_step: Index of the first step.
+            updates_per_step: Number of updates the learner performs per env step.
+            tolerance: Maximum number of env steps the actor or learner may run
+                ahead of the ratio of updates to env steps.
+        """
+        if updates_per_step <= 0:
+            raise ValueError("updates_per_step must be > 0.")
+        if tolerance <= 0:
+            raise ValueError("tolerance must be > 0.")
+        self._step_fn = step_fn
+        self._step = start_step
+        self._updates_per_step = updates_per_step
+        self._tolerance = tolerance
+        self._cond = threading.Condition()
+        self._results = collections.deque()
+        # Env steps and updates since the learner started updating.
+        self._num_steps = 0
+        self._num_updates = 0
+        self._updating = False
+        self._learner_waiting = False
+        self._failed = False
+        self._pause_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop, name="robobase-actor", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def _lead(self) -> float:
+        """Number of env steps the actor is ahead of the learner's updates."""
+        return self._num_steps - self._num_updates / self._updates_per_step
+
+    def _can_step(self) -> bool:
+        if self._stop.is_set() or self._learner_waiting:
+            return True
+        if not self._updating:
+            # Until then, the steps waiting to be consumed are limited instead.
+            return len(self._results) + 1 <= self._tolerance
+        return self._lead() + 1 <= self._tolerance
+
+    def _can_update(self) -> bool:
+        return (
+            self._stop.is_set()
+            or self._failed
+            or self._lead() - 1 / self._updates_per_step >= -self._tolerance
+        )
+
+    def _learner_wait_for(self, predicate: Callable[[], bool]):
+        if not predicate():
+            self._learner_waiting = True
+            self._cond.notify_all()
+            self._cond.wait_for(predicate)
+            self._learner_waiting = False
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(self._can_step)
+            with self._pause_lock:
+                if self._stop.is_set():
+                    return
+                try:
+                    result = self._step_fn(self._step)
+                except Exception as e:
+                    result = e
+            with self._cond:
+                self._results.append(result)
+                if isinstance(result, Exception):
+                    self._failed = True
+                elif self._updating:
+                    self._num_steps += 1
+                self._cond.notify_all()
+            if self._failed:
+                return
+            self._step += 1
+
+    def next(self) -> Any:
+        """Returns the result of the next step, waiting for it if needed."""
+        with self._cond:
+            self._learner_wait_for(lambda: len(self._results) > 0)
+            result = self._results.popleft()
+            self._cond.notify_all()
+        if isinstance(result, Exception):
+            raise RuntimeError("Actor failed while stepping environments.") from (
+                result
+            )
+        return result
+
+    def await_update(self):
+        """Waits until the ratio of updates to env steps allows another update."""
+        with self._cond:
+            if not self._updating:
+                self._updating = True
+                self._cond.notify_all()
+            self._learner_wait_for(self._can_update)
+
+    def updated(self):
+        """Records an update of the learner."""
+        with self._cond:
+            self._num_updates += 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Blocks the actor, once its current step has finished, within the context.
+
+        Use this around anything that must not run concurrently with env steps
+        adding episodes to replay, e.g. relabelling the replay buffer.
+        """
+        with self._pause_lock:
+            yield
+
+    def close(self):
+        with self._cond:
+            self._stop.set()
+            # Wake up the actor in case it waits for the learner.
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,91 @@
+import contextlib
+from typing import Iterable, Optional
+
+import torch
+import torch.nn as nn
+
+DTYPES = {"float16": torch.float16, "bfloat16": torch.bfloat16}
+
+
+class MixedPrecision:
+    """Mixed precision policy of the updates of a method or reward model.
+
+    Forward passes and losses run under `autocast` in `dtype`, while parameters,
+    optimizer states and target networks stay in float32, so soft updates and
+    optimizer steps are applied to float32 master weights. With float16, losses
+    are scaled by a `GradScaler` to keep small gradients from underflowing.
+    float16 autocast is not supported on CPU, where bfloat16 is used instead.
+
+    With `dtype=None`, the policy is a no-op and updates run in float32.
+
+    The update of a loss is then:
+        with amp.autocast():
+            loss = ...
+        opt.zero_grad()
+        amp.backward(loss)
+        amp.clip_grad_norm_(opt, params, max_norm)
+        amp.step(opt)
+        amp.update()
+    """
+
+    def __init__(self, device: torch.device, dtype: Optional[str] = None):
+        """Init.
+
+        Args:
+            device: Device the updates run on.
+            dtype: `float16` or `bfloat16`, or None to disable mixed precision.
+        """
+        if dtype is not None and dtype not in DTYPES:
+            raise ValueError(
+                f"Unknown mixed precision dtype: {dtype}. "
+                f"Expected one of {list(DTYPES)}."
+            )
+        self._device_type = torch.device(device).type
+        if dtype is not None and self._device_type not in ["cuda", "cpu"]:
+            raise ValueError(
+                f"Mixed precision is not supported on {self._device_type} devices."
+            )
+        if dtype == "float16" and self._device_type == "cpu":
+            dtype = "bfloat16"
+        self.enabled = dtype is not None
+        self.dtype = DTYPES[dtype] if self.enabled else torch.float32
+        self._scaler = torch.amp.GradScaler(
+            self._device_type, enabled=self.dtype == torch.float16
+        )
+        self._stepped = False
+
+    def autocast(self) -> contextlib.AbstractContextManager:
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return torch.autocast(self._device_type, dtype=self.dtype)
+
+    def backward(self, loss: torch.Tensor):
+        self._scaler.scale(loss).backward()
+
+    def clip_grad_norm_(
+        self,
+        optimizer: torch.optim.Optimizer,
+        parameters: Iterable[nn.Parameter],
+        max_norm: float,
+    ) -> torch.Tensor:
+        """Unscales the gradients of an optimizer, then clips `parameters`."""
+        self._scaler.unscale_(optimizer)
+        return nn.utils.clip_grad_norm_(parameters, max_norm)
+
+    def step(self, optimizer: torch.optim.Optimizer):
+        """Steps an optimizer, skipping the step if its gradients overflowed."""
+        if self._scaler.is_enabled() and not any(
+            p.grad is not None
+            for group in optimizer.param_groups
+            for p in group["params"]
+        ):
+            # The scaler refuses to step optimizers without gradients.
+            return
+        self._scaler.step(optimizer)
+        self._stepped = True
+
+    def update(self):
+        """Updates the loss scale, after the optimizers of a loss have stepped."""
+        if self._stepped:
+            self._scaler.update()
+            self._stepped = False
@@ -0,0 +1,154 @@
+import logging
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+from typing import Any
+
+import torch
+from torch import nn
+
+
+def to_cpu(obj: Any) -> Any:
+    """Recursively copy all tensors in a (nested) state dict to the CPU.
+
+    Containers are rebuilt, so the result does not alias any tensor or dict that
+    the training loop may keep mutating after this call returns.
+    """
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        copied = obj.copy()
+        for k, v in copied.items():
+            copied[k] = to_cpu(v)
+        if hasattr(obj, "_metadata"):
+            # Module state dicts carry version information used when loading.
+            copied._metadata = obj._metadata
+        return copied
+    if type(obj) in (list, tuple):
+        return type(obj)(to_cpu(v) for v in obj)
+    return obj
+
+
+def optimizer_state_dicts(module: nn.Module) -> dict[str, dict]:
+    """Collect the state dicts of all optimizers held as attributes of a module.
+
+    Methods keep their optimizers as plain attributes (e.g. `actor_opt`,
+    `critic_opt`), so they are not part of `module.state_dict()`.
+    """
+    return {
+        name: opt.state_dict()
+        for name, opt in vars(module).items()
+        if isinstance(opt, torch.optim.Optimizer)
+    }
+
+
+def load_optimizer_state_dicts(module: nn.Module, state_dicts: dict[str, dict]):
+    for name, state_dict in state_dicts.items():
+        opt = getattr(module, name, None)
+        if not isinstance(opt, torch.optim.Optimizer):
+            logging.warning(f"Snapshot has state for unknown optimizer '{name}'.")
+            continue
+        opt.load_state_dict(state_dict)
+
+
+def atomic_save(payload: dict, path: Path):
+    """Save with `torch.save` to a temporary file, then rename it to `path`.
+
+    A reader (or a resumed job) therefore never sees a partially written file.
+    """
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with tmp_path.open("wb") as f:
+        torch.save(payload, f)
+    os.replace(tmp_path, path)
+
+
+def atomic_link(src: Path, dst: Path):
+    """Atomically point `dst` at the contents of `src`.
+
+    A hard link is used where the file system supports it, so no data is copied.
+    """
+    tmp_path = dst.with_name(f".{dst.name}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+class Checkpointer:
+    """Writes snapshots to disk, optionally on a background thread.
+
+    `save` copies the payload to the CPU on the calling thread, which is cheap
+    compared to serialisation, and hands it over to a writer thread. At most
+    `max_pending` snapshots wait to be written; further calls to `save` block until
+    the writer catches up, which bounds host memory usage.
+    """
+
+    def __init__(self, asynchronous: bool = True, max_pending: int = 1):
+        self._queue = None
+        self._worker = None
+        self._worker_error = None
+        if asynchronous:
+            self._queue = queue.Queue(maxsize=max_pending)
+            self._worker = threading.Thread(
+                target=self._worker_loop, name="robobase-checkpointer", daemon=True
+            )
+            self._worker.start()
+
+    def _write(self, payload: dict, path: Path, latest_path: Path = None):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_save(payload, path)
+        if latest_path is not None:
+            atomic_link(path, latest_path)
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logging.exception("Failed to write snapshot.")
+                self._worker_error = e
+            finally:
+                self._queue.task_done()
+
+    def save(self, payload: dict, path: Path, latest_path: Path = None):
+        """Save a snapshot to `path` and make `latest_path` refer to it.
+
+        Args:
+            payload: The snapshot. Tensors may live on any device.
+            path: File to write the snapshot to.
+            latest_path: If given, updated to point at the new snapshot once it has
+                been fully written.
+        """
+        payload = to_cpu(payload)
+        if self._queue is None:
+            self._write(payload, path, latest_path)
+            return
+        if self._worker_error is not None:
+            raise RuntimeError("Background snapshot writing failed.") from (
+                self._worker_error
+            )
+        self._queue.put((payload, path, latest_path))
+
+    def wait(self):
+        """Block until all pending snapshots have been written."""
+        if self._queue is not None:
+            self._queue.join()
+        if self._worker_error is not None:
+            raise RuntimeError("Background snapshot writing failed.") from (
+                self._worker_error
+            )
+
+    def close(self):
+        if self._worker is not None:
+            self._queue.join()
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+            self._queue = None
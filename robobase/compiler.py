@@ -0,0 +1,168 @@
+import copy
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+import torch
+import torch.nn as nn
+
+
+def _describe(value: Any) -> Any:
+    if isinstance(value, torch.Tensor):
+        return tuple(value.shape), value.dtype, value.device
+    if isinstance(value, (list, tuple)):
+        return tuple(_describe(v) for v in value)
+    if isinstance(value, dict):
+        return tuple((k, _describe(v)) for k, v in value.items())
+    if isinstance(value, float):
+        # Floats, e.g. exploration stds, are inputs of the graph rather than
+        # constants it is specialized on.
+        return float
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    return type(value)
+
+
+class _CompiledForward:
+    """Forward of a module, compiled for each input signature it is called with.
+
+    The signature of a call is the shape, dtype and device of its tensor arguments,
+    its other arguments, and the train, grad and autocast modes of the call.
+    """
+
+    def __init__(self, compiler: "ModuleCompiler", name: str, eager: Callable):
+        self._compiler = compiler
+        self._name = name
+        self._eager = eager
+        self._compiled = None
+        self._signatures = set()
+        self._fallback = False
+        self._exhausted = False
+
+    def __deepcopy__(self, memo):
+        # Copies of the module, e.g. the agent of the actor thread, compile their
+        # own forward.
+        return _CompiledForward(
+            self._compiler, self._name, copy.deepcopy(self._eager, memo)
+        )
+
+    def _signature(self, args: tuple, kwargs: dict) -> tuple:
+        return (
+            self._eager.__self__.training,
+            torch.is_grad_enabled(),
+            torch.is_autocast_enabled("cuda"),
+            torch.is_autocast_enabled("cpu"),
+            _describe(args),
+            _describe(kwargs),
+        )
+
+    def _fall_back(self, reason: str):
+        logging.warning(f"Running {self._name} eagerly: {reason}")
+        self._fallback = True
+        self._compiled = None
+        self._compiler._record_fallback()
+
+    def _exhaust(self):
+        logging.warning(
+            f"{self._name} was called with more than "
+            f"{self._compiler.max_signatures} input signatures. New signatures run "
+            "eagerly."
+        )
+        self._exhausted = True
+        self._compiler._record_fallback()
+
+    def __call__(self, *args, **kwargs):
+        if self._fallback:
+            return self._eager(*args, **kwargs)
+        signature = self._signature(args, kwargs)
+        if signature in self._signatures:
+            return self._compiled(*args, **kwargs)
+        if len(self._signatures) >= self._compiler.max_signatures:
+            # Signatures that change on every call, e.g. the lengths of relabelled
+            # episodes, would recompile on every call.
+            if not self._exhausted:
+                self._exhaust()
+            return self._eager(*args, **kwargs)
+        if self._compiled is None:
+            self._compiled = torch.compile(
+                self._eager,
+                mode=self._compiler.mode,
+                fullgraph=self._compiler.fullgraph,
+                dynamic=False,
+            )
+        # The first call with a signature compiles it.
+        start = time.perf_counter()
+        try:
+            output = self._compiled(*args, **kwargs)
+        except Exception as e:
+            # Graph breaks with `fullgraph` and backend errors surface here. Errors
+            # of the module itself are raised again by its eager forward.
+            self._fall_back(f"{type(e).__name__}: {e}")
+            return self._eager(*args, **kwargs)
+        self._compiler._record_compile(time.perf_counter() - start)
+        self._signatures.add(signature)
+        return output
+
+
+class ModuleCompiler:
+    """Compiles the forward of modules with `torch.compile`, for static shapes.
+
+    Each module is compiled for each input signature it is called with, e.g. the
+    batch of train envs when acting and the batch size when updating, on the first
+    call with that signature. The module falls back to running eagerly if it fails
+    to compile, e.g. on a graph break with `fullgraph`. Once a module has been
+    compiled for `max_signatures` signatures, calls with new signatures run eagerly
+    rather than recompiling it on every call.
+
+    Modules are compiled in place, so their parameters and state dicts are unchanged.
+    """
+
+    def __init__(
+        self, mode: str = "default", fullgraph: bool = True, max_signatures: int = 8
+    ):
+        """Init.
+
+        Args:
+            mode: `torch.compile` mode, e.g. `reduce-overhead` to use CUDA graphs.
+            fullgraph: If true, modules with graph breaks run eagerly instead of
+                being split into several graphs.
+            max_signatures: Max. number of input signatures a module is compiled for.
+        """
+        self.mode = mode
+        self.fullgraph = fullgraph
+        self.max_signatures = max_signatures
+        self._lock = threading.Lock()
+        self._compile_time = 0.0
+        self._num_compiled = 0
+        self._num_fallbacks = 0
+
+    def compile(self, module: nn.Module, name: str):
+        """Compiles the forward of `module` in place.
+
+        Args:
+            module: Module to compile. Modules already compiled are left unchanged.
+            name: Name of the module in logs.
+        """
+        if hasattr(module, "_orig_mod") or isinstance(module.forward, _CompiledForward):
+            return
+        module.forward = _CompiledForward(self, name, module.forward)
+
+    def _record_compile(self, duration: float):
+        with self._lock:
+            self._compile_time += duration
+            self._num_compiled += 1
+
+    def _record_fallback(self):
+        with self._lock:
+            self._num_fallbacks += 1
+
+    def metrics(self) -> dict[str, float]:
+        """Returns the total compile time, the number of compiled signatures, and
+        the number of modules running eagerly, or eagerly for new signatures."""
+        with self._lock:
+            return {
+                "compile_time": self._compile_time,
+                "compiled_signatures": self._num_compiled,
+                "eager_fallbacks": self._num_fallbacks,
+            }
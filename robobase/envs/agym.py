@@ -9,7 +9,7 @@ from omegaconf import DictConfig
 
 import assistive_gym  # noqa
 
-from robobase.envs.env import EnvFactory
+from robobase.envs.env import EnvFactory, make_vector_env
 from robobase.envs.wrappers import (
     OnehotTime,
     FrameStack,
@@ -52,7 +52,13 @@ class AGym(gym.Env):
         reward_mode: str = "dense",
         reward_term_type: str = "all",
         initial_terms: list[float] = [],
+        query_render: str = "step",
     ):
+        if query_render != "step":
+            raise ValueError(
+                "AGym only supports query_render='step', as pybullet states can't "
+                "be restored in other processes to re-render queries."
+            )
         self._task_name = task_name
         self._action_repeat = action_repeat
         self._viewer = None
@@ -227,21 +233,28 @@ class AGym(gym.Env):
 
 
 class AGymEnvFactory(EnvFactory):
-    def _wrap_env(self, env, cfg):
-        env = RescaleFromTanh(env)
+    def _wrap_env(self, env, cfg, vectorized: bool = False):
+        # Stateless and batchable wrappers are applied once on the vector env of
+        # train envs, see `_wrap_vector_env`.
+        if not vectorized:
+            env = RescaleFromTanh(env)
         env = TimeLimit(env, cfg.env.episode_length)
         if cfg.use_onehot_time_and_no_bootstrap:
             env = OnehotTime(
                 env, cfg.env.episode_length // cfg.action_repeat
             )  # Time limits are handles by DMC
         env = ActionSequence(env, cfg.action_sequence)
-        env = FrameStack(env, cfg.frame_stack)
+        if not vectorized:
+            env = FrameStack(env, cfg.frame_stack)
         return env
 
+    def _wrap_vector_env(self, envs, cfg):
+        envs = RescaleFromTanh(envs)
+        envs = FrameStack(envs, cfg.frame_stack)
+        return envs
+
     def make_train_env(self, cfg: DictConfig) -> gym.vector.VectorEnv:
-        vec_env_class = gym.vector.AsyncVectorEnv
-        kwargs = dict(context=None)
-        return vec_env_class(
+        envs = make_vector_env(
             [
                 lambda: self._wrap_env(
                     AGym(
@@ -253,13 +266,16 @@ class AGymEnvFactory(EnvFactory):
                         reward_mode=cfg.env.reward_mode,
                         reward_term_type=cfg.env.reward_term_type,
                         initial_terms=cfg.env.initial_terms,
+                        query_render=cfg.rlhf.query_render,
                     ),
                     cfg,
+                    vectorized=True,
                 )
                 for _ in range(cfg.num_train_envs)
             ],
-            **kwargs,
+            backend=cfg.env.vector_env,
         )
+        return self._wrap_vector_env(envs, cfg)
 
     def make_eval_env(self, cfg: DictConfig) -> gym.Env:
         return self._wrap_env(
@@ -272,6 +288,7 @@ class AGymEnvFactory(EnvFactory):
                 reward_mode=cfg.env.reward_mode,
                 reward_term_type=cfg.env.reward_term_type,
                 initial_terms=cfg.env.initial_terms,
+                query_render=cfg.rlhf.query_render,
             ),
             cfg,
         )
@@ -7,7 +7,7 @@ from robobase.utils import (
 from robobase.envs.utils.bigym_utils import TASK_MAP, TASK_DESCRIPTION
 import gymnasium as gym
 from gymnasium.wrappers import TimeLimit
-from robobase.envs.env import EnvFactory
+from robobase.envs.env import EnvFactory, make_vector_env
 from robobase.envs.wrappers import (
     RescaleFromTanhWithMinMax,
     RescaleFromTanh,
@@ -168,8 +168,7 @@ class BiGymEnvFactory(EnvFactory):
         )
 
     def make_train_env(self, cfg: DictConfig) -> gym.vector.VectorEnv:
-        vec_env_class = gym.vector.SyncVectorEnv
-        return vec_env_class(
+        return make_vector_env(
             [
                 lambda: self._wrap_env(
                     self._create_env(cfg),
@@ -179,6 +178,8 @@ class BiGymEnvFactory(EnvFactory):
                 )
                 for _ in range(cfg.num_train_envs)
             ],
+            backend=cfg.env.vector_env,
+            context="spawn",
         )
 
     def make_eval_env(self, cfg: DictConfig) -> gym.Env:
@@ -23,7 +23,7 @@ from robobase.envs.wrappers import (
     AppendDemoInfo,
 )
 from robobase.utils import add_demo_to_replay_buffer
-from robobase.envs.env import EnvFactory, DemoEnv
+from robobase.envs.env import EnvFactory, DemoEnv, make_vector_env
 
 SUPPORTED_ENVS = ["ant", "antmaze", "halfcheetah", "hopper", "walker2d"]
 
@@ -298,11 +298,12 @@ class D4RLEnvFactory(EnvFactory):
 
     def make_train_env(self, cfg: DictConfig) -> gym.vector.VectorEnv:
         """See base class for documentation."""
-        return gym.vector.AsyncVectorEnv(
+        return make_vector_env(
             [
                 lambda: self._wrap_env(_make_env(cfg), cfg)
                 for _ in range(cfg.num_train_envs)
-            ]
+            ],
+            backend=cfg.env.vector_env,
         )
 
     def make_eval_env(self, cfg: DictConfig) -> gym.Env:
@@ -11,7 +11,7 @@ from dm_env import specs
 from gymnasium.wrappers import TimeLimit
 from omegaconf import DictConfig
 
-from robobase.envs.env import EnvFactory
+from robobase.envs.env import EnvFactory, make_vector_env
 from robobase.envs.wrappers import (
     OnehotTime,
     FrameStack,
@@ -73,6 +73,7 @@ class DMC(gym.Env):
         reward_mode: str = "dense",
         reward_term_type: str = "all",
         initial_terms: list[float] = [],
+        query_render: str = "step",
     ):
         domain, task = task_name.split("_", 1)
         self._from_pixels = from_pixels
@@ -142,7 +143,16 @@ class DMC(gym.Env):
 
         # Add video observation spaces for RLHF if enabled
         self._use_rlhf = use_rlhf
-        if use_rlhf:
+        self._query_render = query_render
+        if use_rlhf and query_render == "state":
+            # Store simulator states and render only the queries sent to a labeler.
+            _obs_space["query_state"] = spaces.Box(
+                low=-np.inf,
+                high=np.inf,
+                shape=self._dmc_env.physics.get_state().shape,
+                dtype=np.float64,
+            )
+        elif use_rlhf:
             for key in self._query_keys:
                 _obs_space[f"query_pixels_{key}"] = spaces.Box(
                     low=0, high=255, shape=(height, width, 3), dtype=np.uint8
@@ -164,10 +174,21 @@ class DMC(gym.Env):
         else:
             ret_obs["low_dim_state"] = self._flatten_obs(obs)
 
-        if self._use_rlhf:
+        if self._use_rlhf and self._query_render == "state":
+            ret_obs["query_state"] = self.get_sim_state()
+        elif self._use_rlhf:
             ret_obs[f"query_pixels_{self._query_keys[0]}"] = self.render().copy()
         return ret_obs
 
+    def get_sim_state(self) -> np.ndarray:
+        return self._dmc_env.physics.get_state().copy()
+
+    def render_sim_state(self, state: np.ndarray) -> dict[str, np.ndarray]:
+        """Renders the query views of the given simulator state."""
+        with self._dmc_env.physics.reset_context():
+            self._dmc_env.physics.set_state(state)
+        return {key: self.render().copy() for key in self._query_keys}
+
     def _flatten_obs(self, observation):
         obs_pieces = []
         for v in observation.values():
@@ -239,8 +260,11 @@ class DMC(gym.Env):
 
 
 class DMCEnvFactory(EnvFactory):
-    def _wrap_env(self, env, cfg):
-        env = RescaleFromTanh(env)
+    def _wrap_env(self, env, cfg, vectorized: bool = False):
+        # Stateless and batchable wrappers are applied once on the vector env of
+        # train envs, see `_wrap_vector_env`.
+        if not vectorized:
+            env = RescaleFromTanh(env)
         if cfg.env.episode_length != 1000:
             # Used in unit tests.
             env = TimeLimit(env, cfg.env.episode_length)
@@ -249,18 +273,22 @@ class DMCEnvFactory(EnvFactory):
                 env, cfg.env.episode_length // cfg.action_repeat
             )  # Time limits are handles by DMC
         env = ActionSequence(env, cfg.action_sequence)
-        env = FrameStack(env, cfg.frame_stack)
+        if not vectorized:
+            env = FrameStack(env, cfg.frame_stack)
         return env
 
+    def _wrap_vector_env(self, envs, cfg):
+        envs = RescaleFromTanh(envs)
+        envs = FrameStack(envs, cfg.frame_stack)
+        return envs
+
     def make_train_env(self, cfg: DictConfig) -> gym.vector.VectorEnv:
-        vec_env_class = gym.vector.AsyncVectorEnv
-        kwargs = dict(context="spawn")
+        backend = cfg.env.vector_env
         if UNIT_TEST:
-            vec_env_class = gym.vector.SyncVectorEnv
-            kwargs = dict()
+            backend = "sync"
         else:
             assert cfg.env.episode_length == 1000, "DMC episode length must be 1000."
-        return vec_env_class(
+        envs = make_vector_env(
             [
                 lambda: self._wrap_env(
                     DMC(
@@ -274,13 +302,17 @@ class DMCEnvFactory(EnvFactory):
                         cfg.env.reward_mode,
                         cfg.env.reward_term_type,
                         cfg.env.initial_terms,
+                        cfg.rlhf.query_render,
                     ),
                     cfg,
+                    vectorized=True,
                 )
                 for _ in range(cfg.num_train_envs)
             ],
-            **kwargs,
+            backend=backend,
+            context="spawn",
         )
+        return self._wrap_vector_env(envs, cfg)
 
     def make_eval_env(self, cfg: DictConfig) -> gym.Env:
         return self._wrap_env(
@@ -295,6 +327,7 @@ class DMCEnvFactory(EnvFactory):
                 cfg.env.reward_mode,
                 cfg.env.reward_term_type,
                 cfg.env.initial_terms,
+                cfg.rlhf.query_render,
             ),
             cfg,
         )
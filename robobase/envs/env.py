@@ -1,7 +1,38 @@
-from typing import List
+from typing import Callable, List, Optional
 import gymnasium as gym
 from omegaconf import DictConfig
 
+VECTOR_ENV_BACKENDS = ["sync", "async"]
+
+
+def make_vector_env(
+    env_fns: List[Callable[[], gym.Env]],
+    backend: str = "async",
+    context: Optional[str] = None,
+) -> gym.vector.VectorEnv:
+    """Create a vector env from a list of env constructors.
+
+    Args:
+        env_fns: Functions that each create one (wrapped) sub-env.
+        backend: "sync" steps all sub-envs one after another in the main process.
+            "async" steps every sub-env in its own worker process. The workers write
+            their observations into shared memory buffers laid out after the
+            observation space, so observations are not pickled through a pipe.
+            Autoreset and `final_observation`/`final_info` are handled as for
+            `gym.vector.SyncVectorEnv`.
+        context: Multiprocessing start method for the "async" backend.
+
+    Returns:
+        The vector env.
+    """
+    if backend == "sync":
+        return gym.vector.SyncVectorEnv(env_fns)
+    if backend == "async":
+        return gym.vector.AsyncVectorEnv(env_fns, shared_memory=True, context=context)
+    raise ValueError(
+        f"Unknown vector env backend '{backend}'. Choose from {VECTOR_ENV_BACKENDS}."
+    )
+
 
 class Demo(list):
     def __init__(self, transition_tuples: List[tuple]):
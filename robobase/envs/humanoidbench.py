@@ -8,7 +8,7 @@ from omegaconf import DictConfig
 
 import humanoid_bench  # noqa
 
-from robobase.envs.env import EnvFactory
+from robobase.envs.env import EnvFactory, make_vector_env
 from robobase.envs.wrappers import (
     OnehotTime,
     FrameStack,
@@ -44,6 +44,7 @@ class HumanoidBench(gym.Env):
         reward_term_type: str = "all",
         initial_terms: list[float] = [],
         blocked_hands: bool = False,
+        query_render: str = "step",
     ):
         self._task_name = task_name
         self._from_pixels = from_pixels
@@ -93,7 +94,16 @@ class HumanoidBench(gym.Env):
             )
 
         self._use_rlhf = use_rlhf
-        if use_rlhf:
+        self._query_render = query_render
+        if use_rlhf and query_render == "state":
+            # Store simulator states and render only the queries sent to a labeler.
+            _obs_space["query_state"] = spaces.Box(
+                low=-np.inf,
+                high=np.inf,
+                shape=self.get_sim_state().shape,
+                dtype=np.float64,
+            )
+        elif use_rlhf:
             for key in self._query_keys:
                 _obs_space[f"query_pixels_{key}"] = spaces.Box(
                     low=0,
@@ -141,10 +151,22 @@ class HumanoidBench(gym.Env):
         else:
             ret_obs["low_dim_state"] = observation.astype(np.float32)
 
-        if self._use_rlhf:
+        if self._use_rlhf and self._query_render == "state":
+            ret_obs["query_state"] = self.get_sim_state()
+        elif self._use_rlhf:
             ret_obs[f"query_pixels_{self._query_keys[0]}"] = self.render().copy()
         return ret_obs
 
+    def get_sim_state(self) -> np.ndarray:
+        data = self._hb_env.unwrapped.data
+        return np.concatenate([data.qpos, data.qvel])
+
+    def render_sim_state(self, state: np.ndarray) -> dict[str, np.ndarray]:
+        """Renders the query views of the given simulator state."""
+        env = self._hb_env.unwrapped
+        env.set_state(state[: env.model.nq], state[env.model.nq :])
+        return {key: self.render().copy() for key in self._query_keys}
+
     def step(self, action):
         reward = 0
         info = {"task_reward": 0.0, **{f"Reward/{k}": 0.0 for k in self._reward_terms}}
@@ -189,8 +211,11 @@ class HumanoidBench(gym.Env):
 
 
 class HumanoidBenchEnvFactory(EnvFactory):
-    def _wrap_env(self, env, cfg):
-        env = RescaleFromTanh(env)
+    def _wrap_env(self, env, cfg, vectorized: bool = False):
+        # Stateless and batchable wrappers are applied once on the vector env of
+        # train envs, see `_wrap_vector_env`.
+        if not vectorized:
+            env = RescaleFromTanh(env)
         if cfg.env.episode_length != 1000:
             # Used in unit tests.
             env = TimeLimit(env, cfg.env.episode_length)
@@ -199,13 +224,17 @@ class HumanoidBenchEnvFactory(EnvFactory):
                 env, cfg.env.episode_length // cfg.action_repeat
             )  # Time limits are handles by DMC
         env = ActionSequence(env, cfg.action_sequence)
-        env = FrameStack(env, cfg.frame_stack)
+        if not vectorized:
+            env = FrameStack(env, cfg.frame_stack)
         return env
 
+    def _wrap_vector_env(self, envs, cfg):
+        envs = RescaleFromTanh(envs)
+        envs = FrameStack(envs, cfg.frame_stack)
+        return envs
+
     def make_train_env(self, cfg: DictConfig) -> gym.vector.VectorEnv:
-        vec_env_class = gym.vector.SyncVectorEnv
-        kwargs = dict()
-        return vec_env_class(
+        envs = make_vector_env(
             [
                 lambda: self._wrap_env(
                     HumanoidBench(
@@ -220,13 +249,17 @@ class HumanoidBenchEnvFactory(EnvFactory):
                         reward_term_type=cfg.env.reward_term_type,
                         initial_terms=cfg.env.initial_terms,
                         blocked_hands=cfg.env.blocked_hands,
+                        query_render=cfg.rlhf.query_render,
                     ),
                     cfg,
+                    vectorized=True,
                 )
                 for _ in range(cfg.num_train_envs)
             ],
-            **kwargs,
+            backend=cfg.env.vector_env,
+            context="spawn",
         )
+        return self._wrap_vector_env(envs, cfg)
 
     def make_eval_env(self, cfg: DictConfig) -> gym.Env:
         return self._wrap_env(
@@ -242,6 +275,7 @@ class HumanoidBenchEnvFactory(EnvFactory):
                 reward_term_type=cfg.env.reward_term_type,
                 initial_terms=cfg.env.initial_terms,
                 blocked_hands=cfg.env.blocked_hands,
+                query_render=cfg.rlhf.query_render,
             ),
             cfg,
         )
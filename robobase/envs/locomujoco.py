@@ -2,6 +2,7 @@ import math
 import copy
 from typing import List, Callable
 
+import mujoco
 import numpy as np
 
 import gymnasium as gym
@@ -14,7 +15,7 @@ from tqdm import tqdm
 import loco_mujoco  # noqa
 
 from robobase.utils import add_demo_to_replay_buffer
-from robobase.envs.env import EnvFactory, DemoEnv
+from robobase.envs.env import EnvFactory, DemoEnv, make_vector_env
 from robobase.envs.wrappers import (
     OnehotTime,
     FrameStack,
@@ -154,6 +155,7 @@ class LocoMujoco(gym.Env):
         reward_mode: str = "dense",
         reward_term_type: str = "all",
         initial_terms: list[float] = [],
+        query_render: str = "step",
     ):
         self._task_name = task_name
         self._from_pixels = from_pixels
@@ -205,7 +207,16 @@ class LocoMujoco(gym.Env):
             )
 
         self._use_rlhf = use_rlhf
-        if use_rlhf:
+        self._query_render = query_render
+        if use_rlhf and query_render == "state":
+            # Store simulator states and render only the queries sent to a labeler.
+            _obs_space["query_state"] = spaces.Box(
+                low=-np.inf,
+                high=np.inf,
+                shape=self.get_sim_state().shape,
+                dtype=np.float64,
+            )
+        elif use_rlhf:
             for key in self._query_keys:
                 _obs_space[f"query_pixels_{key}"] = spaces.Box(
                     low=0,
@@ -263,10 +274,25 @@ class LocoMujoco(gym.Env):
         else:
             ret_obs["low_dim_state"] = observation.astype(np.float32)
 
-        if self._use_rlhf:
+        if self._use_rlhf and self._query_render == "state":
+            ret_obs["query_state"] = self.get_sim_state()
+        elif self._use_rlhf:
             ret_obs[f"query_pixels_{self._query_keys[0]}"] = self.render().copy()
         return ret_obs
 
+    def get_sim_state(self) -> np.ndarray:
+        data = self._locomujoco_env.unwrapped.env._data
+        return np.concatenate([data.qpos, data.qvel])
+
+    def render_sim_state(self, state: np.ndarray) -> dict[str, np.ndarray]:
+        """Renders the query views of the given simulator state."""
+        sim = self._locomujoco_env.unwrapped.env
+        nq = sim._model.nq
+        sim._data.qpos[:] = state[:nq]
+        sim._data.qvel[:] = state[nq:]
+        mujoco.mj_forward(sim._model, sim._data)
+        return {key: self.render().copy() for key in self._query_keys}
+
     def step(self, action):
         reward = 0
         info = {"task_reward": 0.0, **{k: 0.0 for k in self._reward_terms}}
@@ -372,14 +398,11 @@ class LocoMujocoEnvFactory(EnvFactory):
             reward_mode=cfg.env.reward_mode,
             reward_term_type=cfg.env.reward_term_type,
             initial_terms=cfg.env.initial_terms,
+            query_render=cfg.rlhf.query_render,
         )
 
     def make_train_env(self, cfg: DictConfig) -> gym.vector.VectorEnv:
-        # vec_env_class = gym.vector.AsyncVectorEnv
-        # kwargs = dict(context="spawn")
-        vec_env_class = gym.vector.SyncVectorEnv
-        kwargs = dict()
-        return vec_env_class(
+        return make_vector_env(
             [
                 lambda: self._wrap_env(
                     self._create_env(cfg),
@@ -387,7 +410,8 @@ class LocoMujocoEnvFactory(EnvFactory):
                 )
                 for _ in range(cfg.num_train_envs)
             ],
-            **kwargs,
+            backend=cfg.env.vector_env,
+            context="spawn",
         )
 
     def make_eval_env(self, cfg: DictConfig) -> gym.Env:
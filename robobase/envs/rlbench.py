@@ -34,7 +34,7 @@ from robobase.utils import (
     observations_to_action_with_onehot_gripper_nbp,
     rescale_demo_actions,
 )
-from robobase.envs.env import EnvFactory, Demo, DemoEnv
+from robobase.envs.env import EnvFactory, Demo, DemoEnv, make_vector_env
 import multiprocessing as mp
 
 try:
@@ -690,11 +690,12 @@ class RLBenchEnvFactory(EnvFactory):
     def make_train_env(self, cfg: DictConfig) -> gym.vector.VectorEnv:
         obs_config = _make_obs_config(cfg)
 
-        return gym.vector.AsyncVectorEnv(
+        return make_vector_env(
             [
                 lambda: self._wrap_env(_make_env(cfg, obs_config), cfg)
                 for _ in range(cfg.num_train_envs)
-            ]
+            ],
+            backend=cfg.env.vector_env,
         )
 
     def make_eval_env(self, cfg: DictConfig) -> gym.Env:
@@ -11,6 +11,7 @@ from robobase.envs.wrappers.transpose_image_chw import TransposeImageCHW
 from robobase.envs.wrappers.action_sequence import (
     ActionSequence,
     RecedingHorizonControl,
+    TemporalEnsemble,
 )
 from robobase.envs.wrappers.append_demo_info import AppendDemoInfo
 from robobase.envs.wrappers.reward_modifiers import (
@@ -34,4 +35,5 @@ __all__ = [
     "ActionSequence",
     "AppendDemoInfo",
     "RecedingHorizonControl",
+    "TemporalEnsemble",
 ]
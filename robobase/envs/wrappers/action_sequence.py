@@ -59,13 +59,101 @@ class ActionSequence(gym.ActionWrapper, gym.utils.RecordConstructorArgs):
         return self._step_sequence(action)
 
 
+class TemporalEnsemble:
+    """Temporal ensembling of ACT (https://arxiv.org/abs/2304.13705) for a batch of envs.
+
+    Each env keeps a ring of its last L predicted action sequences, together with the
+    step each was predicted at. The action at step t averages the predictions for t of
+    all sequences predicted within (t - L, t], with exponential weights that are
+    highest for the earliest prediction. Memory and work per step are O(L) per env,
+    regardless of the episode length, and all envs are handled in one array operation.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        sequence_length: int,
+        action_size: int,
+        gain: float = 0.01,
+        dtype: np.dtype = np.float32,
+    ):
+        """Init.
+
+        Args:
+            num_envs: Number of envs.
+            sequence_length: Action sequence length L.
+            action_size: Action size A.
+            gain: Temporal ensembling gain. Defaults to 0.01.
+            dtype: Action dtype.
+        """
+        self._sequence_length = sequence_length
+        self._sequences = np.zeros(
+            (num_envs, sequence_length, sequence_length, action_size), dtype=dtype
+        )
+        self._steps = np.zeros(num_envs, dtype=np.int64)
+        self._heads = np.zeros(num_envs, dtype=np.int64)
+        self._num_sequences = np.zeros(num_envs, dtype=np.int64)
+        self._predicted_steps = np.zeros((num_envs, sequence_length), dtype=np.int64)
+        self._weights = np.exp(-gain * np.arange(sequence_length))
+        self._slots = np.arange(sequence_length)
+
+    def _env_indices(self, env_indices) -> np.ndarray:
+        if env_indices is None:
+            return np.arange(len(self._steps))
+        return np.asarray(env_indices)
+
+    def reset(self, env_indices: np.ndarray = None):
+        """Clears the predictions of the given envs, all envs by default."""
+        env_indices = self._env_indices(env_indices)
+        self._steps[env_indices] = 0
+        self._heads[env_indices] = 0
+        self._num_sequences[env_indices] = 0
+
+    def add(self, sequences: np.ndarray, env_indices: np.ndarray = None):
+        """Stores the (N, L, A) action sequences predicted at the current step."""
+        env_indices = self._env_indices(env_indices)
+        heads = self._heads[env_indices]
+        self._sequences[env_indices, heads] = sequences
+        self._predicted_steps[env_indices, heads] = self._steps[env_indices]
+        self._heads[env_indices] = (heads + 1) % self._sequence_length
+        self._num_sequences[env_indices] = np.minimum(
+            self._num_sequences[env_indices] + 1, self._sequence_length
+        )
+
+    def step(self, env_indices: np.ndarray = None) -> np.ndarray:
+        """Returns the (N, A) ensembled actions of the current step, and advances it."""
+        env_indices = self._env_indices(env_indices)
+        steps = self._steps[env_indices]
+        # Slot ages, 0 being the latest sequence.
+        ages = (
+            self._heads[env_indices, None] - 1 - self._slots
+        ) % self._sequence_length
+        offsets = steps[:, None] - self._predicted_steps[env_indices]
+        valid = (ages < self._num_sequences[env_indices, None]) & (
+            offsets < self._sequence_length
+        )
+        # Sequences are predicted in order, so the valid ones are the latest.
+        num_valid = valid.sum(axis=1, keepdims=True)
+        ranks = np.clip(num_valid - 1 - ages, 0, self._sequence_length - 1)
+        weights = np.where(valid, self._weights[ranks], 0.0)
+        weights /= weights.sum(axis=1, keepdims=True)
+        actions = self._sequences[
+            env_indices[:, None],
+            self._slots,
+            np.clip(offsets, 0, self._sequence_length - 1),
+        ]
+        self._steps[env_indices] += 1
+        return (actions * weights[..., None]).sum(axis=1)
+
+
 class RecedingHorizonControl(ActionSequence):
     """Receding horizon control with temporal ensembling of ACT.
 
     This wrapper allows agent predict an action sequence of length N,
     but performs receding horizon control of only K <= N steps of actions.
     We also support temporal ensembling (from ALOHA https://arxiv.org/abs/2304.13705),
-    which caches the previous actions and outputs a weighted average of them.
+    which caches the previous actions and outputs a weighted average of them, see
+    `TemporalEnsemble`.
     """
 
     def __init__(
@@ -82,7 +170,8 @@ class RecedingHorizonControl(ActionSequence):
         Args:
             env: The gym env to wrap.
             sequence_length: Action sequence length.
-            time_limit: The time limit of the env for creating buffers.
+            time_limit: The time limit of the env. Ensembling only keeps the last
+                `sequence_length` predictions, so it doesn't depend on it.
             execution_length: The execution length of the receding horizion control.
             temporal_ensemble: Whether to use temporal ensembling. Defaults to True.
             gain: Temporal ensembling gain. Defaults to 0.01.
@@ -92,31 +181,21 @@ class RecedingHorizonControl(ActionSequence):
         self._execution_length = execution_length
         self._temporal_ensemble = temporal_ensemble
         self._gain = gain
-        self._init_action_history()
-
-    def _init_action_history(self):
-        """Initialize the action history buffer.
-
-        We store the history actions within a buffer of shape [T, T + L, A],
-        where T is the time limit, L is the sequence length, and A is the action size.
-
-        For example, self._action_history[t, t:t + L] stores the predicted action
-        sequence of size A and length L at time step t.
-        """
-        self._action_history = np.zeros(
-            [
-                self._time_limit,
-                self._time_limit + self._sequence_length,
+        self._ensemble = None
+        if temporal_ensemble and sequence_length > 1:
+            self._ensemble = TemporalEnsemble(
+                1,
+                sequence_length,
                 self.action_space.shape[-1],
-            ],
-            dtype=self.action_space.dtype,
-        )
-        self._cur_step = 0
+                gain,
+                self.action_space.dtype,
+            )
 
     def reset(
         self, *, seed: int | None = None, options: Dict[str, Any] | None = None
     ) -> tuple[Any, dict[str, Any]]:
-        self._init_action_history()
+        if self._ensemble is not None:
+            self._ensemble.reset()
         return super().reset(seed=seed, options=options)
 
     def _step_sequence(self, action):
@@ -125,29 +204,16 @@ class RecedingHorizonControl(ActionSequence):
         if self.is_demo_env:
             demo_actions = np.array(action)
 
-        self._action_history[
-            self._cur_step, self._cur_step : self._cur_step + self._sequence_length
-        ] = action
+        if self._ensemble is not None:
+            self._ensemble.add(action[np.newaxis])
 
         for i, sub_action in enumerate(action):
-            if self._temporal_ensemble and self._sequence_length > 1:
-                # Select all predicted actions for self._cur_step. This will cover the
-                # actions from [cur_step - sequence_length + 1, cur_step)
-                # Note that not all actions in this range will be valid as we might have
-                # execution_length > 1, which skips some of the intermediate steps.
-                cur_actions = self._action_history[:, self._cur_step]
-                indices = np.all(cur_actions != 0, axis=1)
-                cur_actions = cur_actions[indices]
-
-                # earlier predicted actions will have smaller weights.
-                exp_weights = np.exp(-self._gain * np.arange(len(cur_actions)))
-                exp_weights = (exp_weights / exp_weights.sum())[:, None]
-                sub_action = (cur_actions * exp_weights).sum(axis=0)
+            if self._ensemble is not None:
+                sub_action = self._ensemble.step()[0]
 
             observation, reward, termination, truncation, info = self.env.step(
                 sub_action
             )
-            self._cur_step += 1
             if self.is_demo_env:
                 demo_actions[i] = info.pop("demo_action")
             total_reward += reward
@@ -48,6 +48,7 @@ class FrameStack(gym.ObservationWrapper, gym.utils.RecordConstructorArgs):
         gym.ObservationWrapper.__init__(self, env)
         self.is_vector_env = getattr(env, "is_vector_env", False)
         self.num_stack = num_stack
+        self.lib = lib
         self.frames = {}
         new_obs_dict = {}
         for name in self.observation_space.keys():
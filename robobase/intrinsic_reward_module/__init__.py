@@ -1,4 +1,5 @@
 from robobase.intrinsic_reward_module.rnd import RND
 from robobase.intrinsic_reward_module.icm import ICM
+from robobase.intrinsic_reward_module.state_entropy import StateEntropy
 
-__all__ = ["RND", "ICM"]
+__all__ = ["RND", "ICM", "StateEntropy"]
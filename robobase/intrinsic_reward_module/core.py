@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from typing import Optional
+
 import torch
 from gymnasium import spaces
 
@@ -19,6 +21,7 @@ class IntrinsicRewardModule(ABC):
         device: torch.device,
         beta: float = 0.05,
         kappa: float = 0.000025,
+        use_agent_features: bool = False,
     ) -> None:
         """Init.
 
@@ -28,12 +31,17 @@ class IntrinsicRewardModule(ABC):
             device: Device to run the model.
             beta: The initial weighting coefficient of the intrinsic rewards.
             kappa: The decay rate.
+            use_agent_features: If true and pixels are used, the module is fed the
+                (detached) pixel features the agent has already computed, instead of
+                encoding the raw pixels with its own conv stack.
         """
         self.observation_space = observation_space
         self.action_space = action_space
         self.device = device
         self.beta = beta
         self.kappa = kappa
+        # Batch keys matching each pattern of `_extract_obs`.
+        self._batch_keys = {}
 
         self.rgb_spaces = extract_many_from_spec(
             observation_space, r"rgb.*", missing_ok=True
@@ -42,6 +50,7 @@ class IntrinsicRewardModule(ABC):
             observation_space, "low_dim_state", missing_ok=True
         )
         self.use_pixels = len(self.rgb_spaces) > 0
+        self.use_agent_features = use_agent_features and self.use_pixels
 
     @abstractmethod
     def compute_irs(
@@ -68,12 +77,66 @@ class IntrinsicRewardModule(ABC):
             batch: Batch of data.
         """
 
+    def compute_irs_and_update(
+        self,
+        batch: dict[str, torch.Tensor],
+        step: int = 0,
+        feats: Optional[torch.Tensor] = None,
+        next_feats: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        """Compute the intrinsic rewards for current samples, then update the module.
+
+        Modules override this to share the work of `compute_irs` and `update`, e.g.
+        to encode the observations of the batch once.
+
+        Args:
+            batch: Batch of data.
+            step: The global training step.
+            feats: Pixel features of the observations computed by the agent, used
+                instead of the raw pixels if `use_agent_features`.
+            next_feats: Pixel features of the next observations.
+
+        Returns:
+            The intrinsic rewards.
+        """
+        intrinsic_rewards = self.compute_irs(batch, step)
+        self.update(batch)
+        return intrinsic_rewards
+
+    def _extract_obs_pair(
+        self,
+        batch: dict[str, torch.Tensor],
+        feats: Optional[torch.Tensor] = None,
+        next_feats: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        """Returns the observations and next observations, stacked on batch axis."""
+        if self.use_agent_features:
+            if feats is None or next_feats is None:
+                raise ValueError(
+                    "use_agent_features requires the agent's pixel features."
+                )
+            feats = torch.cat([feats, next_feats]).detach()
+            return feats.reshape(feats.shape[0], -1).float()
+        obs = self._extract_obs(
+            batch, r"rgb(?!.*?tp1)" if self.use_pixels else "low_dim_state"
+        )
+        next_obs = self._extract_obs(
+            batch, r"rgb.*tp1" if self.use_pixels else "low_dim_state_tp1"
+        )
+        return torch.cat([obs, next_obs])
+
     def _extract_obs(self, batch: dict[str, torch.Tensor], name_or_regex: str):
+        if self.use_agent_features:
+            raise ValueError(
+                "Modules using agent features are run with compute_irs_and_update."
+            )
         if self.use_pixels:
-            # dict of {"cam_name": (B, T, 3, H, W)}
-            obs = extract_many_from_batch(batch, name_or_regex)
-            # Fold views into time axis
-            obs = torch.cat(list(obs.values()), 1)
+            keys = self._batch_keys.get(name_or_regex)
+            if keys is None:
+                keys = list(extract_many_from_batch(batch, name_or_regex).keys())
+                self._batch_keys[name_or_regex] = keys
+            # Fold views of (B, T, 3, H, W) into time axis
+            obs = torch.cat([batch[k] for k in keys], 1)
             # Fold time into channel axis
             obs = obs.view(obs.shape[0], -1, *obs.shape[3:])
         else:
@@ -1,3 +1,5 @@
+from typing import Optional
+
 import numpy as np
 import torch
 from torch import nn
@@ -94,6 +96,12 @@ class ICM(IntrinsicRewardModule):
             lr: The learning rate.
         """
         super().__init__(*args, **kwargs)
+        self.latent_dim = latent_dim
+        self.lr = lr
+        self.encoder = None
+        if self.use_agent_features:
+            # Built on the first batch, once the size of the features is known.
+            return
         if self.use_pixels:
             obs_shapes = [v.shape for v in self.rgb_spaces.values()]
             # Fuse num views and time into channel axis
@@ -102,23 +110,26 @@ class ICM(IntrinsicRewardModule):
             ]
         else:
             obs_shape = self.low_dim_space.shape[-1:]
+        self._build(obs_shape)
+
+    def _build(self, obs_shape: tuple):
         self.encoder = Encoder(
             obs_shape=obs_shape,
-            latent_dim=latent_dim,
+            latent_dim=self.latent_dim,
         ).to(self.device)
 
         action_dim = np.prod(self.action_space.shape)
-        self.im = InverseDynamicsModel(latent_dim=latent_dim, action_dim=action_dim).to(
-            self.device
-        )
-        self.fm = ForwardDynamicsModel(latent_dim=latent_dim, action_dim=action_dim).to(
-            self.device
-        )
+        self.im = InverseDynamicsModel(
+            latent_dim=self.latent_dim, action_dim=action_dim
+        ).to(self.device)
+        self.fm = ForwardDynamicsModel(
+            latent_dim=self.latent_dim, action_dim=action_dim
+        ).to(self.device)
         self.dynamics_opt = torch.optim.Adam(
             list(self.encoder.parameters())
             + list(self.im.parameters())
             + list(self.fm.parameters()),
-            lr=lr,
+            lr=self.lr,
         )
 
     def compute_irs(
@@ -160,3 +171,34 @@ class ICM(IntrinsicRewardModule):
         fm_loss = F.mse_loss(pred_next_obs, encoded_next_obs)
         (im_loss + fm_loss).backward()
         self.dynamics_opt.step()
+
+    def compute_irs_and_update(
+        self,
+        batch: dict[str, torch.Tensor],
+        step: int = 0,
+        feats: Optional[torch.Tensor] = None,
+        next_feats: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        """See Base.
+
+        The encoder is run once on the observations and next observations stacked
+        together, and its encodings are shared by the rewards and the losses.
+        """
+        beta_t = self.beta * np.power(1.0 - self.kappa, step)
+        obs_pair = self._extract_obs_pair(batch, feats, next_feats)
+        if self.encoder is None:
+            self._build(obs_pair.shape[1:])
+        encoded_obs, encoded_next_obs = self.encoder(obs_pair).chunk(2)
+        action = batch["action"].view(encoded_obs.shape[0], -1)
+        pred_next_obs = self.fm(encoded_obs, action)
+        with torch.no_grad():
+            intrinsic_rewards = torch.linalg.vector_norm(
+                encoded_next_obs - pred_next_obs, ord=2, dim=1, keepdim=True
+            )
+        pred_actions = self.im(encoded_obs, encoded_next_obs)
+        im_loss = F.mse_loss(pred_actions, action)
+        fm_loss = F.mse_loss(pred_next_obs, encoded_next_obs)
+        self.dynamics_opt.zero_grad()
+        (im_loss + fm_loss).backward()
+        self.dynamics_opt.step()
+        return intrinsic_rewards * beta_t
@@ -1,3 +1,5 @@
+from typing import Optional
+
 import numpy as np
 import torch
 from torch.nn import functional as F
@@ -26,6 +28,12 @@ class RND(IntrinsicRewardModule):
             lr: The learning rate.
         """
         super().__init__(*args, **kwargs)
+        self.latent_dim = latent_dim
+        self.lr = lr
+        self.predictor = self.target = None
+        if self.use_agent_features:
+            # Built on the first batch, once the size of the features is known.
+            return
         if self.use_pixels:
             obs_shapes = [v.shape for v in self.rgb_spaces.values()]
             # Fuse num views and time into channel axis
@@ -34,16 +42,19 @@ class RND(IntrinsicRewardModule):
             ]
         else:
             obs_shape = self.low_dim_space.shape[-1:]
+        self._build(obs_shape)
+
+    def _build(self, obs_shape: tuple):
         self.predictor = Encoder(
             obs_shape=obs_shape,
-            latent_dim=latent_dim,
+            latent_dim=self.latent_dim,
         ).to(self.device)
         self.target = Encoder(
             obs_shape=obs_shape,
-            latent_dim=latent_dim,
+            latent_dim=self.latent_dim,
         ).to(self.device)
 
-        self.opt = torch.optim.Adam(self.predictor.parameters(), lr=lr)
+        self.opt = torch.optim.Adam(self.predictor.parameters(), lr=self.lr)
 
         # freeze the network parameters
         for p in self.target.parameters():
@@ -82,3 +93,33 @@ class RND(IntrinsicRewardModule):
         loss = F.mse_loss(src_feats, tgt_feats)
         loss.backward()
         self.opt.step()
+
+    def compute_irs_and_update(
+        self,
+        batch: dict[str, torch.Tensor],
+        step: int = 0,
+        feats: Optional[torch.Tensor] = None,
+        next_feats: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        """See Base.
+
+        Predictor and target are run once on the observations and next observations
+        stacked together. The rewards are the (pre-update) errors on the next
+        observations, and the predictor is trained on both.
+        """
+        beta_t = self.beta * np.power(1.0 - self.kappa, step)
+        obs_pair = self._extract_obs_pair(batch, feats, next_feats)
+        if self.predictor is None:
+            self._build(obs_pair.shape[1:])
+        batch_size = obs_pair.shape[0] // 2
+        src_feats = self.predictor(obs_pair)
+        with torch.no_grad():
+            tgt_feats = self.target(obs_pair)
+        errors = F.mse_loss(src_feats, tgt_feats, reduction="none")
+        with torch.no_grad():
+            dist = errors[batch_size:].mean(dim=1, keepdim=True)
+            dist = (dist - dist.min()) / (dist.max() - dist.min() + 1e-11)
+        self.opt.zero_grad()
+        errors.mean().backward()
+        self.opt.step()
+        return dist * beta_t
@@ -0,0 +1,129 @@
+from typing import Optional
+
+import torch
+
+
+def knn_distances(
+    queries: torch.Tensor, keys: torch.Tensor, k: int, tile_size: int = 4096
+) -> torch.Tensor:
+    """Distance from every query to its k-th nearest neighbour among the keys.
+
+    The keys are processed in tiles of ``tile_size`` rows, and only a running top-k
+    is kept between tiles, so the peak memory is O(B * (tile_size + k)) rather than
+    O(B * N) for the full pairwise distance matrix.
+
+    Args:
+        queries: Tensor of shape (B, D).
+        keys: Tensor of shape (N, D).
+        k: Rank of the neighbour to return (1-indexed). Clamped to N.
+        tile_size: Number of keys processed at once.
+
+    Returns:
+        Tensor of shape (B,) holding the k-th smallest distance for each query.
+    """
+    k = min(k, keys.shape[0])
+    best = None
+    for start in range(0, keys.shape[0], tile_size):
+        dists = torch.cdist(queries, keys[start : start + tile_size])
+        if best is not None:
+            dists = torch.cat([best, dists], dim=1)
+        best = torch.topk(dists, min(k, dists.shape[1]), dim=1, largest=False).values
+    return best[:, k - 1]
+
+
+class StateEntropy:
+    """Particle-based state entropy estimate backed by a rolling feature bank.
+
+    Recent states are written into a fixed-size ring buffer that lives on the
+    training device, so each update only needs the current batch rather than a large
+    batch re-sampled from the replay buffer. States should be added once each, e.g.
+    when they are collected from the env: adding batches sampled with replacement
+    from a replay buffer fills the bank with copies of the same states, whose k-NN
+    distances collapse to zero. Optionally, states are mapped through a
+    fixed Gaussian random projection before being stored, which makes the k-NN search
+    cheaper for high-dimensional states while approximately preserving distances.
+
+    Liu, Hao, and Pieter Abbeel. "Behavior from the void: Unsupervised active
+    pre-training."
+    """
+
+    def __init__(
+        self,
+        feature_dim: int,
+        device: torch.device,
+        capacity: int = 100000,
+        k: int = 5,
+        tile_size: int = 4096,
+        projection_dim: Optional[int] = None,
+    ):
+        """Init.
+
+        Args:
+            feature_dim: Dimension of the states that are passed in.
+            device: Device the feature bank is kept on.
+            capacity: Number of most recent states kept in the bank.
+            k: Neighbour used for the k-NN distance.
+            tile_size: Number of bank entries compared against the batch at once.
+            projection_dim: If set, project states to this many dimensions with a
+                random Gaussian matrix before storing and querying them.
+        """
+        self.feature_dim = feature_dim
+        self.device = device
+        self.capacity = capacity
+        self.k = k
+        self.tile_size = tile_size
+        self.projection = None
+        bank_dim = feature_dim
+        if projection_dim is not None and projection_dim < feature_dim:
+            self.projection = torch.randn(
+                feature_dim, projection_dim, device=device
+            ) / (projection_dim**0.5)
+            bank_dim = projection_dim
+        self.bank = torch.zeros((capacity, bank_dim), device=device)
+        self._index = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _project(self, states: torch.Tensor) -> torch.Tensor:
+        states = states.reshape(states.shape[0], -1).to(self.bank)
+        if self.projection is not None:
+            states = states @ self.projection
+        return states
+
+    def add(self, states: torch.Tensor):
+        """Insert a batch of states into the bank, overwriting the oldest ones.
+
+        Args:
+            states: Tensor of shape (B, feature_dim).
+        """
+        feats = self._project(states)[-self.capacity :]
+        idxs = (
+            torch.arange(feats.shape[0], device=self.device) + self._index
+        ) % self.capacity
+        self.bank.index_copy_(0, idxs, feats)
+        self._index = (self._index + feats.shape[0]) % self.capacity
+        self._size = min(self._size + feats.shape[0], self.capacity)
+
+    @torch.no_grad()
+    def compute(self, states: torch.Tensor, update: bool = True) -> torch.Tensor:
+        """Compute the k-NN state entropy reward for a batch of states.
+
+        Args:
+            states: Tensor of shape (B, feature_dim).
+            update: Whether to add the states to the bank before querying. The
+                states are assumed to be part of the bank, so that the nearest
+                neighbour of each state is itself, hence the k+1-th neighbour is
+                used.
+
+        Returns:
+            Tensor of shape (B, 1) with the k-NN distances.
+        """
+        if update:
+            self.add(states)
+        feats = self._project(states)
+        dists = knn_distances(
+            feats, self.bank[: self._size], self.k + 1, self.tile_size
+        )
+        return dists.unsqueeze(1)
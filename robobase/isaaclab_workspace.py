@@ -1,5 +1,4 @@
 import logging
-import shutil
 import signal
 import sys
 import time
@@ -16,6 +15,11 @@ from omegaconf import DictConfig
 from torch.utils.data import DataLoader
 
 from robobase import utils
+from robobase.checkpoint import (
+    Checkpointer,
+    load_optimizer_state_dicts,
+    optimizer_state_dicts,
+)
 from robobase.envs.isaaclab import IsaacLabEnvFactory
 from robobase.logger import Logger
 from robobase.replay_buffer.replay_buffer import ReplayBuffer
@@ -92,6 +96,7 @@ class IsaacLabWorkspace:
 
         # create logger
         self.logger = Logger(self.work_dir, cfg=self.cfg)
+        self._checkpointer = Checkpointer(asynchronous=cfg.async_snapshot)
         self.env_factory = env_factory
 
         if (num_demos := cfg.demos) > 0:
@@ -151,6 +156,7 @@ class IsaacLabWorkspace:
             replay_beta=cfg.replay.beta,
             frame_stack_on_channel=cfg.frame_stack_on_channel,
             intrinsic_reward_module=intrinsic_reward_module,
+            amp_dtype=cfg.amp_dtype,
         )
         self.agent.train(False)
 
@@ -177,6 +183,7 @@ class IsaacLabWorkspace:
                 observation_space=observation_space,
                 action_space=action_space,
                 reward_space=reward_space,
+                amp_dtype=cfg.amp_dtype,
             )
             self.reward_model.train(False)
             self.replay_buffer.set_reward_model(self.reward_model)
@@ -860,22 +867,15 @@ class IsaacLabWorkspace:
                         }
                     )
 
-                eureka_metrics = {
-                    key: value for key, value in metrics.items() if "Eureka" in key
-                }
-                non_eureka_metrics = {
-                    key: value for key, value in metrics.items() if "Eureka" not in key
-                }
-                self.logger.log_metrics(
-                    non_eureka_metrics, self.global_env_steps, prefix="train"
-                )
-                # Hack code for logging Eureka metrics
-                for key, value in eureka_metrics.items():
-                    if isinstance(value, np.ndarray) and len(value.shape) == 1:
-                        self.logger._log(key, np.mean(value), self.global_env_steps)  # type: ignore
-                    else:
-                        self.logger._log(key, value, self.global_env_steps)  # type: ignore
-                self.logger._dump(self.global_env_steps, "train")  # type: ignore
+                # Log the mean of the per-env Eureka metrics.
+                for key, value in metrics.items():
+                    if (
+                        "Eureka" in key
+                        and isinstance(value, np.ndarray)
+                        and len(value.shape) == 1
+                    ):
+                        metrics[key] = np.mean(value)
+                self.logger.log_metrics(metrics, self.global_env_steps, prefix="train")
 
             # temporarily disable evaluation in IsaacLab.
             if False:
@@ -993,6 +993,10 @@ class IsaacLabWorkspace:
                 agent_0_ep_len = agent_0_reward = 0
 
             metrics.update(env_metrics)
+            if self.cfg.rlhf.num_unsup_train_frames > 0 and unsup_train_until_frame(
+                len(self.replay_buffer)
+            ):
+                self.agent.observe_states(observations)
             transitions = (
                 action,
                 observations,
@@ -1064,10 +1068,11 @@ class IsaacLabWorkspace:
         self.replay_buffer.shutdown()
         if self.use_demo_replay:
             self.demo_replay_buffer.shutdown()
+        self.logger.close()
+        self._checkpointer.close()
 
     def save_snapshot(self):
         snapshot = self.work_dir / "snapshots" / f"{self.global_env_steps}_snapshot.pt"
-        snapshot.parent.mkdir(parents=True, exist_ok=True)
         keys_to_save = [
             "_pretrain_step",
             "_main_loop_iterations",
@@ -1076,10 +1081,12 @@ class IsaacLabWorkspace:
         ]
         payload = {k: self.__dict__[k] for k in keys_to_save}
         payload["agent"] = self.agent.state_dict()
-        with snapshot.open("wb") as f:
-            torch.save(payload, f)
+        payload["agent_optimizers"] = optimizer_state_dicts(self.agent)
+        payload["replay_buffers"] = self._replay_buffer_state_dicts(
+            ["replay_buffer", "demo_replay_buffer"]
+        )
         latest_snapshot = self.work_dir / "snapshots" / "latest_snapshot.pt"
-        shutil.copy(snapshot, latest_snapshot)
+        self._checkpointer.save(payload, snapshot, latest_snapshot)
 
     def load_snapshot(self, path_to_snapshot_to_load=None):
         if path_to_snapshot_to_load is None:
@@ -1095,6 +1102,8 @@ class IsaacLabWorkspace:
         with path_to_snapshot_to_load.open("rb") as f:
             payload = torch.load(f, map_location="cpu")
         self.agent.load_state_dict(payload.pop("agent"))
+        load_optimizer_state_dicts(self.agent, payload.pop("agent_optimizers", {}))
+        self._load_replay_buffer_state_dicts(payload.pop("replay_buffers", {}))
         for k, v in payload.items():
             self.__dict__[k] = v
 
@@ -1104,22 +1113,28 @@ class IsaacLabWorkspace:
             / "reward_model_snapshots"
             / f"{self.global_env_steps}_snapshot.pt"
         )
-        snapshot.parent.mkdir(parents=True, exist_ok=True)
         keys_to_save = [
             "_pretrain_step",
             "_main_loop_iterations",
             "_global_env_episode",
             "_total_feedback",
+            "_reward_pretrain_step",
             "cfg",
         ]
         payload = {k: self.__dict__[k] for k in keys_to_save}
         payload["reward_model"] = self.reward_model.state_dict()
-        with snapshot.open("wb") as f:
-            torch.save(payload, f)
+        payload["reward_model_optimizers"] = optimizer_state_dicts(self.reward_model)
+        payload["replay_buffers"] = self._replay_buffer_state_dicts(
+            [
+                "query_replay_buffer",
+                "demo_query_replay_buffer",
+                "feedback_replay_buffer",
+            ]
+        )
         latest_snapshot = (
             self.work_dir / "reward_model_snapshots" / "latest_snapshot.pt"
         )
-        shutil.copy(snapshot, latest_snapshot)
+        self._checkpointer.save(payload, snapshot, latest_snapshot)
 
     def load_reward_model_snapshot(self, path_to_snapshot_to_load=None):
         if path_to_snapshot_to_load is None:
@@ -1135,5 +1150,29 @@ class IsaacLabWorkspace:
         with path_to_snapshot_to_load.open("rb") as f:
             payload = torch.load(f, map_location="cpu")
         self.reward_model.load_state_dict(payload.pop("reward_model"))
+        load_optimizer_state_dicts(
+            self.reward_model, payload.pop("reward_model_optimizers", {})
+        )
+        self._load_replay_buffer_state_dicts(payload.pop("replay_buffers", {}))
         for k, v in payload.items():
             self.__dict__[k] = v
+
+    def _replay_buffer_state_dicts(self, names: list[str]) -> dict[str, dict]:
+        """Manifests of the episodes stored by the given replay buffers.
+
+        Episodes are already on disk, so only the file names and counters are
+        stored in the snapshot. This lets a resumed run start with warm buffers.
+        """
+        return {
+            name: getattr(self, name).state_dict()
+            for name in names
+            if getattr(self, name, None) is not None
+        }
+
+    def _load_replay_buffer_state_dicts(self, state_dicts: dict[str, dict]):
+        for name, state_dict in state_dicts.items():
+            replay_buffer = getattr(self, name, None)
+            if replay_buffer is None:
+                logging.warning(f"Snapshot has state for unknown buffer '{name}'.")
+                continue
+            replay_buffer.load_state_dict(state_dict)
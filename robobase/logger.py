@@ -1,12 +1,14 @@
 import csv
 import datetime
+import logging
+import queue
+import threading
 from collections import defaultdict
 from pathlib import Path
 from omegaconf import OmegaConf
 
 import numpy as np
 import torch
-import wandb
 from termcolor import colored
 
 COMMON_PRETRAIN_FORMAT = [
@@ -57,6 +59,15 @@ COMMON_REWARD_TRAIN_FORMAT = [
 ]
 
 
+COMMON_PROFILE_FORMAT = [
+    ("iteration", "Iter", "int"),
+    ("env_step_fraction", "Env", "float"),
+    ("add_to_replay_fraction", "Add", "float"),
+    ("update_fraction", "Update", "float"),
+    ("replay_wait_fraction", "Wait", "float"),
+]
+
+
 COMMON_EVAL_FORMAT = [
     ("iteration", "Iter", "int"),
     ("env_steps", "S", "int"),
@@ -81,13 +92,15 @@ class AverageMeter(object):
 
 
 class MetersGroup(object):
-    def __init__(self, csv_file_name, formating, save_csv: bool):
+    def __init__(self, csv_file_name, formating, save_csv: bool, flush_every: int = 1):
         self._csv_file_name = csv_file_name
         self._formating = formating
         self._save_csv = save_csv
+        self._flush_every = max(1, flush_every)
         self._meters = defaultdict(AverageMeter)
         self._csv_file = None
         self._csv_writer = None
+        self._rows_since_flush = 0
 
     def log(self, key, value, n=1):
         self._meters[key].update(value, n)
@@ -107,6 +120,8 @@ class MetersGroup(object):
                 key = key[len("train") + 1 :]
             elif key.startswith("unsup_train"):
                 key = key[len("unsup_train") + 1 :]
+            elif key.startswith("profile"):
+                key = key[len("profile") + 1 :]
             else:
                 key = key[len("eval") + 1 :]
             key = key.replace("/", "_")
@@ -114,6 +129,20 @@ class MetersGroup(object):
         return data
 
     def _remove_old_entries(self, data):
+        fieldnames = sorted(data.keys())
+        with self._csv_file_name.open("r+b") as f:
+            header = next(csv.reader([f.readline().decode()]), [])
+            if header == fieldnames:
+                # Same columns as before, so truncate the file at the first entry
+                # that is not older than the resumed iteration.
+                col = header.index("iteration")
+                while line := f.readline():
+                    row = next(csv.reader([line.decode()]))
+                    if float(row[col]) >= data["iteration"]:
+                        f.seek(-len(line), 1)
+                        f.truncate()
+                        break
+                return
         rows = []
         with self._csv_file_name.open("r") as f:
             reader = csv.DictReader(f)
@@ -122,7 +151,7 @@ class MetersGroup(object):
                     break
                 rows.append(row)
         with self._csv_file_name.open("w") as f:
-            writer = csv.DictWriter(f, fieldnames=sorted(data.keys()), restval=0.0)
+            writer = csv.DictWriter(f, fieldnames=fieldnames, restval=0.0)
             writer.writeheader()
             for row in rows:
                 writer.writerow(row)
@@ -142,7 +171,20 @@ class MetersGroup(object):
                 self._csv_writer.writeheader()
 
         self._csv_writer.writerow(data)
-        self._csv_file.flush()
+        self._rows_since_flush += 1
+        if self._rows_since_flush >= self._flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._csv_file is not None:
+            self._csv_file.flush()
+        self._rows_since_flush = 0
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
 
     def _format(self, key, value, ty):
         if ty == "int":
@@ -163,6 +205,8 @@ class MetersGroup(object):
             color = "red"
         elif prefix == "unsup_train":
             color = "blue"
+        elif prefix == "profile":
+            color = "cyan"
         elif "reward" in prefix:
             color = "magenta"
         else:
@@ -187,29 +231,55 @@ class MetersGroup(object):
 class Logger(object):
     def __init__(self, log_dir, cfg):
         self._log_dir = log_dir
-        self._pretrain_mg = MetersGroup(
-            log_dir / "pretrain.csv", COMMON_PRETRAIN_FORMAT, cfg.save_csv
-        )
-        self._pretrain_eval_mg = MetersGroup(
-            log_dir / "pretrain_eval.csv", COMMON_EVAL_FORMAT, cfg.save_csv
-        )
-        self._train_mg = MetersGroup(
-            log_dir / "train.csv", COMMON_TRAIN_FORMAT, cfg.save_csv
-        )
-        self._eval_mg = MetersGroup(
-            log_dir / "eval.csv", COMMON_EVAL_FORMAT, cfg.save_csv
-        )
-        if cfg.rlhf.use_rlhf:
-            self._unsup_train_mg = MetersGroup(
-                log_dir / "unsup_train.csv", COMMON_UNSUP_TRAIN_FORMAT, cfg.save_csv
-            )
-            self._pretrain_reward_mg = MetersGroup(
-                log_dir / "pretrain_reward.csv",
-                COMMON_REWARD_PRETRAIN_FORMAT,
+        flush_every = cfg.csv_flush_every
+        self._meter_groups = {
+            "pretrain": MetersGroup(
+                log_dir / "pretrain.csv",
+                COMMON_PRETRAIN_FORMAT,
                 cfg.save_csv,
-            )
-            self._train_reward_mg = MetersGroup(
-                log_dir / "train_reward.csv", COMMON_REWARD_TRAIN_FORMAT, cfg.save_csv
+                flush_every,
+            ),
+            "pretrain_eval": MetersGroup(
+                log_dir / "pretrain_eval.csv",
+                COMMON_EVAL_FORMAT,
+                cfg.save_csv,
+                flush_every,
+            ),
+            "train": MetersGroup(
+                log_dir / "train.csv", COMMON_TRAIN_FORMAT, cfg.save_csv, flush_every
+            ),
+            "eval": MetersGroup(
+                log_dir / "eval.csv", COMMON_EVAL_FORMAT, cfg.save_csv, flush_every
+            ),
+            "profile": MetersGroup(
+                log_dir / "profile.csv",
+                COMMON_PROFILE_FORMAT,
+                cfg.save_csv,
+                flush_every,
+            ),
+        }
+        if cfg.rlhf.use_rlhf:
+            self._meter_groups.update(
+                {
+                    "unsup_train": MetersGroup(
+                        log_dir / "unsup_train.csv",
+                        COMMON_UNSUP_TRAIN_FORMAT,
+                        cfg.save_csv,
+                        flush_every,
+                    ),
+                    "pretrain_reward": MetersGroup(
+                        log_dir / "pretrain_reward.csv",
+                        COMMON_REWARD_PRETRAIN_FORMAT,
+                        cfg.save_csv,
+                        flush_every,
+                    ),
+                    "train_reward": MetersGroup(
+                        log_dir / "train_reward.csv",
+                        COMMON_REWARD_TRAIN_FORMAT,
+                        cfg.save_csv,
+                        flush_every,
+                    ),
+                }
             )
         self._use_wandb = cfg.wandb.use
         self._use_tb = cfg.tb.use
@@ -226,7 +296,7 @@ class Logger(object):
             if cfg.wandb.name is None:
                 cfg.wandb.name = str(self._log_dir).split("/")[-1]
 
-            wandb.init(
+            self._wandb_run = wandb.init(
                 project=cfg.wandb.project,
                 name=cfg.wandb.name,
                 config=cfg_dict,
@@ -245,8 +315,23 @@ class Logger(object):
             )
             self._sw = SummaryWriter(str(Path(cfg.tb.log_dir) / logdir))
 
+        # When enabled, metrics are moved to the CPU and written to the console, CSV,
+        # W&B and TensorBoard on a background thread, so that the training loop does
+        # not synchronize with the device to log them.
+        self._queue = None
+        self._worker = None
+        self._worker_error = None
+        if cfg.async_logging:
+            self._queue = queue.Queue(maxsize=cfg.async_logging_queue_size)
+            self._worker = threading.Thread(
+                target=self._worker_loop, name="robobase-logger", daemon=True
+            )
+            self._worker.start()
+
     def _try_log(self, key, value, step, is_video=False):
         if self._use_wandb:
+            import wandb
+
             if is_video:
                 # self._wandb_logs[key] = wandb.Video(
                 #     np.array([value["video"]]).transpose(0, 1, 4, 2, 3),
@@ -304,41 +389,32 @@ class Logger(object):
         self._try_log(key, value, step, is_video)
         if np.isscalar(value):
             if key.startswith("unsup_train"):
-                mg = self._unsup_train_mg
+                mg = self._meter_groups["unsup_train"]
             elif key.startswith("train_reward"):
-                mg = self._train_reward_mg
+                mg = self._meter_groups["train_reward"]
             elif key.startswith("train"):
-                mg = self._train_mg
+                mg = self._meter_groups["train"]
             elif key.startswith("pretrain_eval"):
-                mg = self._pretrain_eval_mg
+                mg = self._meter_groups["pretrain_eval"]
             elif key.startswith("pretrain_reward"):
-                mg = self._pretrain_reward_mg
+                mg = self._meter_groups["pretrain_reward"]
             elif key.startswith("pretrain"):
-                mg = self._pretrain_mg
+                mg = self._meter_groups["pretrain"]
+            elif key.startswith("profile"):
+                mg = self._meter_groups["profile"]
             else:
-                mg = self._eval_mg
+                mg = self._meter_groups["eval"]
             mg.log(key, value)
 
     def _dump(self, step, prefix=None):
-        if prefix is None or prefix == "eval":
-            self._eval_mg.dump(step, "eval")
-        if prefix is None or prefix == "train":
-            self._train_mg.dump(step, "train")
-        if prefix is None or prefix == "pretrain":
-            self._pretrain_mg.dump(step, "pretrain")
-        if prefix is None or prefix == "pretrain_eval":
-            self._pretrain_eval_mg.dump(step, "pretrain_eval")
-        if prefix is None or prefix == "pretrain_reward":
-            self._pretrain_reward_mg.dump(step, "pretrain_reward")
-        if prefix is None or prefix == "train_reward":
-            self._train_reward_mg.dump(step, "train_reward")
-        if prefix is None or prefix == "unsup_train":
-            self._unsup_train_mg.dump(step, "unsup_train")
+        for name, mg in self._meter_groups.items():
+            if prefix is None or prefix == name:
+                mg.dump(step, name)
         if self._use_wandb and len(self._wandb_logs):
-            wandb.log(self._wandb_logs, step=step)
+            self._wandb_run.log(self._wandb_logs, step=step)
             self._wandb_logs = {}
 
-    def log_metrics(self, metrics, step, prefix):
+    def _write_metrics(self, metrics, step, prefix):
         for key, value in metrics.items():
             if isinstance(value, np.ndarray) and len(value.shape) == 1:
                 for i, v in enumerate(value):
@@ -346,3 +422,161 @@ class Logger(object):
             else:
                 self._log(f"{prefix}/{key}", value, step)
         self._dump(step, prefix)
+
+    def _write_histograms(self, histograms, step, prefix):
+        if self._use_wandb:
+            import wandb
+
+        for key, values in histograms.items():
+            key = f"{prefix}/{key}"
+            if self._use_wandb:
+                self._wandb_run.log({key: wandb.Histogram(values)}, step=step)
+            if self._use_tb:
+                self._sw.add_histogram(key, values, step)
+
+    def _worker_loop(self):
+        while True:
+            items = [self._queue.get()]
+            # The items queued meanwhile are written together, so that the tensors of
+            # their metrics are moved to the CPU at once.
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in items
+            if stop:
+                items_to_write = items[: items.index(None)]
+            else:
+                items_to_write = items
+            try:
+                self._write_items(items_to_write)
+            except Exception as e:
+                logging.exception("Failed to write metrics.")
+                self._worker_error = e
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write_items(self, items):
+        packed = [args[0] for write, args in items if write == self._write_metrics]
+        unpacked = iter(self._unpack_metrics(packed))
+        for write, args in items:
+            if write == self._write_metrics:
+                write(next(unpacked), *args[1:])
+            else:
+                write(*args)
+
+    @staticmethod
+    def _pack_metrics(metrics):
+        """Stack the scalar tensor metrics into one tensor per device and dtype.
+
+        This does not synchronize with the device. Other tensors are copied, so that
+        later in-place updates of the tensors do not change the logged values.
+        """
+        groups = {}
+        packed = {}
+        for k, v in metrics.items():
+            if torch.is_tensor(v) and v.numel() == 1:
+                groups.setdefault((v.device, v.dtype), []).append(k)
+                # Filled in by `_unpack_metrics`, keeping the order of the metrics.
+                packed[k] = None
+            elif torch.is_tensor(v):
+                packed[k] = v.detach().clone()
+            else:
+                packed[k] = v
+        scalars = [
+            (keys, torch.stack([metrics[k].detach().reshape(()) for k in keys]))
+            for keys in groups.values()
+        ]
+        return packed, scalars
+
+    @staticmethod
+    def _unpack_metrics(packed_metrics):
+        """Move the tensors of a list of packed metrics to the CPU.
+
+        The scalars of all the metrics are concatenated per device and dtype, so
+        that they are copied to the CPU, synchronizing with the device, once.
+        """
+        groups = defaultdict(list)
+        for _, scalars in packed_metrics:
+            for keys, values in scalars:
+                groups[(values.device, values.dtype)].append(values)
+        cpu_values = {
+            group: iter(torch.cat(values).cpu().split([len(v) for v in values]))
+            for group, values in groups.items()
+        }
+        unpacked = []
+        for packed, scalars in packed_metrics:
+            metrics = {
+                k: v.cpu().numpy() if torch.is_tensor(v) else v
+                for k, v in packed.items()
+            }
+            for keys, values in scalars:
+                values = next(cpu_values[(values.device, values.dtype)])
+                metrics.update(zip(keys, values.tolist()))
+            unpacked.append(metrics)
+        return unpacked
+
+    @staticmethod
+    def _metrics_to_numpy(metrics):
+        """Move all tensor metrics to the CPU, synchronising with each device once."""
+        return Logger._unpack_metrics([Logger._pack_metrics(metrics)])[0]
+
+    def log_metrics(self, metrics, step, prefix):
+        if self._queue is None:
+            self._write_metrics(self._metrics_to_numpy(metrics), step, prefix)
+            return
+        if self._worker_error is not None:
+            raise RuntimeError("Background metrics logging failed.") from (
+                self._worker_error
+            )
+        # Blocks if the writer falls too far behind, which bounds memory usage.
+        self._queue.put(
+            (self._write_metrics, (self._pack_metrics(metrics), step, prefix))
+        )
+
+    def log_histograms(self, histograms, step, prefix):
+        """Log the distribution of each array of values to W&B and TensorBoard.
+
+        Histograms are not written to the console or CSV files.
+        """
+        if not (self._use_wandb or self._use_tb):
+            return
+        histograms = {
+            k: v.detach().cpu().numpy() if torch.is_tensor(v) else np.asarray(v)
+            for k, v in histograms.items()
+        }
+        if self._queue is None:
+            self._write_histograms(histograms, step, prefix)
+            return
+        if self._worker_error is not None:
+            raise RuntimeError("Background metrics logging failed.") from (
+                self._worker_error
+            )
+        self._queue.put((self._write_histograms, (histograms, step, prefix)))
+
+    def flush(self):
+        """Wait until all queued metrics have been written and flush CSV files."""
+        if self._queue is not None:
+            self._queue.join()
+        for mg in self._meter_groups.values():
+            mg.flush()
+        if self._use_tb:
+            self._sw.flush()
+
+    def close(self):
+        self.flush()
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+            self._queue = None
+        for mg in self._meter_groups.values():
+            mg.close()
+        if self._use_tb:
+            self._sw.close()
+        if self._use_wandb:
+            self._wandb_run.finish()
@@ -411,9 +411,10 @@ class ActBCAgent(BC):
 
         # If action contains all zeros, it is padded.
         is_pad = actions.sum(axis=-1) == 0
-        loss_dict = self.actor(
-            qpos, image, actions=actions, is_pad=is_pad, task_emb=task_emb
-        )
+        with self.amp.autocast():
+            loss_dict = self.actor(
+                qpos, image, actions=actions, is_pad=is_pad, task_emb=task_emb
+            )
 
         # calculate gradient
         if self.use_pixels and self.encoder_opt is not None:
@@ -421,16 +422,19 @@ class ActBCAgent(BC):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         self.actor_opt.zero_grad(set_to_none=True)
-        loss_dict["loss"].backward()
+        self.amp.backward(loss_dict["loss"].float())
 
         # step optimizer
         if self.actor_grad_clip:
-            nn.utils.clip_grad_norm_(self.actor.parameters(), self.actor_grad_clip)
-        self.actor_opt.step()
+            self.amp.clip_grad_norm_(
+                self.actor_opt, self.actor.parameters(), self.actor_grad_clip
+            )
+        self.amp.step(self.actor_opt)
         if self.use_pixels and self.encoder is not None:
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.update()
 
         # step lr scheduler every batch
         # this is different from standard pytorch behavior
@@ -11,6 +11,7 @@ import torch.nn.functional as F
 from torch.distributions import Distribution
 
 from robobase import utils
+from robobase.intrinsic_reward_module.state_entropy import StateEntropy
 from robobase.method.core import OffPolicyMethod
 from robobase.models.fusion import FusionModule
 from robobase.models.encoder import EncoderModule
@@ -118,7 +119,8 @@ class Actor(nn.Module):
             net_ins["low_dim_obs"] = low_dim_obs
         if fused_view_feats is not None:
             net_ins["fused_view_feats"] = fused_view_feats
-        mu = self.actor_model(net_ins)
+        # Distributions are computed in float32 under mixed precision.
+        mu = self.actor_model(net_ins).float()
         mu = torch.tanh(mu)
         # Make deterministic
         dist = utils.TruncatedNormal(mu, torch.zeros_like(mu))
@@ -157,6 +159,9 @@ class ActorCritic(OffPolicyMethod, ABC):
         distributional_critic_atoms: int,
         distributional_critic_transform: bool,
         *args,
+        state_entropy_k: int = 5,
+        state_entropy_bank_size: int = 100000,
+        state_entropy_projection_dim: Optional[int] = None,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
@@ -210,6 +215,12 @@ class ActorCritic(OffPolicyMethod, ABC):
             ) = self.build_critic()
 
         self.state_ent_stats = utils.TorchRunningMeanStd(shape=(1,), device=self.device)
+        self.state_entropy_k = state_entropy_k
+        self.state_entropy_bank_size = state_entropy_bank_size
+        self.state_entropy_projection_dim = state_entropy_projection_dim
+        # Only used for unsupervised pretraining, so built on the first
+        # `observe_states` call.
+        self.state_entropy = None
 
     def reset_critic(self):
         self.critic, self.critic_target, self.critic_opt = self.build_critic()
@@ -345,19 +356,22 @@ class ActorCritic(OffPolicyMethod, ABC):
         return low_dim_in_size
 
     def update_encoder_rep(self, rgb_obs):
-        loss = self.encoder.calculate_loss(rgb_obs)
+        with self.amp.autocast():
+            loss = self.encoder.calculate_loss(rgb_obs)
         if loss is None:
             return {}
         self.encoder.zero_grad(set_to_none=True)
-        loss.backward()
-        self.encoder_opt.step()
+        self.amp.backward(loss)
+        self.amp.step(self.encoder_opt)
+        self.amp.update()
         return {"encoder_rep_loss": loss.item()}
 
     def update_view_fusion_rep(self, rgb_feats):
         # NOTE: This method will always try to update the encoder
         # Whether to update the encoder is the responsibility of view_fusion_model.
         # It should detach rgb_feats if it does not want to update the encoder.
-        loss = self.view_fusion.calculate_loss(rgb_feats)
+        with self.amp.autocast():
+            loss = self.view_fusion.calculate_loss(rgb_feats)
         if loss is None:
             return {}
         assert (
@@ -365,9 +379,10 @@ class ActorCritic(OffPolicyMethod, ABC):
         ), "Use `update_encoder_rep` to only update the encoder parameters."
         self.encoder.zero_grad(set_to_none=True)
         self.view_fusion_opt.zero_grad(set_to_none=True)
-        loss.backward()
-        self.encoder_opt.step()
-        self.view_fusion_opt.step()
+        self.amp.backward(loss)
+        self.amp.step(self.encoder_opt)
+        self.amp.step(self.view_fusion_opt)
+        self.amp.update()
         return {"view_fusion_rep_loss": loss.item()}
 
     def act(self, observations: dict[str, torch.Tensor], step: int, eval_mode: bool):
@@ -453,26 +468,28 @@ class ActorCritic(OffPolicyMethod, ABC):
             )
 
         metrics = dict()
-        target_qs = self.calculate_target_q(
-            step,
-            next_low_dim_obs,
-            next_fused_view_feats,
-            next_time_obs,
-            reward,
-            discount,
-            bootstrap,
-            updating_intrinsic_critic,
-        )
+        with self.amp.autocast():
+            target_qs = self.calculate_target_q(
+                step,
+                next_low_dim_obs,
+                next_fused_view_feats,
+                next_time_obs,
+                reward,
+                discount,
+                bootstrap,
+                updating_intrinsic_critic,
+            )
 
-        qs = critic(low_dim_obs, fused_view_feats, action, time_obs)
+            qs = critic(low_dim_obs, fused_view_feats, action, time_obs)
 
-        if self.distributional_critic:
-            q_critic_loss = critic.compute_distributional_critic_loss(qs, target_qs)
-        else:
-            target_qs = target_qs.repeat(1, self.num_critics)
-            q_critic_loss = F.mse_loss(qs, target_qs, reduction="none").mean(
-                -1, keepdim=True
-            )
+            if self.distributional_critic:
+                q_critic_loss = critic.compute_distributional_critic_loss(qs, target_qs)
+            else:
+                target_qs = target_qs.repeat(1, self.num_critics)
+                q_critic_loss = F.mse_loss(qs, target_qs, reduction="none").mean(
+                    -1, keepdim=True
+                )
+        q_critic_loss = q_critic_loss.float()
         critic_loss = q_critic_loss * loss_coeff.unsqueeze(1)
 
         # Compute priority
@@ -492,18 +509,21 @@ class ActorCritic(OffPolicyMethod, ABC):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         critic_opt.zero_grad(set_to_none=True)
-        critic_loss.backward()
+        self.amp.backward(critic_loss)
         if self.critic_grad_clip:
-            nn.utils.clip_grad_norm_(critic.parameters(), self.critic_grad_clip)
-        critic_opt.step()
+            self.amp.clip_grad_norm_(
+                critic_opt, critic.parameters(), self.critic_grad_clip
+            )
+        self.amp.step(critic_opt)
         if self.use_pixels and self.encoder is not None:
             if self.critic_grad_clip:
-                nn.utils.clip_grad_norm_(
-                    self.encoder.parameters(), self.critic_grad_clip
+                self.amp.clip_grad_norm_(
+                    self.encoder_opt, self.encoder.parameters(), self.critic_grad_clip
                 )
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.update()
         return metrics
 
     def get_bc_loss(self, predicted_action, buffer_action, demos):
@@ -543,32 +563,36 @@ class ActorCritic(OffPolicyMethod, ABC):
     ):
         metrics = dict()
 
-        dist = self.actor(low_dim_obs, fused_view_feats)
-        action = dist.sample()
-        log_prob = dist.log_prob(action).sum(-1, keepdim=True)
-        base_actor_loss = self._compute_actor_loss(
-            low_dim_obs, fused_view_feats, action, time_obs, loss_coeff, self.critic
-        )
-        intr_actor_loss = 0
-        if self.intrinsic_reward_module is not None:
-            intr_actor_loss = self._compute_actor_loss(
-                low_dim_obs,
-                fused_view_feats,
-                action,
-                time_obs,
-                loss_coeff,
-                self.intr_critic,
+        with self.amp.autocast():
+            dist = self.actor(low_dim_obs, fused_view_feats)
+            action = dist.sample()
+            log_prob = dist.log_prob(action).sum(-1, keepdim=True)
+            base_actor_loss = self._compute_actor_loss(
+                low_dim_obs, fused_view_feats, action, time_obs, loss_coeff, self.critic
             )
-        bc_metrics, bc_loss = self.get_bc_loss(dist.mean, act, demos)
-        metrics.update(bc_metrics)
-        actor_loss = base_actor_loss + intr_actor_loss + bc_loss
+            intr_actor_loss = 0
+            if self.intrinsic_reward_module is not None:
+                intr_actor_loss = self._compute_actor_loss(
+                    low_dim_obs,
+                    fused_view_feats,
+                    action,
+                    time_obs,
+                    loss_coeff,
+                    self.intr_critic,
+                )
+            bc_metrics, bc_loss = self.get_bc_loss(dist.mean, act, demos)
+            metrics.update(bc_metrics)
+            actor_loss = base_actor_loss + intr_actor_loss + bc_loss
 
         # optimize actor
         self.actor_opt.zero_grad(set_to_none=True)
-        actor_loss.backward()
+        self.amp.backward(actor_loss)
         if self.actor_grad_clip:
-            nn.utils.clip_grad_norm_(self.actor.parameters(), self.actor_grad_clip)
-        self.actor_opt.step()
+            self.amp.clip_grad_norm_(
+                self.actor_opt, self.actor.parameters(), self.actor_grad_clip
+            )
+        self.amp.step(self.actor_opt)
+        self.amp.update()
 
         if self.logging:
             metrics["mean_act"] = dist.mean.mean().item()
@@ -685,10 +709,11 @@ class ActorCritic(OffPolicyMethod, ABC):
         metrics.update(self.update_encoder_rep(rgb_obs.float()))
 
         # Extract the features from the encoder
-        multi_view_rgb_feats = self.encoder(rgb_obs.float())
+        with self.amp.autocast():
+            multi_view_rgb_feats = self.encoder(rgb_obs.float())
 
-        with torch.no_grad():
-            next_multi_view_rgb_feats = self.encoder(next_rgb_obs.float())
+            with torch.no_grad():
+                next_multi_view_rgb_feats = self.encoder(next_rgb_obs.float())
 
         return metrics, multi_view_rgb_feats, next_multi_view_rgb_feats
 
@@ -702,13 +727,15 @@ class ActorCritic(OffPolicyMethod, ABC):
             # Extract features from the newly updated encoder
             if len(view_fusion_metrics) != 0:
                 # TODO: Find a better way to check if weights updated
-                multi_view_feats = self.encoder(rgb_obs.float())
+                with self.amp.autocast():
+                    multi_view_feats = self.encoder(rgb_obs.float())
 
         # Fuse the multi view features (e.g., AvgPool, MLP, Identity, ..)
-        fused_view_feats = self.view_fusion(multi_view_feats)
+        with self.amp.autocast():
+            fused_view_feats = self.view_fusion(multi_view_feats)
 
-        with torch.no_grad():
-            next_fused_view_feats = self.view_fusion(next_multi_view_feats)
+            with torch.no_grad():
+                next_fused_view_feats = self.view_fusion(next_multi_view_feats)
 
         return metrics, fused_view_feats, next_fused_view_feats
 
@@ -783,8 +810,9 @@ class ActorCritic(OffPolicyMethod, ABC):
             )
 
         if self.intrinsic_reward_module is not None:
-            intrinsic_rewards = self.intrinsic_reward_module.compute_irs(batch, step)
-            self.intrinsic_reward_module.update(batch)
+            intrinsic_rewards = self.intrinsic_reward_module.compute_irs_and_update(
+                batch, step, fused_view_feats, next_fused_view_feats
+            )
             metrics.update(
                 self.update_critic(
                     low_dim_obs,
@@ -824,17 +852,26 @@ class ActorCritic(OffPolicyMethod, ABC):
 
         return metrics
 
-    def _extract_large_batch(
-        self, replay_iter: Iterator[dict[str, torch.Tensor]]
-    ) -> dict[str, torch.Tensor]:
-        batch = []
-        # Extract 10 batches from the replay iterator and concatenate them
-        for _ in range(20):
-            batch.append(next(replay_iter))
-        batch = {key: torch.cat([b[key] for b in batch], dim=0) for key in batch[0]}
-
-        batch = {k: v.to(self.device) for k, v in batch.items()}
-        return batch
+    def observe_states(self, observations: dict[str, torch.Tensor]):
+        """Adds the states of newly collected env transitions to the state entropy
+        bank, which `update_state_entropy` computes its rewards against.
+
+        Args:
+            observations: The observations of the train envs, of shape (N, T, ...).
+        """
+        if self.low_dim_size == 0:
+            raise ValueError("State entropy requires low_dim_state observations.")
+        if self.state_entropy is None:
+            self.state_entropy = StateEntropy(
+                int(np.prod(self.observation_space["low_dim_state"].shape)),
+                self.device,
+                capacity=self.state_entropy_bank_size,
+                k=self.state_entropy_k,
+                projection_dim=self.state_entropy_projection_dim,
+            )
+        self.state_entropy.add(
+            torch.as_tensor(observations["low_dim_state"], device=self.device)
+        )
 
     def update_state_entropy(
         self,
@@ -857,16 +894,13 @@ class ActorCritic(OffPolicyMethod, ABC):
             loss_coeff,
         ) = self.extract_batch(replay_iter)
 
-        large_batch = self._extract_large_batch(replay_iter)
+        if self.state_entropy is None or len(self.state_entropy) == 0:
+            raise ValueError("The state entropy bank is empty, see `observe_states`.")
 
         low_dim_obs = next_low_dim_obs = None
         fused_view_feats = next_fused_view_feats = None
         if self.low_dim_size > 0:
             low_dim_obs, next_low_dim_obs = self.extract_low_dim_state(batch)
-            # use only the low-dim obs from the large batch
-            full_low_dim_obs, full_next_low_dim_obs = self.extract_low_dim_state(
-                large_batch
-            )
 
         if self.use_pixels:
             rgb_obs, next_rgb_obs, rgb_metrics = self.extract_pixels(batch)
@@ -887,7 +921,8 @@ class ActorCritic(OffPolicyMethod, ABC):
                     -1, self.time_dim, *next_fused_view_feats.shape[1:]
                 )
 
-        state_entropy = utils.compute_state_entropy(low_dim_obs, full_low_dim_obs, k=5)
+        # The sampled states were added to the bank when they were collected.
+        state_entropy = self.state_entropy.compute(low_dim_obs, update=False)
         self.state_ent_stats.update(state_entropy)
         state_entropy = state_entropy / self.state_ent_stats.std
 
@@ -13,7 +13,6 @@ from robobase.models.encoder import EncoderModule
 from robobase.models.fully_connected import FullyConnectedModule
 
 from robobase.method.core import Method
-from diffusers.optimization import get_scheduler
 
 from robobase.replay_buffer.replay_buffer import ReplayBuffer
 from robobase.method.utils import (
@@ -104,6 +103,8 @@ class BC(Method):
 
         self.lr_scheduler = None
         if self.adaptive_lr:
+            from diffusers.optimization import get_scheduler
+
             self.lr_scheduler = get_scheduler(
                 name="cosine",
                 optimizer=self.actor_opt,
@@ -227,10 +228,11 @@ class BC(Method):
 
     def update_actor(self, low_dim_obs, fused_view_feats, action, loss_coeff):
         metrics = dict()
-        action_pred = self.actor(low_dim_obs, fused_view_feats)
+        with self.amp.autocast():
+            action_pred = self.actor(low_dim_obs, fused_view_feats)
         # TOOD check trajectory horrizon
         mse_loss = (
-            F.mse_loss(action_pred, action, reduction="none")
+            F.mse_loss(action_pred.float(), action, reduction="none")
             .mean(-1)
             .mean(-1, keepdims=True)
         )
@@ -247,14 +249,17 @@ class BC(Method):
 
         # step optimizer
         self.actor_opt.zero_grad(set_to_none=True)
-        actor_loss.backward()
+        self.amp.backward(actor_loss)
         if self.actor_grad_clip:
-            nn.utils.clip_grad_norm_(self.actor.parameters(), self.actor_grad_clip)
-        self.actor_opt.step()
+            self.amp.clip_grad_norm_(
+                self.actor_opt, self.actor.parameters(), self.actor_grad_clip
+            )
+        self.amp.step(self.actor_opt)
         if self.use_pixels and self.encoder is not None:
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.update()
 
         # step lr scheduler every batch
         # this is different from standard pytorch behavior
@@ -272,7 +277,8 @@ class BC(Method):
         metrics.update(self.update_encoder_rep(rgb_obs.float()))
 
         # Extract the features from the encoder
-        multi_view_rgb_feats = self.encoder(rgb_obs.float())
+        with self.amp.autocast():
+            multi_view_rgb_feats = self.encoder(rgb_obs.float())
 
         return metrics, multi_view_rgb_feats
 
@@ -286,27 +292,32 @@ class BC(Method):
             # Extract features from the newly updated encoder
             if len(view_fusion_metrics) != 0:
                 # TODO: Find a better way to check if weights updated
-                multi_view_feats = self.encoder(rgb_obs.float())
+                with self.amp.autocast():
+                    multi_view_feats = self.encoder(rgb_obs.float())
 
         # Fuse the multi view features (e.g., AvgPool, MLP, Identity, ..)
-        fused_view_feats = self.view_fusion(multi_view_feats)
+        with self.amp.autocast():
+            fused_view_feats = self.view_fusion(multi_view_feats)
 
         return metrics, fused_view_feats
 
     def update_encoder_rep(self, rgb_obs):
-        loss = self.encoder.calculate_loss(rgb_obs)
+        with self.amp.autocast():
+            loss = self.encoder.calculate_loss(rgb_obs)
         if loss is None:
             return {}
         self.encoder.zero_grad(set_to_none=True)
-        loss.backward()
-        self.encoder_opt.step()
+        self.amp.backward(loss)
+        self.amp.step(self.encoder_opt)
+        self.amp.update()
         return {"encoder_rep_loss": loss.item()}
 
     def update_view_fusion_rep(self, rgb_feats):
         # NOTE: This method will always try to update the encoder
         # Whether to update the encoder is the responsibility of view_fusion_model.
         # It should detach rgb_feats if it does not want to update the encoder.
-        loss = self.view_fusion.calculate_loss(rgb_feats)
+        with self.amp.autocast():
+            loss = self.view_fusion.calculate_loss(rgb_feats)
         if loss is None:
             return {}
         assert (
@@ -314,9 +325,10 @@ class BC(Method):
         ), "Use `update_encoder_rep` to only update the encoder parameters."
         self.encoder.zero_grad(set_to_none=True)
         self.view_fusion_opt.zero_grad(set_to_none=True)
-        loss.backward()
-        self.encoder_opt.step()
-        self.view_fusion_opt.step()
+        self.amp.backward(loss)
+        self.amp.step(self.encoder_opt)
+        self.amp.step(self.view_fusion_opt)
+        self.amp.update()
         return {"view_fusion_rep_loss": loss.item()}
 
     def _act(self, observations: dict[str, torch.Tensor], eval_mode: bool):
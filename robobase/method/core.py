@@ -6,7 +6,10 @@ import torch
 import torch.nn as nn
 from gymnasium import spaces
 
+from robobase.amp import MixedPrecision
+from robobase.compiler import ModuleCompiler
 from robobase.intrinsic_reward_module.core import IntrinsicRewardModule
+from robobase.method.utils import match_observation_keys
 from robobase.replay_buffer.replay_buffer import ReplayBuffer
 
 
@@ -17,6 +20,20 @@ Metrics: TypeAlias = dict[str, np.ndarray]
 
 
 class Method(nn.Module, ABC):
+    # Regexes of the observation keys the method reads. Replay buffers feeding the
+    # method only store the observations matching one of them.
+    observation_key_patterns = (r"^low_dim_state$", r"^time$", r"rgb", r"^lang_tokens$")
+    # Networks compiled by `compile_modules`. Missing networks are skipped.
+    compiled_module_names = (
+        "encoder",
+        "view_fusion",
+        "actor",
+        "critic",
+        "critic_target",
+        "intr_critic",
+        "intr_critic_target",
+    )
+
     def __init__(
         self,
         observation_space: spaces.Dict,
@@ -28,6 +45,7 @@ class Method(nn.Module, ABC):
         frame_stack_on_channel: bool,
         intrinsic_reward_module: Optional[IntrinsicRewardModule] = None,
         is_rl: bool = False,
+        amp_dtype: Optional[str] = None,
     ):
         super().__init__()
         self.observation_space = observation_space
@@ -42,6 +60,13 @@ class Method(nn.Module, ABC):
         self._eval_env_running = False
         self.logging = False
         self.is_rl = is_rl
+        self.amp = MixedPrecision(device, amp_dtype)
+
+    @property
+    def observation_keys(self) -> list[str]:
+        return match_observation_keys(
+            self.observation_space, self.observation_key_patterns
+        )
 
     @property
     def random_explore_action(self) -> torch.Tensor:
@@ -78,6 +103,13 @@ class Method(nn.Module, ABC):
     def set_eval_env_running(self, value: bool):
         self._eval_env_running = value
 
+    def compile_modules(self, compiler: ModuleCompiler):
+        """Compiles the forward of the networks in `compiled_module_names`."""
+        for name in self.compiled_module_names:
+            module = getattr(self, name, None)
+            if isinstance(module, nn.Module):
+                compiler.compile(module, f"{type(self).__name__}.{name}")
+
 
 class ImitationLearningMethod(Method, ABC):
     pass
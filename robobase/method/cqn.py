@@ -232,7 +232,8 @@ class C2FCritic(nn.Module):
             next_time_obs,
         )
         shape = next_q_probs_a.shape  # [B, L, D, atoms]
-        next_q_probs_a = next_q_probs_a.view(-1, self.atoms)
+        # The projection is computed in float32 under mixed precision.
+        next_q_probs_a = next_q_probs_a.float().view(-1, self.atoms)
         batch_size = next_q_probs_a.shape[0]
 
         # Compute Tz
@@ -389,15 +390,31 @@ class CQN(ValueBased):
             )
 
         metrics = dict()
-        target_q_probs_a = self.calculate_target_q(
-            next_low_dim_obs,
-            next_fused_view_feats,
-            next_action,
-            next_time_obs,
-            reward,
-            discount,
-            bootstrap,
-            updating_intrinsic_critic,
+        with self.amp.autocast():
+            target_q_probs_a = self.calculate_target_q(
+                next_low_dim_obs,
+                next_fused_view_feats,
+                next_action,
+                next_time_obs,
+                reward,
+                discount,
+                bootstrap,
+                updating_intrinsic_critic,
+            )
+            log_q_probs_a, q_probs, q_probs_a = critic(
+                low_dim_obs,
+                fused_view_feats,
+                action,
+                time_obs,
+                log_softmax=True,
+                return_q_probs=True,
+            )
+        # Distributional losses are computed in float32 under mixed precision.
+        target_q_probs_a = target_q_probs_a.float()
+        log_q_probs_a, q_probs, q_probs_a = (
+            log_q_probs_a.float(),
+            q_probs.float(),
+            q_probs_a.float(),
         )
         if self.centralized_critic:
             # Average target Q distributions across action dimensions
@@ -405,15 +422,6 @@ class CQN(ValueBased):
                 -2, keepdim=True
             ).repeat_interleave(target_q_probs_a.shape[-2], -2)
 
-        log_q_probs_a, q_probs, q_probs_a = critic(
-            low_dim_obs,
-            fused_view_feats,
-            action,
-            time_obs,
-            log_softmax=True,
-            return_q_probs=True,
-        )
-
         if logging:
             entropy = -(q_probs_a * torch.log(q_probs_a + 1e-9)).sum(-1).mean()
             target_entropy = (
@@ -480,24 +488,25 @@ class CQN(ValueBased):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         critic_opt.zero_grad(set_to_none=True)
-        critic_loss.backward()
+        self.amp.backward(critic_loss)
         if self.critic_grad_clip:
-            critic_norm = nn.utils.clip_grad_norm_(
-                critic.parameters(), self.critic_grad_clip
+            critic_norm = self.amp.clip_grad_norm_(
+                critic_opt, critic.parameters(), self.critic_grad_clip
             )
             if logging:
                 metrics[f"{lp}critic_norm"] = critic_norm.item()
-        critic_opt.step()
+        self.amp.step(critic_opt)
         if self.use_pixels and self.encoder is not None:
             if self.critic_grad_clip:
-                encoder_norm = nn.utils.clip_grad_norm_(
-                    self.encoder.parameters(), self.critic_grad_clip
+                encoder_norm = self.amp.clip_grad_norm_(
+                    self.encoder_opt, self.encoder.parameters(), self.critic_grad_clip
                 )
                 if logging:
                     metrics[f"{lp}encoder_norm"] = encoder_norm.item()
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.update()
         return metrics
 
     def update(
@@ -592,10 +601,9 @@ class CQN(ValueBased):
                 )
 
             if self.intrinsic_reward_module is not None:
-                intrinsic_rewards = self.intrinsic_reward_module.compute_irs(
-                    batch, step
+                intrinsic_rewards = self.intrinsic_reward_module.compute_irs_and_update(
+                    batch, step, fused_view_feats, next_fused_view_feats
                 )
-                self.intrinsic_reward_module.update(batch)
                 metrics.update(
                     self.update_critic(
                         low_dim_obs,
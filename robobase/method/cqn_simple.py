@@ -269,23 +269,25 @@ class CQNSimple(ValueBased):
             )
 
         metrics = dict()
-        with torch.no_grad():
-            _, target_v = self.critic_target(
-                next_low_dim_obs,
-                next_fused_view_feats,
-                next_action,
-                next_time_obs,
-            )
-            target_q = (
-                reward.unsqueeze(-1)
-                + bootstrap.unsqueeze(-1) * discount.unsqueeze(-1) * target_v
+        with self.amp.autocast():
+            with torch.no_grad():
+                _, target_v = self.critic_target(
+                    next_low_dim_obs,
+                    next_fused_view_feats,
+                    next_action,
+                    next_time_obs,
+                )
+            qs, qs_a = critic(
+                low_dim_obs,
+                fused_view_feats,
+                action,
+                time_obs,
             )
-
-        qs, qs_a = critic(
-            low_dim_obs,
-            fused_view_feats,
-            action,
-            time_obs,
+        # Losses are computed in float32 under mixed precision.
+        target_v, qs, qs_a = target_v.float(), qs.float(), qs_a.float()
+        target_q = (
+            reward.unsqueeze(-1)
+            + bootstrap.unsqueeze(-1) * discount.unsqueeze(-1) * target_v
         )
 
         # q_critic_loss = F.mse_loss(qs_a, target_q, reduction="none").mean([1, 2])
@@ -341,24 +343,25 @@ class CQNSimple(ValueBased):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         critic_opt.zero_grad(set_to_none=True)
-        critic_loss.backward()
+        self.amp.backward(critic_loss)
         if self.critic_grad_clip:
-            critic_norm = nn.utils.clip_grad_norm_(
-                critic.parameters(), self.critic_grad_clip
+            critic_norm = self.amp.clip_grad_norm_(
+                critic_opt, critic.parameters(), self.critic_grad_clip
             )
             if logging:
                 metrics[f"{lp}critic_norm"] = critic_norm.item()
-        critic_opt.step()
+        self.amp.step(critic_opt)
         if self.use_pixels and self.encoder is not None:
             if self.critic_grad_clip:
-                encoder_norm = nn.utils.clip_grad_norm_(
-                    self.encoder.parameters(), self.critic_grad_clip
+                encoder_norm = self.amp.clip_grad_norm_(
+                    self.encoder_opt, self.encoder.parameters(), self.critic_grad_clip
                 )
                 if logging:
                     metrics[f"{lp}encoder_norm"] = encoder_norm.item()
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.update()
         return metrics
 
     def update(
@@ -453,10 +456,9 @@ class CQNSimple(ValueBased):
                 )
 
             if self.intrinsic_reward_module is not None:
-                intrinsic_rewards = self.intrinsic_reward_module.compute_irs(
-                    batch, step
+                intrinsic_rewards = self.intrinsic_reward_module.compute_irs_and_update(
+                    batch, step, fused_view_feats, next_fused_view_feats
                 )
-                self.intrinsic_reward_module.update(batch)
                 metrics.update(
                     self.update_critic(
                         low_dim_obs,
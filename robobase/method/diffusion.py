@@ -208,9 +208,10 @@ class Diffusion(BC):
 
     def update_actor(self, low_dim_obs, fused_view_feats, action, loss_coeff):
         metrics = dict()
-        noise_pred, noise = self.actor(low_dim_obs, fused_view_feats, action)
+        with self.amp.autocast():
+            noise_pred, noise = self.actor(low_dim_obs, fused_view_feats, action)
         mse_loss = (
-            F.mse_loss(noise_pred, noise, reduction="none")
+            F.mse_loss(noise_pred.float(), noise.float(), reduction="none")
             .mean(-1)
             .mean(-1, keepdims=True)
         )
@@ -224,18 +225,21 @@ class Diffusion(BC):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         self.actor_opt.zero_grad(set_to_none=True)
-        actor_loss.backward()
+        self.amp.backward(actor_loss)
         if self.actor_grad_clip:
-            nn.utils.clip_grad_norm_(self.actor.parameters(), self.actor_grad_clip)
-        self.actor_opt.step()
+            self.amp.clip_grad_norm_(
+                self.actor_opt, self.actor.parameters(), self.actor_grad_clip
+            )
+        self.amp.step(self.actor_opt)
         if self.use_pixels and self.encoder is not None:
             if self.actor_grad_clip:
-                nn.utils.clip_grad_norm_(
-                    self.encoder.parameters(), self.critic_grad_clip
+                self.amp.clip_grad_norm_(
+                    self.encoder_opt, self.encoder.parameters(), self.critic_grad_clip
                 )
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.update()
 
         # step lr scheduler every batch
         # this is different from standard pytorch behavior
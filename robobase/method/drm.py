@@ -210,24 +210,28 @@ class DrM(DrQV2):
         critic = self.intr_critic if updating_intrinsic_critic else self.critic
         value = self.intr_value if updating_intrinsic_critic else self.value
         value_opt = self.intr_value_opt if updating_intrinsic_critic else self.value_opt
-        qs = critic(low_dim_obs, fused_view_feats, action, time_obs)
-        if self.distributional_critic:
-            qs = critic.from_dist(qs)
-        q = qs.min(-1, keepdim=True)[0]
-        v = value(low_dim_obs, fused_view_feats, time_obs)
-        vf_err = v - q
-        vf_weight = torch.where(
-            vf_err > 0, (1 - self.exploitation_expectile), self.exploitation_expectile
-        )
-        vf_loss = (vf_weight * (vf_err**2)).mean()
+        with self.amp.autocast():
+            qs = critic(low_dim_obs, fused_view_feats, action, time_obs)
+            if self.distributional_critic:
+                qs = critic.from_dist(qs)
+            q = qs.min(-1, keepdim=True)[0]
+            v = value(low_dim_obs, fused_view_feats, time_obs)
+            vf_err = v - q
+            vf_weight = torch.where(
+                vf_err > 0,
+                (1 - self.exploitation_expectile),
+                self.exploitation_expectile,
+            )
+            vf_loss = (vf_weight * (vf_err**2)).mean()
 
         if self.logging:
             metrics["v_net"] = v.mean().item()
             metrics["vf_loss"] = vf_loss.item()
 
         value_opt.zero_grad(set_to_none=True)
-        vf_loss.backward()
-        value_opt.step()
+        self.amp.backward(vf_loss)
+        self.amp.step(value_opt)
+        self.amp.update()
 
         return metrics
 
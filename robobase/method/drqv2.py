@@ -1,5 +1,4 @@
 import torch
-import torch.nn as nn
 from torch.distributions import Distribution
 
 from robobase import utils
@@ -15,7 +14,8 @@ class Actor(BaseActor):
             net_ins["low_dim_obs"] = low_dim_obs
         if fused_view_feats is not None:
             net_ins["fused_view_feats"] = fused_view_feats
-        mu = self.actor_model(net_ins)
+        # Distributions are computed in float32 under mixed precision.
+        mu = self.actor_model(net_ins).float()
         mu = torch.tanh(mu)
         std = torch.ones_like(mu) * std
         dist = utils.TruncatedNormal(mu, std)
@@ -23,11 +23,23 @@ class Actor(BaseActor):
 
 
 class DrQV2(ActorCritic):
-    def __init__(self, stddev_schedule, stddev_clip, use_augmentation, *args, **kwargs):
+    def __init__(
+        self,
+        stddev_schedule,
+        stddev_clip,
+        use_augmentation,
+        *args,
+        augmentation_mode: str = "grid_sample",
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self.stddev_schedule = stddev_schedule
         self.stddev_clip = stddev_clip
-        self.aug = RandomShiftsAug(pad=4) if use_augmentation else lambda x: x
+        self.aug = (
+            RandomShiftsAug(pad=4, mode=augmentation_mode)
+            if use_augmentation
+            else lambda x: x
+        )
 
     def build_actor(self):
         input_shapes = self.get_fully_connected_inputs()
@@ -83,33 +95,37 @@ class DrQV2(ActorCritic):
         metrics = dict()
 
         std = self.get_std(step)
-        dist = self.actor(low_dim_obs, fused_view_feats, std)
-        action = dist.sample(clip=self.stddev_clip)
-        log_prob = dist.log_prob(action).sum(-1, keepdim=True)
+        with self.amp.autocast():
+            dist = self.actor(low_dim_obs, fused_view_feats, std)
+            action = dist.sample(clip=self.stddev_clip)
+            log_prob = dist.log_prob(action).sum(-1, keepdim=True)
 
-        base_actor_loss = self._compute_actor_loss(
-            low_dim_obs, fused_view_feats, action, time_obs, loss_coeff, self.critic
-        )
-        intr_actor_loss = 0
-        if self.intrinsic_reward_module is not None:
-            intr_actor_loss = self._compute_actor_loss(
-                low_dim_obs,
-                fused_view_feats,
-                action,
-                time_obs,
-                loss_coeff,
-                self.intr_critic,
+            base_actor_loss = self._compute_actor_loss(
+                low_dim_obs, fused_view_feats, action, time_obs, loss_coeff, self.critic
             )
-        bc_metrics, bc_loss = self.get_bc_loss(dist.mean, act, demos)
-        metrics.update(bc_metrics)
-        actor_loss = base_actor_loss + intr_actor_loss + bc_loss
+            intr_actor_loss = 0
+            if self.intrinsic_reward_module is not None:
+                intr_actor_loss = self._compute_actor_loss(
+                    low_dim_obs,
+                    fused_view_feats,
+                    action,
+                    time_obs,
+                    loss_coeff,
+                    self.intr_critic,
+                )
+            bc_metrics, bc_loss = self.get_bc_loss(dist.mean, act, demos)
+            metrics.update(bc_metrics)
+            actor_loss = base_actor_loss + intr_actor_loss + bc_loss
 
         # optimize actor
         self.actor_opt.zero_grad(set_to_none=True)
-        actor_loss.backward()
+        self.amp.backward(actor_loss)
         if self.actor_grad_clip:
-            nn.utils.clip_grad_norm_(self.actor.parameters(), self.actor_grad_clip)
-        self.actor_opt.step()
+            self.amp.clip_grad_norm_(
+                self.actor_opt, self.actor.parameters(), self.actor_grad_clip
+            )
+        self.amp.step(self.actor_opt)
+        self.amp.update()
 
         if self.logging:
             metrics["mean_act"] = dist.mean.mean().item()
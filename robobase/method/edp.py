@@ -410,28 +410,30 @@ class DiffusionRL(ActorCritic):
 
         # calculate diffusion loss
         # NOTE: loss_coeff might not be uniform here
-        noise_preds, noises, _, _ = self.actor.add_noise_and_predict(obs, action)
-        mse_loss = (
-            F.mse_loss(noise_preds, noises, reduction="none")
-            .mean(-1)
-            .mean(-1, keepdims=True)
-        )
-        diff_loss = (mse_loss * loss_coeff.unsqueeze(1)).mean()
+        with self.amp.autocast():
+            noise_preds, noises, _, _ = self.actor.add_noise_and_predict(obs, action)
+            mse_loss = (
+                F.mse_loss(noise_preds.float(), noises.float(), reduction="none")
+                .mean(-1)
+                .mean(-1, keepdims=True)
+            )
+            diff_loss = (mse_loss * loss_coeff.unsqueeze(1)).mean()
 
-        # calculate guidance loss from RL objectives
-        guide_loss = self.calc_edp_guide_loss(obs, action, metrics)
+            # calculate guidance loss from RL objectives
+            guide_loss = self.calc_edp_guide_loss(obs, action, metrics).float()
 
         # calculate total loss
         total_loss = self.diff_coeff * diff_loss + self.guide_coeff * guide_loss
 
         # Gradient descent
         self.actor_opt.zero_grad()
-        total_loss.backward()
+        self.amp.backward(total_loss)
         if self.actor_grad_clip:
-            actor_grad_norm = nn.utils.clip_grad_norm_(
-                self.actor.parameters(), self.actor_grad_clip
+            actor_grad_norm = self.amp.clip_grad_norm_(
+                self.actor_opt, self.actor.parameters(), self.actor_grad_clip
             )
-        self.actor_opt.step()
+        self.amp.step(self.actor_opt)
+        self.amp.update()
 
         # update Exponential Moving Average of the model weights
         self.actor.ema.step(self.actor.actor_model)
@@ -469,23 +471,26 @@ class DiffusionRL(ActorCritic):
         critic, critic_opt, value_fn = self._get_critics()
 
         # calculate target_qs and qs
-        target_qs = self.calculate_target_q(
-            step,
-            actions,
-            next_low_dim_obs,
-            next_fused_view_feats,
-            next_time_obs,
-            reward,
-            discount,
-            bootstrap,
-            updating_intrinsic_critic,
-        )
-        target_qs = target_qs.repeat(1, self.num_critics)
-        qs = critic(low_dim_obs, fused_view_feats, actions, time_obs)
+        with self.amp.autocast():
+            target_qs = self.calculate_target_q(
+                step,
+                actions,
+                next_low_dim_obs,
+                next_fused_view_feats,
+                next_time_obs,
+                reward,
+                discount,
+                bootstrap,
+                updating_intrinsic_critic,
+            )
+            qs = critic(low_dim_obs, fused_view_feats, actions, time_obs)
 
-        # calculate predicted value of state for iql
-        dummy_actions = torch.zeros_like(actions)  # [bs, act_seq, act_dim]
-        v = value_fn(low_dim_obs, fused_view_feats, dummy_actions, time_obs)
+            # calculate predicted value of state for iql
+            dummy_actions = torch.zeros_like(actions)  # [bs, act_seq, act_dim]
+            v = value_fn(low_dim_obs, fused_view_feats, dummy_actions, time_obs)
+        # IQL losses are computed in float32 under mixed precision.
+        target_qs, qs, v = target_qs.float(), qs.float(), v.float()
+        target_qs = target_qs.repeat(1, self.num_critics)
         min_q = qs.min(-1, keepdim=True)[0]
 
         # invoke iql
@@ -503,12 +508,13 @@ class DiffusionRL(ActorCritic):
 
         # optimize encoder and critic
         critic_opt.zero_grad(set_to_none=True)
-        critic_loss.backward()
+        self.amp.backward(critic_loss)
         if self.critic_grad_clip:
-            critic_grad_norm = nn.utils.clip_grad_norm_(
-                critic.parameters(), self.critic_grad_clip
+            critic_grad_norm = self.amp.clip_grad_norm_(
+                critic_opt, critic.parameters(), self.critic_grad_clip
             )
-        critic_opt.step()
+        self.amp.step(critic_opt)
+        self.amp.update()
         metrics["critic_grad_norm"] = critic_grad_norm.item()
 
         return metrics
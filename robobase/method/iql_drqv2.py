@@ -1,7 +1,6 @@
 from copy import deepcopy
 
 import torch
-import torch.nn as nn
 import torch.nn.functional as F
 
 from robobase.method.drqv2 import DrQV2
@@ -93,33 +92,42 @@ class IQLDrQV2(DrQV2):
         metrics = dict()
 
         std = self.get_std(step)
-        dist = self.actor(low_dim_obs, fused_view_feats, std)
-        log_prob = dist.log_prob(act).sum(-1, keepdim=True)
+        with self.amp.autocast():
+            dist = self.actor(low_dim_obs, fused_view_feats, std)
+            log_prob = dist.log_prob(act).sum(-1, keepdim=True)
 
-        with torch.no_grad():
-            adv = self._calc_adv(
-                low_dim_obs, fused_view_feats, act, time_obs, self.critic, self.value_fn
-            )
-            intrinsic_actor_loss = 0
-            if self.intrinsic_reward_module is not None:
-                intr_adv = self._calc_adv(
+            with torch.no_grad():
+                adv = self._calc_adv(
                     low_dim_obs,
                     fused_view_feats,
                     act,
                     time_obs,
-                    self.intr_critic,
-                    self.intr_value_fn,
+                    self.critic,
+                    self.value_fn,
                 )
-                intrinsic_actor_loss = -(intr_adv * log_prob).mean()
+                intrinsic_actor_loss = 0
+                if self.intrinsic_reward_module is not None:
+                    intr_adv = self._calc_adv(
+                        low_dim_obs,
+                        fused_view_feats,
+                        act,
+                        time_obs,
+                        self.intr_critic,
+                        self.intr_value_fn,
+                    )
+                    intrinsic_actor_loss = -(intr_adv * log_prob).mean()
 
-        actor_loss = -(adv * log_prob).mean() + intrinsic_actor_loss
+            actor_loss = -(adv * log_prob).mean() + intrinsic_actor_loss
 
         # optimize actor
         self.actor_opt.zero_grad(set_to_none=True)
-        actor_loss.backward()
+        self.amp.backward(actor_loss)
         if self.actor_grad_clip:
-            nn.utils.clip_grad_norm_(self.actor.parameters(), self.actor_grad_clip)
-        self.actor_opt.step()
+            self.amp.clip_grad_norm_(
+                self.actor_opt, self.actor.parameters(), self.actor_grad_clip
+            )
+        self.amp.step(self.actor_opt)
+        self.amp.update()
 
         if self.logging:
             metrics["actor_loss"] = actor_loss.item()
@@ -171,34 +179,36 @@ class IQLDrQV2(DrQV2):
             )
 
         metrics = dict()
-        target_qs = self.calculate_target_q(
-            step,
-            next_low_dim_obs,
-            next_fused_view_feats,
-            next_time_obs,
-            reward,
-            discount,
-            bootstrap,
-            updating_intrinsic_critic,
-        )
-        target_qs = target_qs.repeat(1, self.num_critics)
+        with self.amp.autocast():
+            target_qs = self.calculate_target_q(
+                step,
+                next_low_dim_obs,
+                next_fused_view_feats,
+                next_time_obs,
+                reward,
+                discount,
+                bootstrap,
+                updating_intrinsic_critic,
+            )
+            target_qs = target_qs.repeat(1, self.num_critics)
 
-        qs = critic(low_dim_obs, fused_view_feats, action, time_obs)
-        # Compute priority
-        q_critic_loss = F.mse_loss(qs, target_qs.detach(), reduction="none").mean(
-            -1, keepdim=True
-        )
+            qs = critic(low_dim_obs, fused_view_feats, action, time_obs)
+            # Compute priority
+            q_critic_loss = F.mse_loss(qs, target_qs.detach(), reduction="none").mean(
+                -1, keepdim=True
+            )
 
-        dummy_action = torch.zeros_like(action)
-        iql_q = value_fn(low_dim_obs, fused_view_feats, dummy_action, time_obs)
-        min_q = qs.min(-1, keepdim=True)[0]
-        if self.distributional_critic:
-            iql_q = critic.from_dist(iql_q)
-            min_q = critic.from_dist(min_q)
+            dummy_action = torch.zeros_like(action)
+            iql_q = value_fn(low_dim_obs, fused_view_feats, dummy_action, time_obs)
+            min_q = qs.min(-1, keepdim=True)[0]
+            if self.distributional_critic:
+                iql_q = critic.from_dist(iql_q)
+                min_q = critic.from_dist(min_q)
 
-        vf_err = min_q.detach() - iql_q
-        vf_weight = torch.where(vf_err > 0, self.expectile, (1 - self.expectile))
-        vf_loss = (vf_weight * (vf_err**2)).mean()
+            vf_err = min_q.detach() - iql_q
+            vf_weight = torch.where(vf_err > 0, self.expectile, (1 - self.expectile))
+            vf_loss = (vf_weight * (vf_err**2)).mean()
+        q_critic_loss = q_critic_loss.float()
         critic_loss = (q_critic_loss + vf_loss) * loss_coeff.unsqueeze(1)
 
         new_pri = torch.sqrt(q_critic_loss + 1e-10)
@@ -217,18 +227,21 @@ class IQLDrQV2(DrQV2):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         critic_opt.zero_grad(set_to_none=True)
-        critic_loss.backward()
+        self.amp.backward(critic_loss)
         if self.critic_grad_clip:
-            nn.utils.clip_grad_norm_(critic.parameters(), self.critic_grad_clip)
-        critic_opt.step()
+            self.amp.clip_grad_norm_(
+                critic_opt, critic.parameters(), self.critic_grad_clip
+            )
+        self.amp.step(critic_opt)
         if self.use_pixels and self.encoder is not None:
             if self.critic_grad_clip:
-                nn.utils.clip_grad_norm_(
-                    self.encoder.parameters(), self.critic_grad_clip
+                self.amp.clip_grad_norm_(
+                    self.encoder_opt, self.encoder.parameters(), self.critic_grad_clip
                 )
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.update()
         return metrics
 
     def calculate_target_q(
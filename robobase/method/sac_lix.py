@@ -22,7 +22,8 @@ class SACActor(Actor):
             net_ins["low_dim_obs"] = low_dim_obs
         if fused_view_feats is not None:
             net_ins["fused_view_feats"] = fused_view_feats
-        mu, log_std = self.actor_model(net_ins).chunk(2, -1)
+        # Distributions are computed in float32 under mixed precision.
+        mu, log_std = self.actor_model(net_ins).float().chunk(2, -1)
         log_std = torch.tanh(log_std)
         log_std = LOG_STD_MIN + 0.5 * (LOG_STD_MAX - LOG_STD_MIN) * (log_std + 1)
         std = log_std.exp()
@@ -157,39 +158,43 @@ class SACLix(ActorCritic):
     ):
         metrics = dict()
 
-        dist = self.actor(low_dim_obs, fused_view_feats)
-        action, log_prob = self.actor.logprob(dist)
-
-        base_actor_loss = self._compute_actor_loss(
-            low_dim_obs,
-            fused_view_feats,
-            action,
-            time_obs,
-            loss_coeff,
-            self.critic,
-            log_prob,
-        )
-        intr_actor_loss = 0
-        if self.intrinsic_reward_module is not None:
-            intr_actor_loss = self._compute_actor_loss(
+        with self.amp.autocast():
+            dist = self.actor(low_dim_obs, fused_view_feats)
+            action, log_prob = self.actor.logprob(dist)
+
+            base_actor_loss = self._compute_actor_loss(
                 low_dim_obs,
                 fused_view_feats,
                 action,
                 time_obs,
                 loss_coeff,
-                self.intr_critic,
+                self.critic,
                 log_prob,
             )
-        bc_metrics, bc_loss = self.get_bc_loss(dist.mean, act, demos)
-        metrics.update(bc_metrics)
-        actor_loss = base_actor_loss + intr_actor_loss + bc_loss
+            intr_actor_loss = 0
+            if self.intrinsic_reward_module is not None:
+                intr_actor_loss = self._compute_actor_loss(
+                    low_dim_obs,
+                    fused_view_feats,
+                    action,
+                    time_obs,
+                    loss_coeff,
+                    self.intr_critic,
+                    log_prob,
+                )
+            bc_metrics, bc_loss = self.get_bc_loss(dist.mean, act, demos)
+            metrics.update(bc_metrics)
+            actor_loss = base_actor_loss + intr_actor_loss + bc_loss
 
         # optimize actor
         self.actor_opt.zero_grad(set_to_none=True)
-        actor_loss.backward()
+        self.amp.backward(actor_loss)
         if self.actor_grad_clip:
-            nn.utils.clip_grad_norm_(self.actor.parameters(), self.actor_grad_clip)
-        self.actor_opt.step()
+            self.amp.clip_grad_norm_(
+                self.actor_opt, self.actor.parameters(), self.actor_grad_clip
+            )
+        self.amp.step(self.actor_opt)
+        self.amp.update()
 
         self.a_optimizer.zero_grad()
         alpha_loss = (
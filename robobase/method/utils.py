@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Sequence
 
 import gymnasium as gym
 import torch
@@ -7,16 +7,60 @@ import torch.nn.functional as F
 import re
 
 
+SHIFT_AUG_MODES = ["grid_sample", "crop"]
+
+
+def _check_shift_aug_mode(mode: str):
+    if mode not in SHIFT_AUG_MODES:
+        raise ValueError(
+            f"Shift augmentation mode {mode} not supported. "
+            f"Choose from {SHIFT_AUG_MODES}."
+        )
+
+
+def _shifted_crop(x: torch.Tensor, shift: torch.Tensor, h: int, w: int):
+    """Crops a [h, w] window from each padded image, offset by an integer shift.
+
+    Equivalent to sampling the padded images at integer-shifted pixel centres, but
+    indexes into a strided view of the input instead of interpolating.
+
+    Args:
+        x (torch.Tensor): [N, C, H + 2 * pad, W + 2 * pad]-shaped padded images
+        shift (torch.Tensor): [N, 2]-shaped integer (x, y) offsets in [0, 2 * pad]
+
+    Returns:
+        torch.Tensor: [N, C, h, w]-shaped crops
+    """
+    windows = x.unfold(2, h, 1).unfold(3, w, 1)  # [N, C, 2p + 1, 2p + 1, h, w]
+    batch = torch.arange(x.shape[0], device=x.device)
+    return windows[batch, :, shift[:, 1], shift[:, 0]]
+
+
 class RandomShiftsAug(nn.Module):
-    def __init__(self, pad):
+    def __init__(self, pad, mode: str = "grid_sample"):
+        """
+        Applies random shift augmentation to images of shape [N, C, H, W].
+
+        Args:
+            pad (int): Size of padding for augmentation
+            mode (str): "grid_sample" resamples the images with `F.grid_sample`,
+                "crop" takes the equivalent integer crops of the padded images
+                without interpolation, which is cheaper.
+        """
         super().__init__()
+        _check_shift_aug_mode(mode)
         self.pad = pad
+        self.mode = mode
 
     def forward(self, x):
         n, c, h, w = x.size()
         assert h == w
         padding = tuple([self.pad] * 4)
         x = F.pad(x, padding, "replicate")
+        shift = torch.randint(0, 2 * self.pad + 1, size=(n, 2), device=x.device)
+        if self.mode == "crop":
+            return _shifted_crop(x, shift, h, w)
+
         eps = 1.0 / (h + 2 * self.pad)
         arange = torch.linspace(
             -1.0 + eps, 1.0 - eps, h + 2 * self.pad, device=x.device, dtype=x.dtype
@@ -25,9 +69,7 @@ class RandomShiftsAug(nn.Module):
         base_grid = torch.cat([arange, arange.transpose(1, 0)], dim=2)
         base_grid = base_grid.unsqueeze(0).repeat(n, 1, 1, 1)
 
-        shift = torch.randint(
-            0, 2 * self.pad + 1, size=(n, 1, 1, 2), device=x.device, dtype=x.dtype
-        )
+        shift = shift.view(n, 1, 1, 2).to(x.dtype)
         shift *= 2.0 / (h + 2 * self.pad)
 
         grid = base_grid + shift
@@ -35,7 +77,7 @@ class RandomShiftsAug(nn.Module):
 
 
 class TimeConsistentRandomShiftsAug(nn.Module):
-    def __init__(self, pad: int):
+    def __init__(self, pad: int, mode: str = "grid_sample"):
         """
         Applies random shift augmentation to videos of shape [B, T, C, H, W].
         Augmentations are differently applied to different videos,
@@ -43,9 +85,14 @@ class TimeConsistentRandomShiftsAug(nn.Module):
 
         Args:
             pad (int): Size of padding for augmentation
+            mode (str): "grid_sample" resamples the frames with `F.grid_sample`,
+                "crop" takes the equivalent integer crops of the padded frames
+                without interpolation, which is cheaper.
         """
         super().__init__()
+        _check_shift_aug_mode(mode)
         self.pad = pad
+        self.mode = mode
 
     def forward(self, x: torch.Tensor):
         """
@@ -60,6 +107,12 @@ class TimeConsistentRandomShiftsAug(nn.Module):
         padding = tuple([self.pad] * 4)
         # NOTE: Padding behaves differently from RandomShiftsAug!
         x = F.pad(x, padding, mode="constant", value=0)
+        shift = torch.randint(0, 2 * self.pad + 1, size=(B, 2), device=x.device)
+        if self.mode == "crop":
+            # Frames are folded into channels so that one crop covers the video
+            x = x.view(B, T * C, H + 2 * self.pad, W + 2 * self.pad)
+            return _shifted_crop(x, shift, H, W).view(B, T, C, H, W)
+
         eps = 1.0 / (H + 2 * self.pad)
         arange = torch.linspace(
             -1.0 + eps, 1.0 - eps, H + 2 * self.pad, device=x.device, dtype=x.dtype
@@ -68,9 +121,7 @@ class TimeConsistentRandomShiftsAug(nn.Module):
         base_grid = torch.cat([arange, arange.transpose(1, 0)], dim=2)
         base_grid = base_grid.unsqueeze(0).repeat(B, 1, 1, 1)  # [B, H, W, 2]
 
-        shift = torch.randint(
-            0, 2 * self.pad + 1, size=(B, 1, 1, 2), device=x.device, dtype=x.dtype
-        )
+        shift = shift.view(B, 1, 1, 2).to(x.dtype)
         shift *= 2.0 / (H + 2 * self.pad)  # [B, 1, 1, 2]
 
         grid = base_grid + shift
@@ -141,6 +192,12 @@ def extract_many_from_spec(
     return filtered_dict
 
 
+def match_observation_keys(spec: gym.spaces.Dict, patterns: Sequence[str]) -> list[str]:
+    """Returns the keys of the space matching any of the regex patterns."""
+    regexes = [re.compile(pattern) for pattern in patterns]
+    return [key for key in spec.keys() if any(r.search(key) for r in regexes)]
+
+
 def extract_many_from_batch(batch, pattern: str):
     filtered_dict = {}
     regex = re.compile(pattern)
@@ -235,6 +235,7 @@ class ValueBased(OffPolicyMethod, ABC):
         encoder_model: Optional[EncoderModule],
         view_fusion_model: Optional[FusionModule],
         *args,
+        augmentation_mode: str = "grid_sample",
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
@@ -255,7 +256,11 @@ class ValueBased(OffPolicyMethod, ABC):
         self.bc_margin = bc_margin
         self.use_target_network_for_rollout = use_target_network_for_rollout
         self.num_update_steps = num_update_steps
-        self.aug = RandomShiftsAug(pad=4) if use_augmentation else lambda x: x
+        self.aug = (
+            RandomShiftsAug(pad=4, mode=augmentation_mode)
+            if use_augmentation
+            else lambda x: x
+        )
         self.use_torch_compile = use_torch_compile
         self.critic_grad_clip = critic_grad_clip
         self.advantage_model = advantage_model
@@ -429,12 +434,14 @@ class ValueBased(OffPolicyMethod, ABC):
             empty dictionary if the encoder has no particular `calculate_loss`
             or loss for updating the encoder if it has one
         """
-        loss = self.encoder.calculate_loss(rgb_obs)
+        with self.amp.autocast():
+            loss = self.encoder.calculate_loss(rgb_obs)
         if loss is None:
             return {}
         self.encoder.zero_grad(set_to_none=True)
-        loss.backward()
-        self.encoder_opt.step()
+        self.amp.backward(loss)
+        self.amp.step(self.encoder_opt)
+        self.amp.update()
         return {"encoder_rep_loss": loss.item()}
 
     def update_view_fusion_rep(self, rgb_feats):
@@ -449,7 +456,8 @@ class ValueBased(OffPolicyMethod, ABC):
         # NOTE: This method will always try to update the encoder
         # Whether to update the encoder is the responsibility of view_fusion_model.
         # It should detach rgb_feats if it does not want to update the encoder.
-        loss = self.view_fusion.calculate_loss(rgb_feats)
+        with self.amp.autocast():
+            loss = self.view_fusion.calculate_loss(rgb_feats)
         if loss is None:
             return {}
         assert (
@@ -457,9 +465,10 @@ class ValueBased(OffPolicyMethod, ABC):
         ), "Use `update_encoder_rep` to only update the encoder parameters."
         self.encoder.zero_grad(set_to_none=True)
         self.view_fusion_opt.zero_grad(set_to_none=True)
-        loss.backward()
-        self.encoder_opt.step()
-        self.view_fusion_opt.step()
+        self.amp.backward(loss)
+        self.amp.step(self.encoder_opt)
+        self.amp.step(self.view_fusion_opt)
+        self.amp.update()
         return {"view_fusion_rep_loss": loss.item()}
 
     def act(self, observations: dict[str, torch.Tensor], step: int, eval_mode: bool):
@@ -561,19 +570,22 @@ class ValueBased(OffPolicyMethod, ABC):
             )
 
         metrics = dict()
-        target_qs_a = self.calculate_target_q(
-            next_low_dim_obs,
-            next_fused_view_feats,
-            next_action,
-            next_time_obs,
-            reward,
-            discount,
-            bootstrap,
-            updating_intrinsic_critic,
-        )
+        with self.amp.autocast():
+            target_qs_a = self.calculate_target_q(
+                next_low_dim_obs,
+                next_fused_view_feats,
+                next_action,
+                next_time_obs,
+                reward,
+                discount,
+                bootstrap,
+                updating_intrinsic_critic,
+            )
 
-        qs_a, qs = critic(low_dim_obs, fused_view_feats, action, time_obs)
-        q_critic_loss = F.mse_loss(qs_a, target_qs_a, reduction="none").mean(-1)
+            qs_a, qs = critic(low_dim_obs, fused_view_feats, action, time_obs)
+            q_critic_loss = F.mse_loss(qs_a, target_qs_a, reduction="none").mean(-1)
+        qs_a, qs = qs_a.float(), qs.float()
+        q_critic_loss = q_critic_loss.float()
         critic_loss = q_critic_loss * loss_coeff
 
         # Compute priority
@@ -605,22 +617,23 @@ class ValueBased(OffPolicyMethod, ABC):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         critic_opt.zero_grad(set_to_none=True)
-        critic_loss.backward()
+        self.amp.backward(critic_loss)
         if self.critic_grad_clip:
-            critic_norm = nn.utils.clip_grad_norm_(
-                critic.parameters(), self.critic_grad_clip
+            critic_norm = self.amp.clip_grad_norm_(
+                critic_opt, critic.parameters(), self.critic_grad_clip
             )
             if self.logging:
                 metrics[f"{lp}critic_norm"] = critic_norm.item()
-        critic_opt.step()
+        self.amp.step(critic_opt)
         if self.use_pixels and self.encoder is not None:
             if self.critic_grad_clip:
-                nn.utils.clip_grad_norm_(
-                    self.encoder.parameters(), self.critic_grad_clip
+                self.amp.clip_grad_norm_(
+                    self.encoder_opt, self.encoder.parameters(), self.critic_grad_clip
                 )
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.update()
         return metrics
 
     def extract_batch(
@@ -738,10 +751,11 @@ class ValueBased(OffPolicyMethod, ABC):
         metrics.update(self.update_encoder_rep(rgb_obs.float()))
 
         # Extract the features from the encoder
-        multi_view_rgb_feats = self.encoder(rgb_obs.float())
+        with self.amp.autocast():
+            multi_view_rgb_feats = self.encoder(rgb_obs.float())
 
-        with torch.no_grad():
-            next_multi_view_rgb_feats = self.encoder(next_rgb_obs.float())
+            with torch.no_grad():
+                next_multi_view_rgb_feats = self.encoder(next_rgb_obs.float())
 
         return metrics, multi_view_rgb_feats, next_multi_view_rgb_feats
 
@@ -755,13 +769,15 @@ class ValueBased(OffPolicyMethod, ABC):
             # Extract features from the newly updated encoder
             if len(view_fusion_metrics) != 0:
                 # TODO: Find a better way to check if weights updated
-                multi_view_feats = self.encoder(rgb_obs.float())
+                with self.amp.autocast():
+                    multi_view_feats = self.encoder(rgb_obs.float())
 
         # Fuse the multi view features (e.g., AvgPool, MLP, Identity, ..)
-        fused_view_feats = self.view_fusion(multi_view_feats)
+        with self.amp.autocast():
+            fused_view_feats = self.view_fusion(multi_view_feats)
 
-        with torch.no_grad():
-            next_fused_view_feats = self.view_fusion(next_multi_view_feats)
+            with torch.no_grad():
+                next_fused_view_feats = self.view_fusion(next_multi_view_feats)
 
         return metrics, fused_view_feats, next_fused_view_feats
 
@@ -851,10 +867,9 @@ class ValueBased(OffPolicyMethod, ABC):
                 )
 
             if self.intrinsic_reward_module is not None:
-                intrinsic_rewards = self.intrinsic_reward_module.compute_irs(
-                    batch, step
+                intrinsic_rewards = self.intrinsic_reward_module.compute_irs_and_update(
+                    batch, step, fused_view_feats, next_fused_view_feats
                 )
-                self.intrinsic_reward_module.update(batch)
                 metrics.update(
                     self.update_critic(
                         low_dim_obs,
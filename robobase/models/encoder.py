@@ -3,9 +3,7 @@ from functools import partial
 from typing import Tuple
 
 import numpy as np
-import timm
 import torch
-from timm.models.vision_transformer import Block
 from torch import nn as nn
 from torch.nn import functional as F
 
@@ -181,6 +179,8 @@ class ResNetEncoder(EncoderModule):
     ):
         super().__init__(input_shape)
         assert input_shape[1] == 3, "ResNet only supports channel of size 3"
+        import timm
+
         self.model = timm.create_model(model, pretrained=True)
         self.model.eval()
 
@@ -364,6 +364,8 @@ class EncoderMultiViewVisionTransformer(EncoderModule):
             conv_embed (bool, optional): Use convolutional feature masking
             reward_pred (bool, optional): Use reward prediction as auxiliary objective
         """
+        from timm.models.vision_transformer import Block
+
         super().__init__(input_shape)
         num_views = input_shape[0]
         in_chans = input_shape[1]
@@ -3,7 +3,6 @@ from typing import Tuple, Optional
 
 import numpy as np
 import torch
-from timm.models.vision_transformer import Block
 from torch import nn as nn
 
 from robobase.models.core import RoboBaseModule
@@ -30,6 +29,8 @@ class FusionMultiCamFeatureAttention(FusionModule):
         mlp_ratio: float = 4.0,
         norm_layer: nn.Module = nn.LayerNorm,
     ):
+        from timm.models.vision_transformer import Block
+
         # V, F, v is view, F is feats (token size)
         super().__init__(input_shape)
         self._hidden_size = hidden_size
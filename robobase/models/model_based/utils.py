@@ -95,6 +95,32 @@ def reorder_dict_keys(
         return target
 
 
+def _leaf_paths(
+    structure: Union[list, tuple, dict, torch.Tensor], prefix: tuple = ()
+) -> List[tuple]:
+    """Returns the path of keys/indices to each leaf of a nested structure,
+    in the order of `flatten_nested`."""
+    if isinstance(structure, (list, tuple)):
+        return [
+            path
+            for i, item in enumerate(structure)
+            for path in _leaf_paths(item, prefix + (i,))
+        ]
+    elif isinstance(structure, dict):
+        return [
+            path
+            for key, value in structure.items()
+            for path in _leaf_paths(value, prefix + (key,))
+        ]
+    return [prefix]
+
+
+def _get_leaf(structure: Union[list, tuple, dict, torch.Tensor], path: tuple):
+    for key in path:
+        structure = structure[key]
+    return structure
+
+
 def static_scan(
     fn: Callable,
     inputs: Tuple[torch.Tensor],
@@ -105,6 +131,9 @@ def static_scan(
     which could be useful for computing value functions or imagining future states.
     NOTE: Not actual scan functionality unlike Jax & TF, as torch does not support it
 
+    The paths to the output tensors are resolved once from `start`, and each step
+    only gathers them into per-output lists, which are stacked once at the end.
+
     Args:
         fn: A function that will be applied to inputs.
         inputs: inputs that will be given to the function.
@@ -121,17 +150,16 @@ def static_scan(
         e.g.) ({"deter": [T, B, D], "logit": , ...}) for future imagination
     """
     last = start
-    outputs = [[] for _ in flatten_nested(start)]
-    indices = range(flatten_nested(inputs)[0].shape[0])
+    paths = _leaf_paths(start)
+    length = flatten_nested(inputs)[0].shape[0]
+    outputs = [[None] * length for _ in paths]
+    indices = range(length)
     if reverse:
         indices = reversed(indices)
     for index in indices:
-        inp = (_input[index] for _input in inputs)
-        last = fn(last, *inp)
-        last = reorder_dict_keys(last, start)  # make the order of data structure same
-        [_out.append(_last) for _out, _last in zip(outputs, flatten_nested(last))]
-    if reverse:
-        outputs = [list(reversed(x)) for x in outputs]
+        last = fn(last, *(_input[index] for _input in inputs))
+        for output, path in zip(outputs, paths):
+            output[index] = _get_leaf(last, path)
     outputs = [torch.stack(x, 0) for x in outputs]
     return pack_sequence_as(start, outputs)
 
@@ -148,6 +176,10 @@ def lambda_return(
     - Setting lambda=1 gives a discounted Monte Carlo return.
     - Setting lambda=0 gives a fixed 1-step return.
 
+    The return follows the linear recurrence R_t = x_t + lambda * pcont_t * R_{t+1},
+    which is evaluated as a parallel (Hillis-Steele) reverse scan in log2(T) steps
+    of tensor operations instead of T sequential steps.
+
     Args (Assuming axis == 0):
         axis: axis corresponding to the temporal dimension
         reward: [T, B]-shaped reward tensor
@@ -175,12 +207,22 @@ def lambda_return(
     next_values = torch.cat([value[1:], bootstrap[None]], 0)
     inputs = reward + pcont * next_values * (1 - lambda_)
 
-    returns = static_scan(
-        lambda agg, cur0, cur1: cur0 + cur1 * lambda_ * agg,
-        (inputs, pcont),
-        bootstrap,
-        reverse=True,
-    )
+    # Fold the bootstrap into the last step, so that step t of the scan composes
+    # the affine maps R -> returns + decays * R of steps t, ..., T - 1.
+    decays = pcont * lambda_
+    returns = torch.cat([inputs[:-1], inputs[-1:] + decays[-1:] * bootstrap[None]], 0)
+    decays = torch.cat([decays[:-1], torch.zeros_like(decays[-1:])], 0)
+    offset = 1
+    while offset < len(returns):
+        returns = torch.cat(
+            [
+                returns[:-offset] + decays[:-offset] * returns[offset:],
+                returns[-offset:],
+            ],
+            0,
+        )
+        decays = torch.cat([decays[:-offset] * decays[offset:], decays[-offset:]], 0)
+        offset *= 2
     if axis != 0:
         returns = returns.permute(dims)
     return returns
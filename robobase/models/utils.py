@@ -4,9 +4,6 @@ import torch
 import torch.nn as nn
 import numpy as np
 
-from timm.models.vision_transformer import PatchEmbed
-from timm.layers.pos_embed_sincos import build_sincos2d_pos_embed
-
 
 class MultiViewPatchEmbed(nn.Module):
     def __init__(
@@ -20,6 +17,8 @@ class MultiViewPatchEmbed(nn.Module):
         This is a class for PatchEmbed for multi-view inputs.
         Attributes are set to be compatible with PatchEmbed from timm.
         """
+        from timm.models.vision_transformer import PatchEmbed
+
         super().__init__()
         self.patch_embed = PatchEmbed(img_size, patch_size, in_chans, embed_dim)
         self.num_patches = self.patch_embed.num_patches
@@ -125,6 +124,8 @@ def get_2d_sincos_pos_embed(
     """
     if not isinstance(grid_size, tuple):
         grid_size = (grid_size, grid_size)
+    from timm.layers.pos_embed_sincos import build_sincos2d_pos_embed
+
     pos_embed = build_sincos2d_pos_embed(grid_size, embed_dim, interleave_sin_cos=True)
     if cls_token:
         pos_embed = np.concatenate([np.zeros([1, embed_dim]), pos_embed], axis=0)
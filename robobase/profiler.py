@@ -0,0 +1,195 @@
+import contextlib
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+import torch
+
+
+class PhaseProfiler:
+    """Wall-clock timers for the named phases of the training loop.
+
+    Each `phase` records one duration. On CUDA devices, the device is synchronized
+    before and after a phase (`cuda_sync`), so that the kernels launched in a phase
+    are attributed to it rather than to the next phase that waits on them. Phases
+    may be timed from several threads, e.g. env steps on an actor thread, in which
+    case their fractions of wall-clock time may add up to more than one.
+
+    Optionally, a `torch.profiler` trace of a window of iterations is written to
+    `trace_dir`, with each phase as a named range.
+    """
+
+    def __init__(
+        self,
+        phases: Sequence[str] = (),
+        enabled: bool = True,
+        device: torch.device = None,
+        cuda_sync: bool = True,
+        trace_dir: Path = None,
+        trace_start_iteration: int = None,
+        trace_warmup: int = 1,
+        trace_iterations: int = 5,
+    ):
+        """Init.
+
+        Args:
+            phases: Names of the phases that are reported even if not yet timed.
+            enabled: If false, `phase` and `iterator` do not time anything.
+            device: Device the phases run on.
+            cuda_sync: If true and `device` is a CUDA device, synchronize it around
+                each phase.
+            trace_dir: Directory the `torch.profiler` trace is written to.
+            trace_start_iteration: Iteration at which the trace starts. No trace is
+                captured if None.
+            trace_warmup: Number of iterations profiled but not recorded, at the
+                start of the trace.
+            trace_iterations: Number of iterations recorded in the trace.
+        """
+        self._enabled = enabled
+        self._cuda_sync = (
+            cuda_sync and device is not None and torch.device(device).type == "cuda"
+        )
+        self._device = device
+        self._lock = threading.Lock()
+        self._durations = {name: [] for name in phases}
+        self._last_report = time.perf_counter()
+        self._trace_dir = trace_dir
+        self._trace_start = trace_start_iteration
+        self._trace_warmup = trace_warmup
+        self._trace_iterations = trace_iterations
+        self._torch_profiler = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def _record(self, name: str, duration: float):
+        with self._lock:
+            self._durations.setdefault(name, []).append(duration)
+
+    def _synchronize(self):
+        if self._cuda_sync:
+            torch.cuda.synchronize(self._device)
+
+    @contextlib.contextmanager
+    def _timed(self, name: str):
+        with torch.profiler.record_function(name):
+            self._synchronize()
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._synchronize()
+                self._record(name, time.perf_counter() - start)
+
+    def phase(self, name: str) -> contextlib.AbstractContextManager:
+        """Returns a context manager timing its body as one run of a phase."""
+        if not self._enabled:
+            return contextlib.nullcontext()
+        return self._timed(name)
+
+    def iterator(self, iterator: Iterator, name: str) -> Iterator:
+        """Wraps an iterator, e.g. of a DataLoader, timing each `next` as a phase.
+
+        The time spent in `next` is the time the loop stalls waiting for a batch.
+        """
+        if not self._enabled:
+            return iterator
+        return self._timed_iterator(iterator, name)
+
+    def _timed_iterator(self, iterator: Iterator, name: str) -> Iterator:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self._record(name, time.perf_counter() - start)
+            yield item
+
+    def step(self, iteration: int):
+        """Starts, advances or stops the `torch.profiler` trace.
+
+        Args:
+            iteration: Index of the iteration that is about to start.
+        """
+        if not self._enabled or self._trace_start is None:
+            return
+        if self._torch_profiler is not None:
+            self._torch_profiler.step()
+            if iteration >= (
+                self._trace_start + self._trace_warmup + self._trace_iterations
+            ):
+                self._stop_trace()
+        elif iteration == self._trace_start:
+            self._start_trace()
+
+    def _start_trace(self):
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self._trace_dir.mkdir(parents=True, exist_ok=True)
+        self._torch_profiler = torch.profiler.profile(
+            activities=activities,
+            schedule=torch.profiler.schedule(
+                wait=0,
+                warmup=self._trace_warmup,
+                active=self._trace_iterations,
+                repeat=1,
+            ),
+            on_trace_ready=torch.profiler.tensorboard_trace_handler(
+                str(self._trace_dir)
+            ),
+            record_shapes=True,
+        )
+        self._torch_profiler.start()
+        logging.info(f"Started torch.profiler trace, written to {self._trace_dir}.")
+
+    def _stop_trace(self):
+        self._torch_profiler.stop()
+        self._torch_profiler = None
+        # The trace has been captured, so it is not started again.
+        self._trace_start = None
+
+    def report(self) -> tuple[dict[str, float], dict[str, np.ndarray]]:
+        """Summarizes the phases timed since the last report, and starts a new one.
+
+        Returns:
+            The mean, 95th percentile and total duration, run count and fraction of
+            wall-clock time of each phase, and the durations of each phase in
+            milliseconds, for histograms.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            durations = {
+                name: np.asarray(values, dtype=np.float64) * 1000
+                for name, values in self._durations.items()
+            }
+            for values in self._durations.values():
+                values.clear()
+            elapsed = now - self._last_report
+            self._last_report = now
+        metrics = {}
+        for name, values in durations.items():
+            timed = len(values) > 0
+            total = values.sum() / 1000
+            metrics.update(
+                {
+                    f"{name}_ms_mean": values.mean() if timed else 0.0,
+                    f"{name}_ms_p95": np.percentile(values, 95) if timed else 0.0,
+                    f"{name}_total_time": total,
+                    f"{name}_count": len(values),
+                    f"{name}_fraction": total / elapsed if elapsed > 0 else 0.0,
+                }
+            )
+        histograms = {
+            f"{name}_ms": values for name, values in durations.items() if len(values)
+        }
+        return metrics, histograms
+
+    def close(self):
+        if self._torch_profiler is not None:
+            self._stop_trace()
@@ -0,0 +1,247 @@
+"""Encoding of the episode files of the replay buffers.
+
+Episodes are written either as `.npz` archives (`npz`, the default), or as a
+chunked container whose arrays are split into chunks compressed in parallel with
+`zlib`, `lz4` or `zstd`. All of them release the GIL, so chunks are compressed on a
+thread pool. Each array of the container can be decoded on its own, and arrays can
+be replaced without recompressing the others.
+
+Episode files keep their `.npz` suffix whatever their codec, and are decoded
+according to their first bytes, so existing `.npz` files stay readable.
+
+Container layout:
+    MAGIC | header size (uint64, little endian) | JSON header | chunks
+where the header maps each array to its dtype, shape and the (offset, size) of its
+compressed chunks, relative to the end of the header.
+"""
+import io
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"RBEPISOD"
+CODECS = ["npz", "zlib", "lz4", "zstd"]
+# Fast levels, as episodes are written on the env-stepping thread.
+DEFAULT_LEVELS = {"zlib": 1, "lz4": 0, "zstd": 3}
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(num_threads: int) -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads do not survive a fork, e.g. into DataLoader workers.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=num_threads, thread_name_prefix="robobase-episode-codec"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _map(fn: Callable, items: list, num_threads: int) -> list:
+    if num_threads <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    return list(_get_executor(num_threads).map(fn, items))
+
+
+def _compress_fn(name: str, level: int) -> Callable[[bytes], bytes]:
+    if name == "zlib":
+        return lambda data: zlib.compress(data, level)
+    if name == "lz4":
+        import lz4.frame
+
+        return lambda data: lz4.frame.compress(data, compression_level=level)
+    if name == "zstd":
+        import zstandard
+
+        # Compressors are not thread-safe, so each chunk creates its own.
+        return lambda data: zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unknown episode codec: {name}.")
+
+
+def _decompress_fn(name: str) -> Callable[[bytes], bytes]:
+    if name == "zlib":
+        return zlib.decompress
+    if name == "lz4":
+        import lz4.frame
+
+        return lz4.frame.decompress
+    if name == "zstd":
+        import zstandard
+
+        return lambda data: zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown episode codec: {name}.")
+
+
+class EpisodeCodec:
+    """Codec the episodes of a replay buffer are written with."""
+
+    def __init__(
+        self,
+        name: str = "npz",
+        level: Optional[int] = None,
+        num_threads: int = 4,
+        chunk_size: int = 2**20,
+    ):
+        """Init.
+
+        Args:
+            name: `npz`, or `zlib`, `lz4` or `zstd` for the chunked container. `lz4`
+                and `zstd` require the `lz4` and `zstandard` packages.
+            level: Compression level. If None, the fast level of the codec is used.
+            num_threads: Number of threads chunks are (de)compressed on.
+            chunk_size: Size in bytes of the chunks arrays are split into.
+        """
+        if name not in CODECS:
+            raise ValueError(
+                f"Unknown episode codec: {name}. Expected one of {CODECS}."
+            )
+        self.name = name
+        self.level = DEFAULT_LEVELS.get(name) if level is None else level
+        self.num_threads = num_threads
+        self.chunk_size = chunk_size
+        if name != "npz":
+            # Fail on a missing package now rather than on the first episode.
+            _compress_fn(name, self.level)
+
+    def encode(
+        self, episode: dict[str, np.ndarray], raw_chunks: dict[str, tuple] = None
+    ) -> bytes:
+        """Encodes an episode.
+
+        Args:
+            episode: Arrays of the episode.
+            raw_chunks: Arrays already compressed with this codec, as returned by
+                `read_raw_chunks`, which are copied as they are.
+        """
+        if self.name == "npz":
+            with io.BytesIO() as bs:
+                np.savez_compressed(bs, **episode)
+                return bs.getvalue()
+        compress = _compress_fn(self.name, self.level)
+        raw_chunks = {k: v for k, v in (raw_chunks or {}).items() if k not in episode}
+        shapes, jobs = {}, []
+        for key, value in episode.items():
+            value = np.asarray(value)
+            data = np.ascontiguousarray(value).reshape(-1).view(np.uint8)
+            chunks = [
+                data[i : i + self.chunk_size]
+                for i in range(0, len(data), self.chunk_size)
+            ] or [data]
+            shapes[key] = (value.dtype.str, value.shape, len(chunks))
+            jobs.extend(chunks)
+        compressed = iter(_map(compress, jobs, self.num_threads))
+        for key, (dtype, shape, num_chunks) in shapes.items():
+            chunks = [next(compressed) for _ in range(num_chunks)]
+            raw_chunks[key] = (dtype, shape, chunks)
+
+        header = {"version": 1, "codec": self.name, "arrays": {}}
+        offset = 0
+        for key, (dtype, shape, chunks) in raw_chunks.items():
+            header["arrays"][key] = {"dtype": dtype, "shape": list(shape), "chunks": []}
+            for chunk in chunks:
+                header["arrays"][key]["chunks"].append([offset, len(chunk)])
+                offset += len(chunk)
+        header = json.dumps(header).encode()
+        return b"".join(
+            [MAGIC, len(header).to_bytes(8, "little"), header]
+            + [chunk for _, _, chunks in raw_chunks.values() for chunk in chunks]
+        )
+
+    def write(self, episode: dict[str, np.ndarray], fn: Path):
+        """Writes an episode to `fn`, atomically."""
+        _write_atomic(fn, self.encode(episode))
+
+    def update(self, fn: Path, arrays: dict[str, np.ndarray]):
+        """Replaces arrays of the episode at `fn`, e.g. relabelled rewards.
+
+        Other arrays of a container written with this codec are copied without
+        being decoded. Other files are decoded and written with this codec.
+        """
+        raw = read_raw_chunks(fn)
+        if raw is not None and raw[0] == self.name:
+            data = self.encode(arrays, raw_chunks=raw[1])
+        else:
+            episode = read_episode(fn, num_threads=self.num_threads)
+            episode.update(arrays)
+            data = self.encode(episode)
+        _write_atomic(fn, data)
+
+
+def _write_atomic(fn: Path, data: bytes):
+    # Readers glob for `*.npz`, so the temporary file is not picked up.
+    tmp_fn = fn.with_name(f".{fn.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp_fn.open("wb") as f:
+        f.write(data)
+    os.replace(tmp_fn, fn)
+
+
+def _read_header(f) -> Optional[tuple[dict, int]]:
+    if f.read(len(MAGIC)) != MAGIC:
+        return None
+    size = int.from_bytes(f.read(8), "little")
+    return json.loads(f.read(size)), len(MAGIC) + 8 + size
+
+
+def read_raw_chunks(fn: Path) -> Optional[tuple[str, dict[str, tuple]]]:
+    """Returns the codec and the compressed chunks of each array of a container, or
+    None if `fn` is not a container."""
+    with open(fn, "rb") as f:
+        header = _read_header(f)
+        if header is None:
+            return None
+        header, start = header
+        raw_chunks = {}
+        for key, array in header["arrays"].items():
+            chunks = []
+            for offset, size in array["chunks"]:
+                f.seek(start + offset)
+                chunks.append(f.read(size))
+            raw_chunks[key] = (array["dtype"], tuple(array["shape"]), chunks)
+    return header["codec"], raw_chunks
+
+
+def read_episode(
+    fn: Path, keys: Sequence[str] = None, num_threads: int = 4
+) -> dict[str, np.ndarray]:
+    """Reads an episode written by any codec.
+
+    Args:
+        fn: Episode file.
+        keys: Arrays to decode. All arrays are decoded if None.
+        num_threads: Number of threads chunks are decompressed on.
+    """
+    with open(fn, "rb") as f:
+        header = _read_header(f)
+        if header is None:
+            f.seek(0)
+            episode = np.load(f)
+            return {k: episode[k] for k in episode.keys() if keys is None or k in keys}
+        header, start = header
+        arrays = {
+            k: v for k, v in header["arrays"].items() if keys is None or k in keys
+        }
+        jobs = []
+        for array in arrays.values():
+            for offset, size in array["chunks"]:
+                f.seek(start + offset)
+                jobs.append(f.read(size))
+    data = _map(_decompress_fn(header["codec"]), jobs, num_threads)
+    episode, i = {}, 0
+    for key, array in arrays.items():
+        num_chunks = len(array["chunks"])
+        buffer = b"".join(data[i : i + num_chunks])
+        i += num_chunks
+        episode[key] = np.frombuffer(
+            bytearray(buffer), dtype=np.dtype(array["dtype"])
+        ).reshape(array["shape"])
+    return episode
@@ -14,7 +14,7 @@ from typing_extensions import override
 
 import numpy as np
 
-from robobase.replay_buffer.replay_buffer import ReplayElement
+from robobase.replay_buffer.replay_buffer import ReplayBuffer, ReplayElement
 from robobase.replay_buffer.sum_tree import SumTree
 from robobase.replay_buffer.uniform_replay_buffer import UniformReplayBuffer
 
@@ -72,6 +72,11 @@ class PrioritizedReplayBuffer(UniformReplayBuffer):
             observation, action, reward, terminal, truncated, **kwargs
         )
 
+    @override
+    def add_episode(self, *args, **kwargs):
+        # Priorities are set transition by transition in `add`.
+        return ReplayBuffer.add_episode(self, *args, **kwargs)
+
     def get_priority(self, indices):
         """Fetches the priorities correspond to a batch of memory indices.
 
@@ -110,7 +115,10 @@ class PrioritizedReplayBuffer(UniformReplayBuffer):
             )
         if indices is None:
             indices = self._sum_tree.stratified_sample(batch_size)
-        samples = [self.sample_single(indices[i]) for i in range(batch_size)]
+        samples = self._sample_indices(indices)
+        for index, replay_sample in zip(indices, samples):
+            if replay_sample is not None:
+                replay_sample[SAMPLING_PROBABILITIES] = self._sum_tree.get(index)
         batch = {}
         for k in samples[0].keys():
             batch[k] = np.stack([sample[k] for sample in samples])
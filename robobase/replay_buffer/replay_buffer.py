@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+from typing import Sequence
+
 import numpy as np
+from gymnasium import spaces
 from torch.utils.data import IterableDataset
 
 
@@ -12,6 +15,19 @@ class ReplayElement(object):
         self.is_observation = is_observation
 
 
+def project_observation_space(
+    observation_space: spaces.Dict, keys: Sequence[str]
+) -> spaces.Dict:
+    """Keeps only the given keys of an observation space, in their original order.
+
+    Replay buffers built from the projected space store, and return, only these
+    observations; other observations passed to `add` are dropped.
+    """
+    return spaces.Dict(
+        {k: space for k, space in observation_space.items() if k in set(keys)}
+    )
+
+
 class ReplayBuffer(IterableDataset):
     def replay_capacity(self):
         pass
@@ -58,6 +74,41 @@ class ReplayBuffer(IterableDataset):
         """
         pass
 
+    def add_episode(
+        self,
+        observations: dict[str, np.ndarray],
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        terminals: np.ndarray,
+        truncateds: np.ndarray,
+        final_observation: dict,
+        **kwargs,
+    ):
+        """Adds a whole episode to the replay memory.
+
+        Each element holds the T transitions of the episode stacked on the first axis.
+        By default, the transitions are added one by one with `add` and `add_final`.
+
+        Args:
+          observations: observations before each action is applied, (T, ...) each.
+          actions: (T, ...) actions.
+          rewards: (T,) rewards.
+          terminals: (T,) terminal flags.
+          truncateds: (T,) truncation flags.
+          final_observation: final observation of the episode.
+          kwargs: (T, ...) extra elements of the transitions.
+        """
+        for t in range(len(actions)):
+            self.add(
+                {k: v[t] for k, v in observations.items()},
+                actions[t],
+                rewards[t],
+                terminals[t],
+                truncateds[t],
+                **{k: v[t] for k, v in kwargs.items()},
+            )
+        self.add_final(final_observation)
+
     def is_empty(self):
         pass
 
@@ -77,5 +128,17 @@ class ReplayBuffer(IterableDataset):
         """
         pass
 
+    def state_dict(self) -> dict:
+        """Returns the state needed to restore the replay buffer from a snapshot.
+
+        Returns:
+            dict: e.g. the manifest of stored episodes and the insertion counters.
+        """
+        pass
+
+    def load_state_dict(self, state_dict: dict):
+        """Restores the replay buffer from a state returned by `state_dict`."""
+        pass
+
     def shutdown(self):
         pass
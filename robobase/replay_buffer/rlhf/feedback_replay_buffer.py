@@ -23,14 +23,18 @@ from gymnasium import spaces
 from natsort import natsort
 import numpy as np
 
+from robobase.replay_buffer.episode_codec import EpisodeCodec
 from robobase.replay_buffer.replay_buffer import (
     ReplayBuffer,
     ReplayElement,
 )
+from robobase.replay_buffer.transition_index import TransitionIndex
 
 from robobase.replay_buffer.uniform_replay_buffer import (
     save_episode,
     load_episode,
+    episode_manifest,
+    restore_episode_manifest,
     ACTION,
     INDICES,
     IS_FIRST,
@@ -112,6 +116,7 @@ class FeedbackReplayBuffer(ReplayBuffer):
         sequential: bool = False,
         transition_seq_len: int = 50,
         num_labels: int = 1,
+        episode_codec: EpisodeCodec = None,
     ):
         """Initializes OutOfGraphReplayBuffer.
 
@@ -138,6 +143,8 @@ class FeedbackReplayBuffer(ReplayBuffer):
           transition_seq_len (int): the length of the transition sequence to sample
             from sequential replay buffer. Only applicable if sequential is true.
           num_labels (int): The number of human labels to store in the replay buffer.
+          episode_codec (EpisodeCodec): codec episodes are written with. Defaults to
+            `.npz` archives.
 
         Raises:
           ValueError: If replay_capacity is too small to hold at least one
@@ -152,7 +159,7 @@ class FeedbackReplayBuffer(ReplayBuffer):
         time_dims = []
         new_observation_elements = {}
         for name, space in observation_elements.items():
-            if "query_pixels" in name:
+            if "query_pixels" in name or name == "query_state":
                 continue
             if len(space.shape) <= 1:
                 raise ValueError(
@@ -233,10 +240,11 @@ class FeedbackReplayBuffer(ReplayBuffer):
         # =======
         self._episode_files = []  # list of episode file path
         self._episodes = {}  # Key: eps_file_path, value: episode
-        # Key: global_idx. Global_idx refers to the index in the entire replay buffer.
-        # Value: (episode_file_path, transition_idx) where transition_idx
-        # refers to the index of transition in the episode
-        self._global_idxs_to_episode_and_transition_idx = defaultdict(list)
+        # Maps global indices, the indices in the entire replay buffer, to the
+        # episode file path and the index of the transition in the episode.
+        self._transition_index = TransitionIndex(replay_capacity)
+        # Key: eps_file_name, value: feedback collection round of the pair
+        self._feedback_rounds = {}
         self._current_episode = defaultdict(list)
         self._num_episodes = 0
         self._num_transitions = 0
@@ -245,6 +253,7 @@ class FeedbackReplayBuffer(ReplayBuffer):
         self._size = 0
         self._max_size_per_worker = replay_capacity // max(1, num_workers)
         self._num_workers = num_workers
+        self._episode_codec = episode_codec or EpisodeCodec()
         self._fetch_every = fetch_every
         # self._samples_since_last_fetch = self._fetch_every
         save_snapshot = True
@@ -323,8 +332,18 @@ class FeedbackReplayBuffer(ReplayBuffer):
 
         return storage_elements, obs_elements
 
-    def add_feedback(self, segment_0, segment_1, label, metadata=None, **kwargs):
-        """Adds a pair of segments to the replay memory."""
+    def add_feedback(
+        self, segment_0, segment_1, label, metadata=None, feedback_round=-1, **kwargs
+    ):
+        """Adds a pair of segments to the replay memory.
+
+        Args:
+          segment_0 (dict): The first segment of the pair.
+          segment_1 (dict): The second segment of the pair.
+          label (np.ndarray): The labels of the pair.
+          metadata (dict): Metadata written next to the pair, e.g. by Gemini.
+          feedback_round (int): The feedback collection round of the pair.
+        """
         transition = {}
         for idx, seg in enumerate([segment_0, segment_1]):
             target_keys = [
@@ -358,7 +377,7 @@ class FeedbackReplayBuffer(ReplayBuffer):
         for k, v in self._current_episode.items():
             episode[k] = np.array(v, self._storage_signature[k].type)
         self._current_episode = defaultdict(list)
-        self._store_episode(episode, metadata)
+        self._store_episode(episode, metadata, feedback_round)
 
     @override
     def add(
@@ -376,7 +395,7 @@ class FeedbackReplayBuffer(ReplayBuffer):
     def add_final(self, final_observation: dict):
         raise NotImplementedError
 
-    def _store_episode(self, episode, metadata=None):
+    def _store_episode(self, episode, metadata=None, feedback_round=-1):
         # if self._sequential:
         #     # If sequential, convert the episode layout
         #     episode = self.convert_episode_layout(episode)
@@ -388,7 +407,8 @@ class FeedbackReplayBuffer(ReplayBuffer):
         self._num_transitions += eps_len
         ts = datetime.now().strftime("%Y%m%dT%H%M%S")
         eps_fn = f"{ts}_{eps_idx}_{eps_len}_{global_idx}.npz"
-        save_episode(episode, self._replay_dir / eps_fn)
+        save_episode(episode, self._replay_dir / eps_fn, self._episode_codec)
+        self._feedback_rounds[eps_fn] = feedback_round
 
         if self._is_first:
             # A special case for first insert. So that the user can have arbitrary
@@ -399,7 +419,7 @@ class FeedbackReplayBuffer(ReplayBuffer):
                 eps_fn = (
                     f"{ts}.{worker_id}_{eps_idx+worker_id}_{eps_len}_{global_idx}.npz"
                 )
-                save_episode(episode, self._replay_dir / eps_fn)
+                save_episode(episode, self._replay_dir / eps_fn, self._episode_codec)
 
         if metadata is not None:
             metadata_fn = (
@@ -480,6 +500,29 @@ class FeedbackReplayBuffer(ReplayBuffer):
     def add_count(self, count: int):
         self._add_count.value = count
 
+    def state_dict(self) -> dict:
+        return dict(episode_manifest(self), feedback_rounds=dict(self._feedback_rounds))
+
+    def load_state_dict(self, state_dict: dict):
+        restore_episode_manifest(self, state_dict)
+        self._feedback_rounds = dict(state_dict.get("feedback_rounds", {}))
+
+    def stored_feedback(self) -> list[tuple[Path, int]]:
+        """Returns the episode file and feedback round of each stored pair.
+
+        Pairs are ordered from oldest to newest. Copies of the first pair made for
+        the DataLoader workers are left out. Pairs of unknown rounds have round -1.
+        """
+        eps_fns = [
+            eps_fn
+            for eps_fn in self._replay_dir.glob("*.npz")
+            if "." not in eps_fn.stem.split("_")[0]
+        ]
+        eps_fns.sort(key=lambda eps_fn: int(eps_fn.stem.split("_")[1]))
+        return [
+            (eps_fn, self._feedback_rounds.get(eps_fn.name, -1)) for eps_fn in eps_fns
+        ]
+
     def shutdown(self):
         if self._purge_replay_on_shutdown:
             logging.info("Clearing disk replay buffer.")
@@ -508,9 +551,7 @@ class FeedbackReplayBuffer(ReplayBuffer):
             early_eps_files = self._episode_files.pop(0)
             early_eps = self._episodes.pop(early_eps_files)
             self._size -= episode_len(early_eps)
-            keys = list(self._global_idxs_to_episode_and_transition_idx.keys())
-            for k in keys[: episode_len(early_eps)]:
-                del self._global_idxs_to_episode_and_transition_idx[k]
+            self._transition_index.remove(early_eps_files)
             if not self._save_snapshot:
                 early_eps_files.unlink(missing_ok=True)
 
@@ -518,14 +559,7 @@ class FeedbackReplayBuffer(ReplayBuffer):
         self._episode_files.sort()  # NOTE: eps_fn starts with created timestamp.
         # so after sort, earliest episode appears first.
         self._episodes[eps_fn] = episode
-        global_idxs = np.arange(global_idx, global_idx + eps_len)
-        global_idxs_wrapped = (global_idxs % self.replay_capacity).tolist()
-        self._global_idxs_to_episode_and_transition_idx.update(
-            {
-                global_i: [eps_fn, ep_transition_i]
-                for ep_transition_i, global_i in enumerate(global_idxs_wrapped)
-            }
-        )
+        self._transition_index.add(eps_fn, global_idx, eps_len)
         self._size += eps_len
 
         if not self._save_snapshot:
@@ -588,16 +622,11 @@ class FeedbackReplayBuffer(ReplayBuffer):
             global_index += idx
 
         else:
-            if global_index not in self._global_idxs_to_episode_and_transition_idx:
+            (episode_fn,), (idx,) = self._transition_index.locate([global_index])
+            if episode_fn is None:
                 # This worker does not have this sample
                 return None
-
-            (
-                episode_fn,
-                transition_idx,
-            ) = self._global_idxs_to_episode_and_transition_idx[global_index]
             episode = self._episodes[episode_fn]
-            idx = transition_idx
 
         # Construct replay sample from sampled transition index
         # ep_len = episode_len(episode)
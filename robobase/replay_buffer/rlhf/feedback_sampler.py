@@ -0,0 +1,184 @@
+"""Epoch-based sampling of the feedback pairs reward models are trained on."""
+import math
+from typing import Iterator, Optional
+
+import numpy as np
+import torch
+
+from robobase.replay_buffer.rlhf.feedback_replay_buffer import (
+    LABEL,
+    FeedbackReplayBuffer,
+)
+from robobase.replay_buffer.uniform_replay_buffer import INDICES, load_episode
+
+# random: pairs are sampled with replacement by the DataLoader of the buffer.
+# epoch: pairs are iterated in epochs by `FeedbackEpochSampler`.
+FEEDBACK_SAMPLER_MODES = ["random", "epoch"]
+
+
+class FeedbackEpochSampler:
+    """Iterates over the feedback pairs of a `FeedbackReplayBuffer` in epochs.
+
+    `refresh` loads the pairs of the buffer into contiguous tensors, reading only
+    the pairs added since the last refresh from disk. Batches are then gathered from
+    these tensors, without the per-sample loading and collation of a DataLoader, in
+    shuffled epochs which visit each pair once.
+
+    Successive batches are drawn from `num_streams` streams in turn, e.g. one per
+    member of a reward model ensemble which draws one batch per member. Each stream
+    shuffles the pairs on its own, so each member sees every pair once per epoch.
+
+    Epochs can be stratified by label, ties included, and by feedback round. The
+    pairs of each stratum are then spread evenly over the epoch, so that each batch
+    holds about the same share of each stratum as the whole set of pairs.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        num_streams: int = 1,
+        stratify_label: bool = False,
+        stratify_round: bool = False,
+        device: torch.device = "cpu",
+        seed: Optional[int] = None,
+    ):
+        """Init.
+
+        Args:
+            batch_size: Max. number of pairs of a batch. The last batch of an epoch
+                holds the remaining pairs.
+            num_streams: Number of streams successive batches are drawn from.
+            stratify_label: If true, stratify epochs by the labels of the pairs.
+            stratify_round: If true, stratify epochs by the feedback round of the
+                pairs.
+            device: Device the pairs are stored and gathered on.
+            seed: Seed of the shuffling. Drawn from numpy's global RNG if None.
+        """
+        self._batch_size = batch_size
+        self._num_streams = num_streams
+        self._stratify_label = stratify_label
+        self._stratify_round = stratify_round
+        self._device = torch.device(device)
+        self._rng = np.random.default_rng(
+            np.random.randint(2**31) if seed is None else seed
+        )
+        self._eps_fns = []
+        self._rounds = np.zeros(0, np.int64)
+        self._data = {}
+        self._strata = None
+        self._reset_streams()
+
+    def __len__(self) -> int:
+        return len(self._eps_fns)
+
+    @property
+    def num_batches(self) -> int:
+        """Number of batches of an epoch of one stream."""
+        return math.ceil(len(self) / self._batch_size)
+
+    @property
+    def epochs_completed(self) -> int:
+        """Number of epochs completed by every stream since the last refresh."""
+        return min(self._epochs)
+
+    def _reset_streams(self):
+        self._orders = [None] * self._num_streams
+        self._positions = [0] * self._num_streams
+        self._epochs = [0] * self._num_streams
+        self._next_stream = 0
+
+    def refresh(self, replay_buffer: FeedbackReplayBuffer):
+        """Loads the pairs stored in `replay_buffer`.
+
+        If the pairs changed, new epochs are started. As in the buffer, the oldest
+        pairs are dropped once the pairs exceed its capacity.
+        """
+        stored, size = [], 0
+        for eps_fn, feedback_round in reversed(replay_buffer.stored_feedback()):
+            eps_len = int(eps_fn.stem.split("_")[2])
+            if stored and size + eps_len > replay_buffer.replay_capacity:
+                break
+            stored.append((eps_fn, feedback_round))
+            size += eps_len
+        stored.reverse()
+        if [eps_fn for eps_fn, _ in stored] == self._eps_fns:
+            return
+
+        rows = {eps_fn: i for i, eps_fn in enumerate(self._eps_fns)}
+        keep = [rows[eps_fn] for eps_fn, _ in stored if eps_fn in rows]
+        new = [(eps_fn, r) for eps_fn, r in stored if eps_fn not in rows]
+        new_pairs = [self._load_pair(eps_fn) for eps_fn, _ in new]
+        keep = torch.as_tensor(keep, dtype=torch.long, device=self._device)
+        data = {}
+        for key in new_pairs[0].keys() if new_pairs else self._data.keys():
+            parts = [self._data[key].index_select(0, keep)] if key in self._data else []
+            if new_pairs:
+                parts.append(
+                    torch.from_numpy(np.stack([pair[key] for pair in new_pairs])).to(
+                        self._device
+                    )
+                )
+            data[key] = torch.cat(parts) if len(parts) > 1 else parts[0]
+        self._data = data
+        self._eps_fns = [eps_fn for eps_fn, _ in stored]
+        self._rounds = np.array([r for _, r in stored], dtype=np.int64)
+        self._strata = self._compute_strata()
+        self._reset_streams()
+
+    def _load_pair(self, eps_fn) -> dict[str, np.ndarray]:
+        # Each feedback episode holds a single pair.
+        pair = {k: v[0] for k, v in load_episode(eps_fn).items()}
+        pair[INDICES] = np.int64(eps_fn.stem.split("_")[3])
+        return pair
+
+    def _compute_strata(self) -> Optional[np.ndarray]:
+        columns = []
+        if self._stratify_label and len(self) > 0:
+            columns.append(self._data[LABEL].reshape(len(self), -1).cpu().numpy())
+        if self._stratify_round:
+            columns.append(self._rounds[:, None])
+        if not columns:
+            return None
+        _, strata = np.unique(
+            np.concatenate(columns, axis=1), axis=0, return_inverse=True
+        )
+        return strata.reshape(-1)
+
+    def _shuffle(self) -> np.ndarray:
+        order = self._rng.permutation(len(self))
+        if self._strata is None:
+            return order
+        # Positions of the shuffled pairs of each stratum, spread evenly over [0, 1)
+        # with a random offset per stratum. Sorting by them interleaves the strata.
+        strata = self._strata[order]
+        counts = np.bincount(strata)
+        grouped = np.argsort(strata, kind="stable")
+        ranks = np.empty(len(self))
+        ranks[grouped] = np.arange(len(self)) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        offsets = self._rng.random(len(counts))
+        positions = (ranks + offsets[strata]) / counts[strata]
+        return order[np.argsort(positions, kind="stable")]
+
+    def __iter__(self) -> Iterator[dict[str, torch.Tensor]]:
+        return self
+
+    def __next__(self) -> dict[str, torch.Tensor]:
+        if len(self) == 0:
+            raise ValueError("No feedback pairs were loaded, see `refresh`.")
+        stream = self._next_stream
+        self._next_stream = (stream + 1) % self._num_streams
+        if self._orders[stream] is None:
+            self._orders[stream] = torch.as_tensor(
+                self._shuffle(), dtype=torch.long, device=self._device
+            )
+            self._positions[stream] = 0
+        position = self._positions[stream]
+        batch_idxs = self._orders[stream][position : position + self._batch_size]
+        self._positions[stream] = position + len(batch_idxs)
+        if self._positions[stream] >= len(self):
+            # The next batch of this stream starts a new epoch.
+            self._orders[stream] = None
+            self._epochs[stream] += 1
+        return {k: v.index_select(0, batch_idxs) for k, v in self._data.items()}
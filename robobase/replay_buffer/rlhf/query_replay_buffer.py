@@ -13,6 +13,7 @@ import os
 import tempfile
 from collections import defaultdict
 from datetime import datetime
+from functools import partial
 from multiprocessing import Value
 from pathlib import Path
 from typing import Callable, Type
@@ -23,10 +24,12 @@ from gymnasium import spaces
 from natsort import natsort
 from typing_extensions import override
 
+from robobase.replay_buffer.episode_codec import EpisodeCodec
 from robobase.replay_buffer.replay_buffer import (
     ReplayBuffer,
     ReplayElement,
 )
+from robobase.replay_buffer.transition_index import TransitionIndex
 from robobase.replay_buffer.uniform_replay_buffer import (
     ACTION,
     INDICES,
@@ -35,7 +38,9 @@ from robobase.replay_buffer.uniform_replay_buffer import (
     TERMINAL,
     TRUNCATED,
     episode_len,
+    episode_manifest,
     load_episode,
+    restore_episode_manifest,
     save_episode,
 )
 
@@ -105,6 +110,7 @@ class QueryReplayBuffer(ReplayBuffer):
         max_episode_number: int = 0,
         upload_gemini: bool = False,
         verbose: bool = False,
+        episode_codec: EpisodeCodec = None,
     ):
         """Initializes OutOfGraphReplayBuffer.
 
@@ -130,6 +136,8 @@ class QueryReplayBuffer(ReplayBuffer):
             sequential format.
           transition_seq_len (int): the length of the transition sequence to sample
             from sequential replay buffer. Only applicable if sequential is true.
+          episode_codec (EpisodeCodec): codec episodes are written with. Defaults to
+            `.npz` archives.
 
         Raises:
           ValueError: If replay_capacity is too small to hold at least one
@@ -206,16 +214,17 @@ class QueryReplayBuffer(ReplayBuffer):
         self._preprocess_every_sample = preprocess_every_sample
         self._upload_gemini = upload_gemini
         self._verbose = verbose
-        self._save_episode_fn = save_episode
+        self._save_episode_fn = partial(
+            save_episode, codec=episode_codec or EpisodeCodec()
+        )
         self._load_episode_fn = load_episode
 
         # =======
         self._episode_files = []  # list of episode file path
         self._episodes = {}  # Key: eps_file_path, value: episode
-        # Key: global_idx. Global_idx refers to the index in the entire replay buffer.
-        # Value: (episode_file_path, transition_idx) where transition_idx
-        # refers to the index of transition in the episode
-        self._global_idxs_to_episode_and_transition_idx = defaultdict(list)
+        # Maps global indices, the indices in the entire replay buffer, to the
+        # episode file path and the index of the transition in the episode.
+        self._transition_index = TransitionIndex(replay_capacity)
         self._current_episode = defaultdict(list)
         self._num_episodes = 0
         self._num_transitions = 0
@@ -371,7 +380,7 @@ class QueryReplayBuffer(ReplayBuffer):
         transition[INDICES] = index
         # Info and observation are stored key by key
         transition.update(kwargs)
-        transition.update(observation)
+        transition.update(self._project_observation(observation))
 
         # Check transition shape is correct
         self._check_add_types(transition, self._storage_signature)
@@ -380,6 +389,10 @@ class QueryReplayBuffer(ReplayBuffer):
         self._add(transition)
         self._add_count.value += 1
 
+    def _project_observation(self, observation: dict) -> dict:
+        # Drop the observations this buffer does not store.
+        return {k: v for k, v in observation.items() if k in self._obs_signature}
+
     @override
     def add_final(self, final_observation: dict):
         if self.is_empty() or (
@@ -389,7 +402,7 @@ class QueryReplayBuffer(ReplayBuffer):
             raise ValueError("The previous transition was not terminal or truncated.")
 
         transition = {}
-        transition.update(final_observation)
+        transition.update(self._project_observation(final_observation))
         self._check_add_types(transition, self._obs_signature)
 
         # Construct final transition with values from final_obs and final_info, with
@@ -404,6 +417,70 @@ class QueryReplayBuffer(ReplayBuffer):
         self._current_episode = defaultdict(list)
         self._store_episode(episode)
 
+    @override
+    def add_episode(
+        self,
+        observations: dict[str, np.ndarray],
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        terminals: np.ndarray,
+        truncateds: np.ndarray,
+        final_observation: dict,
+        **kwargs,
+    ):
+        """Adds a whole episode, validating and storing its arrays at once.
+
+        Transitions are indexed by their position in the episode. See
+        `ReplayBuffer.add_episode`.
+        """
+        if self._preprocessing_fn is not None and not self._preprocess_every_sample:
+            # Preprocessing functions work on single transitions.
+            for t in range(len(actions)):
+                self.add(
+                    {k: v[t] for k, v in observations.items()},
+                    actions[t],
+                    rewards[t],
+                    terminals[t],
+                    truncateds[t],
+                    t,
+                    **{k: v[t] for k, v in kwargs.items()},
+                )
+            return self.add_final(final_observation)
+        transitions = {
+            ACTION: actions,
+            REWARD: rewards,
+            TERMINAL: terminals,
+            TRUNCATED: truncateds,
+            INDICES: np.arange(len(actions)),
+            **kwargs,
+            **self._project_observation(observations),
+        }
+        final_transition = self._project_observation(final_observation)
+        if len(self._current_episode) > 0:
+            raise ValueError("Can't add an episode while another one is being added.")
+        lengths = {name: len(v) for name, v in transitions.items()}
+        if len(set(lengths.values())) != 1 or 0 in lengths.values():
+            raise ValueError(f"Episode elements have different lengths: {lengths}.")
+        if terminals[-1] != 1 and truncateds[-1] != 1:
+            raise ValueError("The last transition was not terminal or truncated.")
+        self._check_add_types(
+            {name: v[0] for name, v in transitions.items()}, self._storage_signature
+        )
+        self._check_add_types(final_transition, self._obs_signature)
+
+        # Append the final transition, with empty action and flags.
+        final_transition = self._final_transition(final_transition)
+        episode = {}
+        for name, element in self._storage_signature.items():
+            episode[name] = np.concatenate(
+                [
+                    np.asarray(transitions[name], element.type),
+                    np.asarray(final_transition[name], element.type)[np.newaxis],
+                ]
+            )
+        self._add_count.value += len(actions)
+        self._store_episode(episode)
+
     def _store_episode(self, episode):
         if self._sequential:
             # If sequential, convert the episode layout
@@ -515,6 +592,12 @@ class QueryReplayBuffer(ReplayBuffer):
     def add_count(self, count: int):
         self._add_count.value = count
 
+    def state_dict(self) -> dict:
+        return episode_manifest(self)
+
+    def load_state_dict(self, state_dict: dict):
+        restore_episode_manifest(self, state_dict)
+
     def shutdown(self):
         if self._purge_replay_on_shutdown:
             logging.info("Clearing disk replay buffer.")
@@ -544,9 +627,7 @@ class QueryReplayBuffer(ReplayBuffer):
             early_eps_files = self._episode_files.pop(0)
             early_eps = self._episodes.pop(early_eps_files)
             self._size -= episode_len(early_eps)
-            keys = list(self._global_idxs_to_episode_and_transition_idx.keys())
-            for k in keys[: episode_len(early_eps)]:
-                del self._global_idxs_to_episode_and_transition_idx[k]
+            self._transition_index.remove(early_eps_files)
             if not self._save_snapshot:
                 early_eps_files.unlink(missing_ok=True)
 
@@ -554,14 +635,7 @@ class QueryReplayBuffer(ReplayBuffer):
         self._episode_files.sort()  # NOTE: eps_fn starts with created timestamp.
         # so after sort, earliest episode appears first.
         self._episodes[eps_fn] = episode
-        global_idxs = np.arange(global_idx, global_idx + eps_len)
-        global_idxs_wrapped = (global_idxs % self.replay_capacity).tolist()
-        self._global_idxs_to_episode_and_transition_idx.update(
-            {
-                global_i: [eps_fn, ep_transition_i]
-                for ep_transition_i, global_i in enumerate(global_idxs_wrapped)
-            }
-        )
+        self._transition_index.add(eps_fn, global_idx, eps_len)
         self._size += eps_len
 
         if not self._save_snapshot:
@@ -627,15 +701,11 @@ class QueryReplayBuffer(ReplayBuffer):
             )  # global index of the transition = index of episode_start + transition_idx
             global_index += idx
         else:
-            if global_index not in self._global_idxs_to_episode_and_transition_idx:
+            (episode_fn,), (idx,) = self._transition_index.locate([global_index])
+            if episode_fn is None:
                 # This worker does not have this sample
                 return None
-            (
-                episode_fn,
-                transition_idx,
-            ) = self._global_idxs_to_episode_and_transition_idx[global_index]
             episode = self._episodes[episode_fn]
-            idx = transition_idx
 
         # Construct replay sample from sampled transition index
         ep_len = episode_len(episode)
@@ -0,0 +1,148 @@
+"""Index of the transitions of the episodes loaded into a replay buffer worker."""
+from typing import Hashable, Optional, Sequence
+
+import numpy as np
+
+
+class TransitionIndex:
+    """Maps global transition indices to their episode and index in the episode.
+
+    Global indices wrap around at `capacity`. Each episode is stored as one segment
+    of contiguous global indices, or two if it wraps around `capacity`, in arrays
+    sorted by the first index of each segment. A batch of global indices is then
+    located with a single `np.searchsorted`, and the memory of the index grows with
+    the number of episodes rather than the number of transitions.
+
+    The global indices of an episode overwrite those of the episodes added before
+    it, so that a global index always refers to the latest transition stored at it.
+    """
+
+    def __init__(self, capacity: int):
+        """Init.
+
+        Args:
+            capacity: Number of global indices, after which they wrap around.
+        """
+        self._capacity = capacity
+        self._keys = {}  # Key: episode id, value: episode key
+        self._ids = {}  # Key: episode key, value: episode id
+        self._next_id = 0
+        self.clear()
+
+    def clear(self):
+        self._keys.clear()
+        self._ids.clear()
+        # First and past-the-end global index of each segment, the id of its episode,
+        # and the index in the episode of its first transition.
+        self._starts = np.zeros(0, np.int64)
+        self._ends = np.zeros(0, np.int64)
+        self._episode_ids = np.zeros(0, np.int64)
+        self._offsets = np.zeros(0, np.int64)
+
+    def __len__(self) -> int:
+        """Returns the number of global indices referring to a transition."""
+        return int(np.sum(self._ends - self._starts))
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._ids
+
+    def add(self, key: Hashable, global_index: int, length: int):
+        """Adds an episode.
+
+        Args:
+            key: Key of the episode, e.g. its file, returned by `locate`.
+            global_index: Unwrapped global index of the first transition of the
+                episode.
+            length: Number of transitions of the episode.
+        """
+        if key in self._ids:
+            self.remove(key)
+        episode_id = self._next_id
+        self._next_id += 1
+        self._keys[episode_id] = key
+        self._ids[key] = episode_id
+
+        # Transitions beyond `capacity` overwrite the first ones of the episode.
+        offset = max(length - self._capacity, 0)
+        start = (global_index + offset) % self._capacity
+        length -= offset
+        segments = [(start, min(start + length, self._capacity), offset)]
+        if start + length > self._capacity:
+            segments.append(
+                (0, start + length - self._capacity, offset + self._capacity - start)
+            )
+        for start, end, offset in segments:
+            self._overwrite(start, end)
+            self._starts = np.append(self._starts, start)
+            self._ends = np.append(self._ends, end)
+            self._episode_ids = np.append(self._episode_ids, episode_id)
+            self._offsets = np.append(self._offsets, offset)
+        order = np.argsort(self._starts, kind="stable")
+        self._starts = self._starts[order]
+        self._ends = self._ends[order]
+        self._episode_ids = self._episode_ids[order]
+        self._offsets = self._offsets[order]
+
+    def _overwrite(self, start: int, end: int):
+        """Trims the segments overlapping [start, end) to the parts outside it."""
+        overlap = (self._starts < end) & (self._ends > start)
+        if not overlap.any():
+            return
+        starts, ends = self._starts[overlap], self._ends[overlap]
+        episode_ids, offsets = self._episode_ids[overlap], self._offsets[overlap]
+        left = starts < start
+        right = ends > end
+        self._starts = np.concatenate(
+            [self._starts[~overlap], starts[left], np.full(right.sum(), end)]
+        )
+        self._ends = np.concatenate(
+            [self._ends[~overlap], np.full(left.sum(), start), ends[right]]
+        )
+        self._episode_ids = np.concatenate(
+            [self._episode_ids[~overlap], episode_ids[left], episode_ids[right]]
+        )
+        self._offsets = np.concatenate(
+            [
+                self._offsets[~overlap],
+                offsets[left],
+                offsets[right] + end - starts[right],
+            ]
+        )
+
+    def remove(self, key: Hashable):
+        """Removes an episode, e.g. when it is evicted from the worker."""
+        episode_id = self._ids.pop(key)
+        del self._keys[episode_id]
+        keep = self._episode_ids != episode_id
+        self._starts = self._starts[keep]
+        self._ends = self._ends[keep]
+        self._episode_ids = self._episode_ids[keep]
+        self._offsets = self._offsets[keep]
+
+    def locate(
+        self, global_indices: Sequence[int]
+    ) -> tuple[list[Optional[Hashable]], np.ndarray]:
+        """Locates a batch of wrapped global indices.
+
+        Args:
+            global_indices: Global indices in [0, capacity).
+
+        Returns:
+            The key of the episode of each index, or None if no episode of the index
+            was added, and the index of each transition in its episode.
+        """
+        global_indices = np.asarray(global_indices, dtype=np.int64).reshape(-1)
+        if len(self._starts) == 0:
+            return [None] * len(global_indices), np.zeros_like(global_indices)
+        segments = np.searchsorted(self._starts, global_indices, side="right") - 1
+        found = segments >= 0
+        segments = np.maximum(segments, 0)
+        found &= global_indices < self._ends[segments]
+        transition_idxs = (
+            self._offsets[segments] + global_indices - self._starts[segments]
+        )
+        keys = [
+            self._keys[episode_id] if f else None
+            for episode_id, f in zip(self._episode_ids[segments].tolist(), found)
+        ]
+        return keys, np.where(found, transition_idxs, 0)
@@ -8,12 +8,12 @@ off-policy corrections.
 """
 
 from __future__ import annotations
-import io
 import os
+import shutil
 import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Callable, Type
+from typing import Callable, Sequence, Type
 import math
 from multiprocessing import Value
 from collections import defaultdict
@@ -25,10 +25,12 @@ from gymnasium import spaces
 from natsort import natsort
 import numpy as np
 
+from robobase.replay_buffer.episode_codec import EpisodeCodec, read_episode
 from robobase.replay_buffer.replay_buffer import (
     ReplayBuffer,
     ReplayElement,
 )
+from robobase.replay_buffer.transition_index import TransitionIndex
 
 
 # String constants for storage
@@ -40,25 +42,84 @@ INDICES = "indices"
 IS_FIRST = "is_first"
 DISCOUNT = "discount"
 
+# Subdirectory of the replay directory holding episodes excluded on restore.
+EXCLUDED_EPISODES_DIR = "excluded"
+
 
 def episode_len(episode):
     # subtract -1 because the last final transition
     return next(iter(episode.values())).shape[0] - 1
 
 
-def save_episode(episode, fn):
-    with io.BytesIO() as bs:
-        np.savez_compressed(bs, **episode)
-        bs.seek(0)
-        with fn.open("wb") as f:
-            f.write(bs.read())
+def save_episode(episode, fn, codec: EpisodeCodec = None):
+    (codec or EpisodeCodec()).write(episode, fn)
 
 
-def load_episode(fn: Path):
-    with fn.open("rb") as f:
-        episode = np.load(f)
-        episode = {k: episode[k] for k in episode.keys()}
-        return episode
+def load_episode(fn: Path, keys: list[str] = None):
+    return read_episode(fn, keys)
+
+
+def episode_manifest(replay_buffer) -> dict:
+    """Manifest of the episode files on disk and the counters of a replay buffer.
+
+    Finished episodes are already written to disk, so the manifest is all that
+    needs to be stored in a snapshot to restore the buffer later on.
+    """
+    return {
+        "replay_dir": str(replay_buffer._replay_dir),
+        "episode_files": sorted(
+            f.name for f in replay_buffer._replay_dir.glob("*.npz")
+        ),
+        # Transitions of an unfinished episode are not on disk yet.
+        "add_count": replay_buffer.add_count
+        - len(next(iter(replay_buffer._current_episode.values()), [])),
+        "num_episodes": replay_buffer._num_episodes,
+        "num_transitions": replay_buffer._num_transitions,
+        "is_first": replay_buffer._is_first,
+    }
+
+
+def restore_episode_manifest(replay_buffer, manifest: dict):
+    """Restore a replay buffer from a manifest created by `episode_manifest`.
+
+    Episodes written after the manifest was taken are moved into the
+    `EXCLUDED_EPISODES_DIR` subdirectory, as their global indices would clash
+    with the ones of new episodes. If the manifest was taken from a different
+    directory, its episode files are linked into this buffer's directory.
+    """
+    replay_dir = replay_buffer._replay_dir
+    src_dir = Path(manifest["replay_dir"])
+    episode_files = set(manifest["episode_files"])
+    excluded = sorted(
+        eps_fn
+        for eps_fn in replay_dir.glob("*.npz")
+        if eps_fn.name not in episode_files
+    )
+    if len(excluded) > 0:
+        excluded_dir = replay_dir / EXCLUDED_EPISODES_DIR
+        excluded_dir.mkdir(exist_ok=True)
+        for eps_fn in excluded:
+            os.replace(eps_fn, excluded_dir / eps_fn.name)
+        logging.warning(
+            f"Moved {len(excluded)} episode files not listed in snapshot to "
+            f"{excluded_dir}: {', '.join(eps_fn.name for eps_fn in excluded)}"
+        )
+    for name in sorted(episode_files):
+        dst = replay_dir / name
+        if dst.exists():
+            continue
+        src = src_dir / name
+        if not src.exists():
+            logging.warning(f"Episode file {src} listed in snapshot is missing.")
+            continue
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+    replay_buffer.add_count = manifest["add_count"]
+    replay_buffer._num_episodes = manifest["num_episodes"]
+    replay_buffer._num_transitions = manifest["num_transitions"]
+    replay_buffer._is_first = manifest["is_first"]
 
 
 class UniformReplayBuffer(ReplayBuffer):
@@ -130,6 +191,7 @@ class UniformReplayBuffer(ReplayBuffer):
         sequential: bool = False,
         transition_seq_len: int = 1,
         max_episode_number: int = 0,
+        episode_codec: EpisodeCodec = None,
     ):
         """Initializes OutOfGraphReplayBuffer.
 
@@ -161,6 +223,8 @@ class UniformReplayBuffer(ReplayBuffer):
           transition_seq_len (int): the length of the transition sequence to sample
             from sequential replay buffer. Only applicable if sequential is true.
           max_episode_number (int): the maximum number of episodes to store.
+          episode_codec (EpisodeCodec): codec episodes are written with. Defaults to
+            `.npz` archives.
         Raises:
           ValueError: If replay_capacity is too small to hold at least one
             transition.
@@ -228,6 +292,7 @@ class UniformReplayBuffer(ReplayBuffer):
         self._gamma = gamma
         self._sequential = sequential
         self._max_episode_number = max_episode_number
+        self._episode_codec = episode_codec or EpisodeCodec()
 
         self.observation_elements = observation_elements
         self.extra_replay_elements = extra_replay_elements
@@ -249,10 +314,9 @@ class UniformReplayBuffer(ReplayBuffer):
         self._episode_files = []  # list of episode file path
         self._episodes = {}  # Key: eps_file_path, value: episode
         self._episode_ctimes = {}  # Key: eps_file_path, value: creation time
-        # Key: global_idx. Global_idx refers to the index in the entire replay buffer.
-        # Value: (episode_file_path, transition_idx) where transition_idx
-        # refers to the index of transition in the episode
-        self._global_idxs_to_episode_and_transition_idx = defaultdict(list)
+        # Maps global indices, the indices in the entire replay buffer, to the
+        # episode file path and the index of the transition in the episode.
+        self._transition_index = TransitionIndex(replay_capacity)
         self._current_episode = defaultdict(list)
         self._num_episodes = 0
         self._num_transitions = 0
@@ -408,7 +472,7 @@ class UniformReplayBuffer(ReplayBuffer):
         transition[TRUNCATED] = truncated
         # Info and observation are stored key by key
         transition.update(kwargs)
-        transition.update(observation)
+        transition.update(self._project_observation(observation))
 
         # Check transition shape is correct
         self._check_add_types(transition, self._storage_signature)
@@ -417,6 +481,10 @@ class UniformReplayBuffer(ReplayBuffer):
         self._add(transition)
         self._add_count.value += 1
 
+    def _project_observation(self, observation: dict) -> dict:
+        # Drop the observations this buffer does not store.
+        return {k: v for k, v in observation.items() if k in self._obs_signature}
+
     @override
     def add_final(self, final_observation: dict):
         if self.is_empty() or (
@@ -426,7 +494,7 @@ class UniformReplayBuffer(ReplayBuffer):
             raise ValueError("The previous transition was not terminal or truncated.")
 
         transition = {}
-        transition.update(final_observation)
+        transition.update(self._project_observation(final_observation))
         self._check_add_types(transition, self._obs_signature)
 
         # Construct final transition with values from final_obs and final_info, with
@@ -441,6 +509,71 @@ class UniformReplayBuffer(ReplayBuffer):
         self._current_episode = defaultdict(list)
         self._store_episode(episode)
 
+    @override
+    def add_episode(
+        self,
+        observations: dict[str, np.ndarray],
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        terminals: np.ndarray,
+        truncateds: np.ndarray,
+        final_observation: dict,
+        **kwargs,
+    ):
+        """Adds a whole episode, validating and storing its arrays at once.
+
+        See `ReplayBuffer.add_episode`.
+        """
+        if self._preprocessing_fn is not None and not self._preprocess_every_sample:
+            # Preprocessing functions work on single transitions.
+            return super().add_episode(
+                observations,
+                actions,
+                rewards,
+                terminals,
+                truncateds,
+                final_observation,
+                **kwargs,
+            )
+        transitions = {
+            ACTION: actions,
+            REWARD: rewards,
+            TERMINAL: terminals,
+            TRUNCATED: truncateds,
+            **kwargs,
+            **self._project_observation(observations),
+        }
+        final_transition = self._project_observation(final_observation)
+        self._check_add_episode_types(transitions, final_transition)
+
+        # Append the final transition, with empty action, reward and flags.
+        final_transition = self._final_transition(final_transition)
+        episode = {}
+        for name, element in self._storage_signature.items():
+            episode[name] = np.concatenate(
+                [
+                    np.asarray(transitions[name], element.type),
+                    np.asarray(final_transition[name], element.type)[np.newaxis],
+                ]
+            )
+        self._add_count.value += len(actions)
+        self._store_episode(episode)
+
+    def _check_add_episode_types(self, transitions: dict, final_transition: dict):
+        """Checks the arrays passed to `add_episode`, see `_check_add_types`."""
+        if len(self._current_episode) > 0:
+            raise ValueError("Can't add an episode while another one is being added.")
+        lengths = {name: len(v) for name, v in transitions.items()}
+        if len(set(lengths.values())) != 1 or 0 in lengths.values():
+            raise ValueError(f"Episode elements have different lengths: {lengths}.")
+        terminal, truncated = transitions[TERMINAL][-1], transitions[TRUNCATED][-1]
+        if terminal != 1 and truncated != 1:
+            raise ValueError("The last transition was not terminal or truncated.")
+        self._check_add_types(
+            {name: v[0] for name, v in transitions.items()}, self._storage_signature
+        )
+        self._check_add_types(final_transition, self._obs_signature)
+
     def _store_episode(self, episode):
         if self._sequential:
             # If sequential, convert the episode layout
@@ -453,7 +586,7 @@ class UniformReplayBuffer(ReplayBuffer):
         self._num_transitions += eps_len
         ts = datetime.now().strftime("%Y%m%dT%H%M%S")
         eps_fn = f"{ts}_{eps_idx}_{eps_len}_{global_idx}.npz"
-        save_episode(episode, self._replay_dir / eps_fn)
+        save_episode(episode, self._replay_dir / eps_fn, self._episode_codec)
 
         if self._is_first:
             # A special case for first insert. So that the user can have arbitrary
@@ -464,7 +597,7 @@ class UniformReplayBuffer(ReplayBuffer):
                 eps_fn = (
                     f"{ts}.{worker_id}_{eps_idx+worker_id}_{eps_len}_{global_idx}.npz"
                 )
-                save_episode(episode, self._replay_dir / eps_fn)
+                save_episode(episode, self._replay_dir / eps_fn, self._episode_codec)
 
     def _final_transition(self, kwargs):
         transition = {}
@@ -555,6 +688,12 @@ class UniformReplayBuffer(ReplayBuffer):
     def add_count(self, count: int):
         self._add_count.value = count
 
+    def state_dict(self) -> dict:
+        return episode_manifest(self)
+
+    def load_state_dict(self, state_dict: dict):
+        restore_episode_manifest(self, state_dict)
+
     def shutdown(self):
         if self._purge_replay_on_shutdown:
             logging.info("Clearing disk replay buffer.")
@@ -569,7 +708,7 @@ class UniformReplayBuffer(ReplayBuffer):
         self._episode_files.clear()
         self._episodes.clear()
         self._episode_ctimes.clear()
-        self._global_idxs_to_episode_and_transition_idx.clear()
+        self._transition_index.clear()
         self._size = 0
 
     def _sample_episode(self):
@@ -590,9 +729,7 @@ class UniformReplayBuffer(ReplayBuffer):
             early_eps_files = self._episode_files.pop(0)
             early_eps = self._episodes.pop(early_eps_files)
             self._size -= episode_len(early_eps)
-            keys = list(self._global_idxs_to_episode_and_transition_idx.keys())
-            for k in keys[: episode_len(early_eps)]:
-                del self._global_idxs_to_episode_and_transition_idx[k]
+            self._transition_index.remove(early_eps_files)
             del self._episode_ctimes[early_eps_files]
             if not self._save_snapshot:
                 early_eps_files.unlink(missing_ok=True)
@@ -602,14 +739,7 @@ class UniformReplayBuffer(ReplayBuffer):
         # so after sort, earliest episode appears first.
         self._episodes[eps_fn] = episode
         self._episode_ctimes[eps_fn] = eps_fn.stat().st_ctime
-        global_idxs = np.arange(global_idx, global_idx + eps_len)
-        global_idxs_wrapped = (global_idxs % self.replay_capacity).tolist()
-        self._global_idxs_to_episode_and_transition_idx.update(
-            {
-                global_i: [eps_fn, ep_transition_i]
-                for ep_transition_i, global_i in enumerate(global_idxs_wrapped)
-            }
-        )
+        self._transition_index.add(eps_fn, global_idx, eps_len)
         self._size += eps_len
 
         if not self._save_snapshot:
@@ -666,7 +796,7 @@ class UniformReplayBuffer(ReplayBuffer):
                 flattened[k] = np.concatenate([flattened[k], v], 0)
         return flattened
 
-    def _sample_sequential(self, global_index=None):
+    def _sample_sequential(self, global_index=None, location=None):
         # Sample transition index
         if global_index is None:
             # NOTE: here global index is the index of the start of episode.
@@ -692,15 +822,11 @@ class UniformReplayBuffer(ReplayBuffer):
             global_index += idx
 
         else:
-            if global_index not in self._global_idxs_to_episode_and_transition_idx:
+            if location is None:
                 # This worker does not have this sample
                 return None
-            (
-                episode_fn,
-                transition_idx,
-            ) = self._global_idxs_to_episode_and_transition_idx[global_index]
+            episode_fn, idx = location
             episode = self._episodes[episode_fn]
-            idx = transition_idx
 
         # Construct replay sample from sampled transition index
         ep_len = episode_len(episode)
@@ -734,7 +860,7 @@ class UniformReplayBuffer(ReplayBuffer):
 
         return replay_sample
 
-    def _sample_non_sequential(self, global_index=None):
+    def _sample_non_sequential(self, global_index=None, location=None):
         # Sample transition index
         if global_index is None:
             # NOTE: here global index is the index of the start of episode.
@@ -746,16 +872,11 @@ class UniformReplayBuffer(ReplayBuffer):
             global_index += idx
 
         else:
-            if global_index not in self._global_idxs_to_episode_and_transition_idx:
+            if location is None:
                 # This worker does not have this sample
                 return None
-
-            (
-                episode_fn,
-                transition_idx,
-            ) = self._global_idxs_to_episode_and_transition_idx[global_index]
+            episode_fn, idx = location
             episode = self._episodes[episode_fn]
-            idx = transition_idx
 
         # Construct replay sample from sampled transition index
         ep_len = episode_len(episode)
@@ -837,14 +958,37 @@ class UniformReplayBuffer(ReplayBuffer):
             dict: replay sample.
         """
         # index here is the "global" index of a flattened sample
+        if global_index is not None:
+            return self._sample_indices([global_index])[0]
         self._try_fetch()
 
         self._samples_since_last_fetch += 1
 
+        return self._sample()
+
+    def _sample(self, global_index: int = None, location: tuple = None):
         if self._sequential:
-            return self._sample_sequential(global_index)
+            return self._sample_sequential(global_index, location)
         else:
-            return self._sample_non_sequential(global_index)
+            return self._sample_non_sequential(global_index, location)
+
+    def _sample_indices(self, global_indices: Sequence[int]) -> list[dict | None]:
+        """Samples the transitions at a batch of global indices.
+
+        The indices are located with a single lookup. Samples of the indices this
+        worker does not have are None.
+        """
+        self._try_fetch()
+
+        self._samples_since_last_fetch += len(global_indices)
+
+        episode_fns, transition_idxs = self._transition_index.locate(global_indices)
+        return [
+            self._sample(global_index, None if eps_fn is None else (eps_fn, idx))
+            for global_index, eps_fn, idx in zip(
+                global_indices, episode_fns, transition_idxs.tolist()
+            )
+        ]
 
     @override
     def sample(
@@ -856,9 +1000,9 @@ class UniformReplayBuffer(ReplayBuffer):
                 f"indices was of size {len(indices)}, but batch size was {batch_size}"
             )
         if indices is None:
-            indices = [None] * batch_size
-
-        samples = [self.sample_single(indices[i]) for i in range(batch_size)]
+            samples = [self.sample_single() for _ in range(batch_size)]
+        else:
+            samples = self._sample_indices(indices)
         batch = {}
         for k in samples[0].keys():
             batch[k] = np.stack([sample[k] for sample in samples])
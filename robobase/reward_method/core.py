@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Iterator, Sequence, TypeAlias
+from typing import Dict, Iterator, Optional, Sequence, TypeAlias
 
 import numpy as np
 import torch
@@ -7,19 +7,37 @@ import torch.nn as nn
 from gymnasium import spaces
 from torch.nn import functional as F
 
-from robobase.method.utils import extract_from_spec
+from robobase.amp import MixedPrecision
+from robobase.compiler import ModuleCompiler
+from robobase.method.utils import extract_from_spec, match_observation_keys
 from robobase.replay_buffer.replay_buffer import ReplayBuffer
 
 Metrics: TypeAlias = dict[str, np.ndarray]
 
 
 class RewardMethod(nn.Module, ABC):
+    # Regexes of the observation keys the reward model reads. Replay buffers feeding
+    # the reward model only store the observations matching one of them.
+    observation_key_patterns = (r"^low_dim_state$", r"^time$", r"rgb")
+    # Whether `compute_reward` predicts the reward of each transition independently,
+    # so that several episodes can be relabelled in a single call.
+    per_step_reward = False
+    # Networks compiled by `compile_modules`. Missing networks are skipped.
+    compiled_module_names = (
+        "encoder",
+        "view_fusion",
+        "reward",
+        "weight_tuner",
+        "markovian",
+    )
+
     def __init__(
         self,
         observation_space: spaces.Dict,
         action_space: spaces.Box,
         device: torch.device,
         initialize_before_training: bool = False,
+        amp_dtype: Optional[str] = None,
     ):
         super().__init__()
         self.observation_space = observation_space
@@ -30,6 +48,7 @@ class RewardMethod(nn.Module, ABC):
         self.logging = False
         self._activated = False
         self.initialize_before_training = initialize_before_training
+        self.amp = MixedPrecision(device, amp_dtype)
 
     @abstractmethod
     def compute_reward(
@@ -57,6 +76,19 @@ class RewardMethod(nn.Module, ABC):
     def set_eval_env_running(self, value: bool):
         self._eval_env_running = value
 
+    def compile_modules(self, compiler: ModuleCompiler):
+        """Compiles the forward of the networks in `compiled_module_names`."""
+        for name in self.compiled_module_names:
+            module = getattr(self, name, None)
+            if isinstance(module, nn.Module):
+                compiler.compile(module, f"{type(self).__name__}.{name}")
+
+    @property
+    def observation_keys(self) -> list[str]:
+        return match_observation_keys(
+            self.observation_space, self.observation_key_patterns
+        )
+
     @property
     def time_obs_size(self) -> int:
         time_obs_spec = extract_from_spec(
@@ -115,6 +147,26 @@ class RewardMethod(nn.Module, ABC):
         # taking 0 index for probability x_1 > x_2
         return F.softmax(r_hat, dim=-1)[:, 0]
 
+    def get_segment_returns(self, segments: Dict[str, torch.Tensor]) -> np.ndarray:
+        """Predicted return of each segment under each ensemble member.
+
+        Args:
+            segments: Batch of (B, T, ...) segments.
+
+        Returns:
+            (num_reward_models, B) sums of the predicted rewards.
+        """
+        returns = []
+        with torch.no_grad():
+            for member in range(self.num_reward_models):
+                returns.append(
+                    self.compute_reward(segments, member=member, return_reward=True)
+                    .sum(axis=1)
+                    .cpu()
+                    .numpy()
+                )
+        return np.asarray(returns)
+
     def get_rank_probability(
         self,
         x_1: Sequence[Dict[str, torch.Tensor]],
@@ -5,7 +5,6 @@ from typing import Optional, Sequence
 import gymnasium as gym
 import numpy as np
 import torch
-from diffusers.optimization import get_scheduler
 from tqdm import trange
 from typing_extensions import override
 
@@ -27,6 +26,8 @@ from robobase.reward_method.weight_tuner import WeightRewardModel
 
 
 class HybridReward(RewardMethod):
+    per_step_reward = True
+
     def __init__(
         self,
         reward_space: gym.spaces.Dict,
@@ -45,6 +46,7 @@ class HybridReward(RewardMethod):
         seq_len: int = 50,
         compute_batch_size: int = 32,
         use_augmentation: bool = False,
+        augmentation_mode: str = "grid_sample",
         lambda_weight: float = 1.0,
         reg_weight: float = 0.0,
         apply_final_layer_tanh: bool = False,
@@ -94,7 +96,9 @@ class HybridReward(RewardMethod):
             self.observation_space, r"rgb.*", missing_ok=True
         )
         self.aug = (
-            TimeConsistentRandomShiftsAug(pad=4) if use_augmentation else lambda x: x
+            TimeConsistentRandomShiftsAug(pad=4, mode=augmentation_mode)
+            if use_augmentation
+            else lambda x: x
         )
         self.data_aug_ratio = data_aug_ratio
 
@@ -110,6 +114,8 @@ class HybridReward(RewardMethod):
 
         self.lr_scheduler = None
         if self.adaptive_lr:
+            from diffusers.optimization import get_scheduler
+
             self.lr_scheduler = get_scheduler(
                 name="cosine",
                 optimizer=self.actor_opt,
@@ -477,94 +483,108 @@ class HybridReward(RewardMethod):
         metrics = dict()
         weighted_loss_dict = defaultdict(float)
         computed_loss_dict = defaultdict(float)
-        for mem in range(self.num_reward_models):
-            batch = next(replay_iter)
-            batch = {k: v.to(self.device) for k, v in batch.items()}
-            weighted_rewards = []
-            raw_weights = []
-            normalized_weights = []
-            markovian_rewards = []
-            for i in range(2):
-                actions = batch[f"seg{i}_action"]
-                if self.low_dim_size > 0:
-                    # (bs, seq, low_dim)
-                    qpos = extract_from_batch(batch, f"seg{i}_low_dim_state").detach()
-
-                if self.use_pixels:
-                    # (bs, seq, v, ch, h, w)
-                    rgb = stack_tensor_dictionary(
-                        extract_many_from_batch(batch, rf"seg{i}_rgb(?!.*?tp1)"), 2
+        with self.amp.autocast():
+            for mem in range(self.num_reward_models):
+                batch = next(replay_iter)
+                batch = {k: v.to(self.device) for k, v in batch.items()}
+                weighted_rewards = []
+                raw_weights = []
+                normalized_weights = []
+                markovian_rewards = []
+                for i in range(2):
+                    actions = batch[f"seg{i}_action"]
+                    if self.low_dim_size > 0:
+                        # (bs, seq, low_dim)
+                        qpos = extract_from_batch(
+                            batch, f"seg{i}_low_dim_state"
+                        ).detach()
+
+                    if self.use_pixels:
+                        # (bs, seq, v, ch, h, w)
+                        rgb = stack_tensor_dictionary(
+                            extract_many_from_batch(batch, rf"seg{i}_rgb(?!.*?tp1)"), 2
+                        )
+                        fused_rgb_feats = self.encode_rgb_feats(rgb, train=True)
+                    else:
+                        fused_rgb_feats = None
+
+                    time_obs = extract_from_batch(batch, "time", missing_ok=True)
+
+                    # Compute weighted reward
+                    # extract reward terms: (bs, seq, num_reward_terms)
+                    reward_terms = stack_tensor_dictionary(
+                        {
+                            key: batch[f"seg{i}_{key}"]
+                            for key in self.reward_space.keys()
+                        },
+                        dim=-1,
                     )
-                    fused_rgb_feats = self.encode_rgb_feats(rgb, train=True)
-                else:
-                    fused_rgb_feats = None
-
-                time_obs = extract_from_batch(batch, "time", missing_ok=True)
-
-                # Compute weighted reward
-                # extract reward terms: (bs, seq, num_reward_terms)
-                reward_terms = stack_tensor_dictionary(
-                    {key: batch[f"seg{i}_{key}"] for key in self.reward_space.keys()},
-                    dim=-1,
-                )
-                # raw_weight: (bs * seq, num_reward_terms) -> (bs, seq, num_reward_terms)
-                args = (
-                    qpos.reshape(-1, *qpos.shape[2:]),
-                    fused_rgb_feats.reshape(-1, *fused_rgb_feats.shape[2:])
-                    if fused_rgb_feats is not None
-                    else None,
-                    actions.reshape(-1, *actions.shape[2:]),
-                    time_obs.reshape(-1, *time_obs.shape[2:])
-                    if time_obs is not None
-                    else None,
-                )
-                raw_weight = self.weight_tuner(*args, member=mem).view(
-                    *actions.shape[:-2], -1, reward_terms.shape[-1]
-                )
-                normalized_weight = self.weight_tuner.transform_to_tanh(raw_weight)
-                # weighted_reward: (bs, seq, num_reward_terms) -> (bs, seq, 1) -> (bs, 1)
-                weighted_reward = (raw_weight * reward_terms).sum(dim=-1, keepdim=True)
-                if self.data_aug_ratio > 0.0:
-                    mask = self.get_cropping_mask(weighted_reward, self.data_aug_ratio)
-                    weighted_reward = weighted_reward.repeat(self.data_aug_ratio, 1, 1)
-                    weighted_reward = (mask * weighted_reward).sum(axis=-2)
-                else:
-                    weighted_reward = weighted_reward.sum(axis=-2)
-                weighted_rewards.append(weighted_reward)
-                raw_weights.append(raw_weight)
-                normalized_weights.append(normalized_weight)
-
-                # Compute markovian reward
-                markovian_reward = self.markovian(*args, member=mem)
-                # markovian_reward: (bs, seq, 1) -> (bs, 1)
-                markovian_reward = markovian_reward.view(
-                    *actions.shape[:-2], -1, markovian_reward.shape[-1]
-                )
-                if self.data_aug_ratio > 0.0:
-                    mask = self.get_cropping_mask(markovian_reward, self.data_aug_ratio)
-                    markovian_reward = markovian_reward.repeat(
-                        self.data_aug_ratio, 1, 1
+                    # raw_weight: (bs * seq, num_reward_terms) -> (bs, seq, num_reward_terms)
+                    args = (
+                        qpos.reshape(-1, *qpos.shape[2:]),
+                        fused_rgb_feats.reshape(-1, *fused_rgb_feats.shape[2:])
+                        if fused_rgb_feats is not None
+                        else None,
+                        actions.reshape(-1, *actions.shape[2:]),
+                        time_obs.reshape(-1, *time_obs.shape[2:])
+                        if time_obs is not None
+                        else None,
                     )
-                    markovian_reward = (mask * markovian_reward).sum(axis=-2)
-                else:
-                    markovian_reward = markovian_reward.sum(axis=-2)
-                markovian_rewards.append(markovian_reward)
+                    raw_weight = self.weight_tuner(*args, member=mem).view(
+                        *actions.shape[:-2], -1, reward_terms.shape[-1]
+                    )
+                    normalized_weight = self.weight_tuner.transform_to_tanh(raw_weight)
+                    # weighted_reward: (bs, seq, num_reward_terms) -> (bs, seq, 1) -> (bs, 1)
+                    weighted_reward = (raw_weight * reward_terms).sum(
+                        dim=-1, keepdim=True
+                    )
+                    if self.data_aug_ratio > 0.0:
+                        mask = self.get_cropping_mask(
+                            weighted_reward, self.data_aug_ratio
+                        )
+                        weighted_reward = weighted_reward.repeat(
+                            self.data_aug_ratio, 1, 1
+                        )
+                        weighted_reward = (mask * weighted_reward).sum(axis=-2)
+                    else:
+                        weighted_reward = weighted_reward.sum(axis=-2)
+                    weighted_rewards.append(weighted_reward)
+                    raw_weights.append(raw_weight)
+                    normalized_weights.append(normalized_weight)
+
+                    # Compute markovian reward
+                    markovian_reward = self.markovian(*args, member=mem)
+                    # markovian_reward: (bs, seq, 1) -> (bs, 1)
+                    markovian_reward = markovian_reward.view(
+                        *actions.shape[:-2], -1, markovian_reward.shape[-1]
+                    )
+                    if self.data_aug_ratio > 0.0:
+                        mask = self.get_cropping_mask(
+                            markovian_reward, self.data_aug_ratio
+                        )
+                        markovian_reward = markovian_reward.repeat(
+                            self.data_aug_ratio, 1, 1
+                        )
+                        markovian_reward = (mask * markovian_reward).sum(axis=-2)
+                    else:
+                        markovian_reward = markovian_reward.sum(axis=-2)
+                    markovian_rewards.append(markovian_reward)
 
-            labels = batch["label"]
-            if self.data_aug_ratio > 0:
-                labels = labels.repeat(self.data_aug_ratio, 1)
+                labels = batch["label"]
+                if self.data_aug_ratio > 0:
+                    labels = labels.repeat(self.data_aug_ratio, 1)
 
-            _weighted_loss_dict = self.weight_tuner.calculate_loss(
-                weighted_rewards, labels, raw_weights
-            )
-            for k, v in _weighted_loss_dict.items():
-                weighted_loss_dict[k] += v
+                _weighted_loss_dict = self.weight_tuner.calculate_loss(
+                    weighted_rewards, labels, raw_weights
+                )
+                for k, v in _weighted_loss_dict.items():
+                    weighted_loss_dict[k] += v
 
-            _computed_loss_dict = self.markovian.calculate_loss(
-                markovian_rewards, labels
-            )
-            for k, v in _computed_loss_dict.items():
-                computed_loss_dict[k] += v
+                _computed_loss_dict = self.markovian.calculate_loss(
+                    markovian_rewards, labels
+                )
+                for k, v in _computed_loss_dict.items():
+                    computed_loss_dict[k] += v
 
         for i in range(self.num_labels):
             weighted_loss_dict[f"pref_acc_label_{i}"] /= self.num_reward_models
@@ -578,12 +598,13 @@ class HybridReward(RewardMethod):
 
         self.weight_tuner_opt.zero_grad(set_to_none=True)
         self.markovian_opt.zero_grad(set_to_none=True)
-        weighted_loss_dict["loss"].backward()
-        computed_loss_dict["loss"].backward()
+        self.amp.backward(weighted_loss_dict["loss"])
+        self.amp.backward(computed_loss_dict["loss"])
 
         # step optimizer
-        self.weight_tuner_opt.step()
-        self.markovian_opt.step()
+        self.amp.step(self.weight_tuner_opt)
+        self.amp.step(self.markovian_opt)
+        self.amp.update()
 
         # step lr scheduler every batch
         # this is different from standard pytorch behavior
@@ -6,7 +6,6 @@ from typing import Optional, Sequence, Tuple
 import gymnasium as gym
 import numpy as np
 import torch
-from diffusers.optimization import get_scheduler
 from torch import nn
 from tqdm import trange
 from typing_extensions import override
@@ -112,6 +111,8 @@ class MarkovianRewardModel(nn.Module):
 
 
 class MarkovianReward(RewardMethod):
+    per_step_reward = True
+
     def __init__(
         self,
         lr: float,
@@ -128,6 +129,7 @@ class MarkovianReward(RewardMethod):
         seq_len: int = 50,
         compute_batch_size: int = 32,
         use_augmentation: bool = False,
+        augmentation_mode: str = "grid_sample",
         reward_space: gym.spaces.Dict = None,
         apply_final_layer_tanh: bool = False,
         data_aug_ratio: float = 0.0,
@@ -164,7 +166,9 @@ class MarkovianReward(RewardMethod):
             self.observation_space, r"rgb.*", missing_ok=True
         )
         self.aug = (
-            TimeConsistentRandomShiftsAug(pad=4) if use_augmentation else lambda x: x
+            TimeConsistentRandomShiftsAug(pad=4, mode=augmentation_mode)
+            if use_augmentation
+            else lambda x: x
         )
         self.data_aug_ratio = data_aug_ratio
 
@@ -180,6 +184,8 @@ class MarkovianReward(RewardMethod):
 
         self.lr_scheduler = None
         if self.adaptive_lr:
+            from diffusers.optimization import get_scheduler
+
             self.lr_scheduler = get_scheduler(
                 name="cosine",
                 optimizer=self.actor_opt,
@@ -460,57 +466,60 @@ class MarkovianReward(RewardMethod):
         metrics = dict()
         loss_dict = defaultdict(float)
 
-        for member in range(self.num_reward_models):
-            batch = next(replay_iter)
-            batch = {k: v.to(self.device) for k, v in batch.items()}
-            r_hats = []
-
-            for i in range(2):
-                # (bs, seq, action_shape)
-                actions = batch[f"seg{i}_action"]
-                if self.low_dim_size > 0:
-                    # (bs, seq, low_dim)
-                    qpos = extract_from_batch(batch, f"seg{i}_low_dim_state").detach()
-
-                if self.use_pixels:
-                    # (bs, seq, v, ch, h, w)
-                    rgb = stack_tensor_dictionary(
-                        extract_many_from_batch(batch, rf"seg{i}_rgb(?!.*?tp1)"), 2
+        with self.amp.autocast():
+            for member in range(self.num_reward_models):
+                batch = next(replay_iter)
+                batch = {k: v.to(self.device) for k, v in batch.items()}
+                r_hats = []
+
+                for i in range(2):
+                    # (bs, seq, action_shape)
+                    actions = batch[f"seg{i}_action"]
+                    if self.low_dim_size > 0:
+                        # (bs, seq, low_dim)
+                        qpos = extract_from_batch(
+                            batch, f"seg{i}_low_dim_state"
+                        ).detach()
+
+                    if self.use_pixels:
+                        # (bs, seq, v, ch, h, w)
+                        rgb = stack_tensor_dictionary(
+                            extract_many_from_batch(batch, rf"seg{i}_rgb(?!.*?tp1)"), 2
+                        )
+                        fused_rgb_feats = self.encode_rgb_feats(rgb, train=True)
+                    else:
+                        fused_rgb_feats = None
+
+                    time_obs = extract_from_batch(batch, "time", missing_ok=True)
+                    r_hat_segment = self.reward(
+                        qpos.reshape(-1, *qpos.shape[2:]),
+                        fused_rgb_feats.reshape(-1, *fused_rgb_feats.shape[2:])
+                        if fused_rgb_feats is not None
+                        else None,
+                        actions.reshape(-1, *actions.shape[2:]),
+                        time_obs.reshape(-1, *time_obs.shape[2:])
+                        if time_obs is not None
+                        else None,
+                        member=member,
                     )
-                    fused_rgb_feats = self.encode_rgb_feats(rgb, train=True)
-                else:
-                    fused_rgb_feats = None
-
-                time_obs = extract_from_batch(batch, "time", missing_ok=True)
-                r_hat_segment = self.reward(
-                    qpos.reshape(-1, *qpos.shape[2:]),
-                    fused_rgb_feats.reshape(-1, *fused_rgb_feats.shape[2:])
-                    if fused_rgb_feats is not None
-                    else None,
-                    actions.reshape(-1, *actions.shape[2:]),
-                    time_obs.reshape(-1, *time_obs.shape[2:])
-                    if time_obs is not None
-                    else None,
-                    member=member,
-                )
-                r_hat = r_hat_segment.view(
-                    *actions.shape[:-2], -1, r_hat_segment.shape[-1]
-                )
-                if self.data_aug_ratio > 0.0:
-                    mask = self.get_cropping_mask(r_hat, self.data_aug_ratio)
-                    r_hat = r_hat.repeat(self.data_aug_ratio, 1, 1)
-                    r_hat = (mask * r_hat).sum(axis=-2)
-                else:
-                    r_hat = r_hat_segment.sum(dim=-2)
-                r_hats.append(r_hat)
-
-            labels = batch["label"]
-            if self.data_aug_ratio > 0:
-                labels = labels.repeat(self.data_aug_ratio, 1)
-
-            _loss_dict = self.reward.calculate_loss(r_hats, labels)
-            for k, v in _loss_dict.items():
-                loss_dict[k] += v
+                    r_hat = r_hat_segment.view(
+                        *actions.shape[:-2], -1, r_hat_segment.shape[-1]
+                    )
+                    if self.data_aug_ratio > 0.0:
+                        mask = self.get_cropping_mask(r_hat, self.data_aug_ratio)
+                        r_hat = r_hat.repeat(self.data_aug_ratio, 1, 1)
+                        r_hat = (mask * r_hat).sum(axis=-2)
+                    else:
+                        r_hat = r_hat_segment.sum(dim=-2)
+                    r_hats.append(r_hat)
+
+                labels = batch["label"]
+                if self.data_aug_ratio > 0:
+                    labels = labels.repeat(self.data_aug_ratio, 1)
+
+                _loss_dict = self.reward.calculate_loss(r_hats, labels)
+                for k, v in _loss_dict.items():
+                    loss_dict[k] += v
 
         for i in range(self.num_labels):
             loss_dict[f"pref_acc_label_{i}"] /= self.num_reward_models
@@ -521,14 +530,15 @@ class MarkovianReward(RewardMethod):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         self.reward_opt.zero_grad(set_to_none=True)
-        loss_dict["loss"].backward()
+        self.amp.backward(loss_dict["loss"])
 
         # step optimizer
         if self.use_pixels and self.encoder_opt is not None:
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
-        self.reward_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.step(self.reward_opt)
+        self.amp.update()
 
         # step lr scheduler every batch
         # this is different from standard pytorch behavior
@@ -10,7 +10,6 @@ from robobase.models.fusion import FusionModule
 from robobase.models.encoder import EncoderModule
 
 from robobase.reward_method.core import RewardMethod
-from diffusers.optimization import get_scheduler
 
 from robobase.replay_buffer.replay_buffer import ReplayBuffer
 from robobase.method.utils import (
@@ -45,6 +44,7 @@ class PreferenceTransformer(RewardMethod):
         seq_len: int = 50,
         compute_batch_size: int = 32,
         use_augmentation: bool = False,
+        augmentation_mode: str = "grid_sample",
         *args,
         **kwargs,
     ):
@@ -74,7 +74,9 @@ class PreferenceTransformer(RewardMethod):
             self.observation_space, r"rgb.*", missing_ok=True
         )
         self.aug = (
-            TimeConsistentRandomShiftsAug(pad=4) if use_augmentation else lambda x: x
+            TimeConsistentRandomShiftsAug(pad=4, mode=augmentation_mode)
+            if use_augmentation
+            else lambda x: x
         )
 
         # T should be same across all obs
@@ -88,6 +90,8 @@ class PreferenceTransformer(RewardMethod):
 
         self.lr_scheduler = None
         if self.adaptive_lr:
+            from diffusers.optimization import get_scheduler
+
             self.lr_scheduler = get_scheduler(
                 name="cosine",
                 optimizer=self.actor_opt,
@@ -222,7 +226,8 @@ class PreferenceTransformer(RewardMethod):
             # obs: (T, elem_shape) for elem in obs
             # actions: (T, action_shape)
         elif isinstance(seq, dict):
-            assert _obs_signature is not None, "Need obs_signature for dict input."
+            if _obs_signature is None:
+                _obs_signature = self.observation_space.spaces
             # print("action length", len(seq["action"]))
             T = len(seq["action"]) - start_idx
 
@@ -360,34 +365,35 @@ class PreferenceTransformer(RewardMethod):
         # actions = batch["action"]
         # reward = batch["reward"]
 
-        loss, loss_dict = 0.0, dict()
-        r_hats = [[] for _ in range(self.reward.num_ensembles)]
-        for i in range(2):
-            actions = batch[f"seg{i}_action"]
-            if self.low_dim_size > 0:
-                # (bs, seq, low_dim)
-                obs = extract_from_batch(batch, f"seg{i}_low_dim_state")
-                qpos = obs.detach()
-
-            if self.use_pixels:
-                # (bs, seq, v, ch, h, w)
-                rgb = stack_tensor_dictionary(
-                    extract_many_from_batch(batch, rf"seg{i}_rgb(?!.*?tp1)"), 2
-                )
-                fused_rgb_feats = self.encode_rgb_feats(rgb, train=True)
+        with self.amp.autocast():
+            loss, loss_dict = 0.0, dict()
+            r_hats = [[] for _ in range(self.reward.num_ensembles)]
+            for i in range(2):
+                actions = batch[f"seg{i}_action"]
+                if self.low_dim_size > 0:
+                    # (bs, seq, low_dim)
+                    obs = extract_from_batch(batch, f"seg{i}_low_dim_state")
+                    qpos = obs.detach()
+
+                if self.use_pixels:
+                    # (bs, seq, v, ch, h, w)
+                    rgb = stack_tensor_dictionary(
+                        extract_many_from_batch(batch, rf"seg{i}_rgb(?!.*?tp1)"), 2
+                    )
+                    fused_rgb_feats = self.encode_rgb_feats(rgb, train=True)
+
+                for member in range(self.reward.num_ensembles):
+                    r_hat = self.reward(fused_rgb_feats, qpos, actions, member=member)
+                    r_hats[member].append(r_hat)
 
             for member in range(self.reward.num_ensembles):
-                r_hat = self.reward(fused_rgb_feats, qpos, actions, member=member)
-                r_hats[member].append(r_hat)
-
-        for member in range(self.reward.num_ensembles):
-            _loss, _loss_dict = self.reward.calculate_loss(
-                r_hats[member], batch["label"]
-            )
-            loss += _loss
-            for key in _loss_dict:
-                loss_dict[f"{key}_member_{member}"] = _loss_dict[key]
-        loss_dict["loss"] = loss / self.reward.num_ensembles
+                _loss, _loss_dict = self.reward.calculate_loss(
+                    r_hats[member], batch["label"]
+                )
+                loss += _loss
+                for key in _loss_dict:
+                    loss_dict[f"{key}_member_{member}"] = _loss_dict[key]
+            loss_dict["loss"] = loss / self.reward.num_ensembles
 
         # calculate gradient
         if self.use_pixels and self.encoder_opt is not None:
@@ -395,14 +401,15 @@ class PreferenceTransformer(RewardMethod):
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
                 self.view_fusion_opt.zero_grad(set_to_none=True)
         self.reward_opt.zero_grad(set_to_none=True)
-        loss_dict["loss"].backward()
+        self.amp.backward(loss_dict["loss"])
 
         # step optimizer
         if self.use_pixels and self.encoder_opt is not None:
-            self.encoder_opt.step()
+            self.amp.step(self.encoder_opt)
             if self.use_multicam_fusion and self.view_fusion_opt is not None:
-                self.view_fusion_opt.step()
-        self.reward_opt.step()
+                self.amp.step(self.view_fusion_opt)
+        self.amp.step(self.reward_opt)
+        self.amp.update()
 
         # step lr scheduler every batch
         # this is different from standard pytorch behavior
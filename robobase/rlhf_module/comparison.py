@@ -4,13 +4,20 @@ import logging
 import numpy as np
 
 from robobase.reward_method.core import RewardMethod
+from robobase.rlhf_module.utils.utils import valid_pair_mask
 
 """
-How to compare pairwise preferences (sequential, sequential_pairwise, root_pairwise)
+How to compare pairwise preferences (sequential, sequential_pairwise, root_pairwise,
+disagreement, entropy, reward_difference)
 """
 
+PAIR_SCORES = ["disagreement", "entropy", "reward_difference"]
+
 
 class ComparisonFn(ABC):
+    # Whether the next pair depends on the labels of the previous ones.
+    adaptive = False
+
     def initialize(self, segments):
         self._i = 0
         large_batch_size = len(segments[list(segments.keys())[0]])
@@ -26,12 +33,12 @@ class ComparisonFn(ABC):
         return self.__class__.__name__
 
     def increment(self):
-        if self._i >= self.half_size:
+        self._i += 1
+        if self._i >= len(self.indices):
             logging.warning(
                 "Resetting index for comparison function. This case must not be happened."
             )
             self._i = 0
-        self._i += 1
 
     def update(self, pair, label):
         pass
@@ -53,6 +60,8 @@ class SequentialPairwiseComparisonFn(ComparisonFn):
 
 
 class RootPairwiseComparisonFn(ComparisonFn):
+    adaptive = True
+
     def initialize(self, segments):
         super(RootPairwiseComparisonFn, self).initialize(segments)
         self.best_choice = 0
@@ -65,31 +74,90 @@ class RootPairwiseComparisonFn(ComparisonFn):
             self.best_choice = pair[label]
 
 
-class DisagreementComparisonFn(ComparisonFn):
-    def __init__(self, reward_model: RewardMethod):
+def sample_candidate_pairs(num_segments: int, num_pairs: int) -> np.ndarray:
+    """Samples up to `num_pairs` distinct unordered pairs of segment indices.
+
+    Returns:
+        (P, 2) array of pairs, with all pairs if there are at most `num_pairs`.
+    """
+    if num_segments * (num_segments - 1) // 2 <= num_pairs:
+        return np.stack(np.triu_indices(num_segments, k=1), axis=-1)
+    first = np.random.randint(num_segments, size=num_pairs)
+    second = (first + np.random.randint(1, num_segments, size=num_pairs)) % num_segments
+    pairs = np.sort(np.stack([first, second], axis=-1), axis=-1)
+    return np.unique(pairs, axis=0)
+
+
+def score_pairs(returns: np.ndarray, pairs: np.ndarray, score: str) -> np.ndarray:
+    """Scores candidate pairs from the ensemble returns of their segments.
+
+    Args:
+        returns: (num_reward_models, B) predicted segment returns.
+        pairs: (P, 2) segment index pairs.
+        score: One of PAIR_SCORES. Higher scores are queried first.
+
+    Returns:
+        (P,) scores.
+    """
+    # Bradley-Terry preference logits of each member, (num_reward_models, P).
+    logits = returns[:, pairs[:, 0]] - returns[:, pairs[:, 1]]
+    match score:
+        case "disagreement":
+            return (1 / (1 + np.exp(-logits))).std(axis=0)
+        case "entropy":
+            probs = np.clip((1 / (1 + np.exp(-logits))).mean(axis=0), 1e-6, 1 - 1e-6)
+            return -(probs * np.log(probs) + (1 - probs) * np.log(1 - probs))
+        case "reward_difference":
+            return -np.abs(logits.mean(axis=0))
+        case _:
+            raise ValueError(f"Unknown pair score: {score}, choose from {PAIR_SCORES}.")
+
+
+class BatchedComparisonFn(ComparisonFn):
+    """Queries the top scoring pairs out of a pool of candidate pairs.
+
+    The ensemble returns of all segments are computed once, and up to
+    `num_candidate_pairs` pairs of them are scored and masked for validity in a
+    single vectorized pass. Until the reward model is activated, segments are
+    compared as in SequentialComparisonFn.
+    """
+
+    score = None
+
+    def __init__(self, reward_model: RewardMethod, num_candidate_pairs: int = 100000):
         self.reward_model = reward_model
+        self.num_candidate_pairs = num_candidate_pairs
 
     def initialize(self, segments):
-        super(DisagreementComparisonFn, self).initialize(segments)
+        super().initialize(segments)
         if not self.reward_model.activated:
-            # If reward model is not activated, we use the default sequential comparison
-            self.top_k_index = np.arange(self.half_size)
+            return
+        num_segments = len(segments[list(segments.keys())[0]])
+        pairs = sample_candidate_pairs(num_segments, self.num_candidate_pairs)
+        pairs = pairs[valid_pair_mask(segments, pairs)]
+        returns = self.reward_model.get_segment_returns(segments)
+        scores = score_pairs(returns, pairs, self.score)
+        self.indices = [tuple(pair) for pair in pairs[(-scores).argsort()].tolist()]
+
+    def __call__(self):
+        return self.indices[self._i]
 
-        else:
-            # If reward model is activated, we use the disagreement comparison
-            # Split segments into two batches
-            x_1 = {k: v[: self.half_size] for k, v in segments.items()}
-            x_2 = {k: v[self.half_size :] for k, v in segments.items()}
-            self.indices = [(i, i + self.half_size) for i in range(self.half_size)]
 
-            _, disagree = self.reward_model.get_rank_probability(x_1, x_2)
-            self.top_k_index = (-disagree).argsort()
+class DisagreementComparisonFn(BatchedComparisonFn):
+    score = "disagreement"
 
-    def __call__(self):
-        return self.indices[self.top_k_index[self._i]]
+
+class EntropyComparisonFn(BatchedComparisonFn):
+    score = "entropy"
+
+
+class RewardDifferenceComparisonFn(BatchedComparisonFn):
+    score = "reward_difference"
 
 
-def get_comparison_fn(comparison_type, reward_model: RewardMethod):
+def get_comparison_fn(
+    comparison_type, reward_model: RewardMethod, num_candidate_pairs: int = 100000
+):
     match comparison_type:
         case "sequential":
             return SequentialComparisonFn()
@@ -98,9 +166,14 @@ def get_comparison_fn(comparison_type, reward_model: RewardMethod):
         case "root_pairwise":
             return RootPairwiseComparisonFn()
         case "disagreement":
-            return DisagreementComparisonFn(reward_model)
+            return DisagreementComparisonFn(reward_model, num_candidate_pairs)
+        case "entropy":
+            return EntropyComparisonFn(reward_model, num_candidate_pairs)
+        case "reward_difference":
+            return RewardDifferenceComparisonFn(reward_model, num_candidate_pairs)
         case _:
             raise ValueError(
                 f"Unknown comparison type: {comparison_type}, please choose between 'sequential',"
-                "'sequential_pairwise', 'root_pairwise', 'disagreement'."
+                "'sequential_pairwise', 'root_pairwise', 'disagreement', 'entropy', "
+                "'reward_difference'."
             )
@@ -1,7 +1,6 @@
 import logging
 
 import numpy as np
-from IPython.display import HTML, clear_output, display
 
 from robobase.rlhf_module.prompt import (
     get_zeroshot_locomotion_pairwise_comparison_prompt,
@@ -13,11 +12,10 @@ from robobase.rlhf_module.third_party.gemini import (
 )
 from robobase.rlhf_module.utils import (
     get_label,
-    get_video_embed,
-    preprocess_video,
     retry_on_error,
     return_random_label,
 )
+from robobase.rlhf_module.video import encode_html_video, query_video
 
 """
 How to collect feedbacks
@@ -26,19 +24,19 @@ How to collect feedbacks
 
 
 def human_feedback_fn(segments, indices, **kwargs):
+    from IPython.display import HTML, clear_output, display
+
     index, len_tot_queries = kwargs["index"], kwargs["len_tot_queries"]
-    camera_keys = [key for key in segments.keys() if "rgb" in key]
-    anim = get_video_embed(
-        preprocess_video(segments, idxs=indices, camera_keys=camera_keys),
-        num_pairs=len(indices),
-        num_cameras=len(camera_keys),
-    )
-    html_video = anim.to_html5_video()
-    html_video_with_autoplay = html_video.replace("<video ", "<video autoplay muted ")
+    # Videos are usually pre-encoded by a QueryVideoEncoder.
+    html_video = kwargs.get("html_video")
+    if html_video is None:
+        html_video = encode_html_video(
+            query_video(segments, indices), width=200 * len(indices)
+        )
 
     while True:
         clear_output(True)
-        display(HTML(html_video_with_autoplay))
+        display(HTML(html_video))
         choice = input(
             f"[{index}/{len_tot_queries}] Put Preference (a (left), d (right), quit(quit)):  "
         ).strip()
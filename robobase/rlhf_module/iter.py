@@ -22,12 +22,14 @@ from robobase.rlhf_module.prompt import (
     get_zeroshot_subtask_identification_prompt,
     get_zeroshot_video_evaluation_prompt,
 )
+from robobase.rlhf_module.render import QueryRenderer
 from robobase.rlhf_module.third_party.gemini import (
     get_gemini_video_ids,
     load_gemini_model,
     postprocess_gemini_response,
 )
 from robobase.rlhf_module.utils.utils import check_valid_pair
+from robobase.rlhf_module.video import QueryVideoEncoder
 
 """
 General function to collect preferences (LLM vs non-LLM)
@@ -40,20 +42,40 @@ def collect_basic_preferences(
     comparison_fn: object,
     feedback_fn: Callable,
     feedback_iter: int,
+    video_encoder: QueryVideoEncoder = None,
+    num_prefetch: int = 0,
 ):
     tot_queries = range(num_queries)
     logging.info("START!")
     comparison_fn.initialize(segments)
 
+    pairs = None
+    if video_encoder is not None and not comparison_fn.adaptive:
+        # Pairs don't depend on the labels, so the videos of the next
+        # `num_prefetch` queries are encoded while the current one is labelled.
+        pairs = _select_query_pairs(segments, tot_queries, comparison_fn)
+
     feedbacks = []
     for i in tot_queries:
-        pair = comparison_fn()
-        while not check_valid_pair(segments, pair):
-            comparison_fn.increment()
+        if pairs is None:
             pair = comparison_fn()
-        label = feedback_fn(segments, pair, index=i, len_tot_queries=len(tot_queries))
+            while not check_valid_pair(segments, pair):
+                comparison_fn.increment()
+                pair = comparison_fn()
+        else:
+            pair = pairs[i]
+        kwargs = {}
+        if video_encoder is not None:
+            if pairs is not None:
+                for upcoming in pairs[i : i + num_prefetch + 1]:
+                    video_encoder.submit(segments, upcoming)
+            kwargs["html_video"] = video_encoder.get(segments, pair)
+        label = feedback_fn(
+            segments, pair, index=i, len_tot_queries=len(tot_queries), **kwargs
+        )
         comparison_fn.update(pair, label)
-        comparison_fn.increment()
+        if pairs is None:
+            comparison_fn.increment()
 
         pref_dict = {
             "segment_0": {
@@ -70,6 +92,39 @@ def collect_basic_preferences(
     return feedbacks, None
 
 
+def collect_human_preferences(
+    segments: Sequence,
+    num_queries: int,
+    comparison_fn: object,
+    feedback_fn: Callable,
+    feedback_iter: int,
+    num_prefetch: int,
+    num_video_workers: int,
+):
+    with QueryVideoEncoder(num_video_workers) as video_encoder:
+        return collect_basic_preferences(
+            segments,
+            num_queries,
+            comparison_fn,
+            feedback_fn,
+            feedback_iter,
+            video_encoder=video_encoder,
+            num_prefetch=num_prefetch,
+        )
+
+
+def _select_query_pairs(segments, tot_queries, comparison_fn):
+    pair_indices = []
+    for _ in tot_queries:
+        pair = comparison_fn()
+        while not check_valid_pair(segments, pair):
+            comparison_fn.increment()
+            pair = comparison_fn()
+        pair_indices.append(pair)
+        comparison_fn.increment()
+    return pair_indices
+
+
 # 1. evaluate videos.
 async def _identify_subtask_manipulation_videos(
     videos,
@@ -169,6 +224,7 @@ async def collect_gemini_manipulation_preferences(
     subtasks: str,
     video_path: Path,
     feedback_iter: int,
+    query_renderer: QueryRenderer = None,
 ):
     target_viewpoints = gemini_model_config.target_viewpoints
     tot_queries = range(num_queries)
@@ -179,24 +235,26 @@ async def collect_gemini_manipulation_preferences(
     feedbacks = []
     total_metadata = []
 
+    pair_indices = _select_query_pairs(segments, tot_queries, comparison_fn)
+    if query_renderer is not None:
+        segments = {
+            **segments,
+            **query_renderer.render(segments, np.concatenate(pair_indices)),
+        }
+
     # upload videos in linear way
-    pair_indices = []
     videos = []
-    for i in tqdm(tot_queries, desc="Uploading videos", position=0, leave=False):
-        pair = comparison_fn()
-        while not check_valid_pair(segments, pair):
-            comparison_fn.increment()
-            pair = comparison_fn()
+    for i, pair in enumerate(
+        tqdm(pair_indices, desc="Uploading videos", position=0, leave=False)
+    ):
         video1 = get_gemini_video_ids(
             segments, pair[0], target_viewpoints, video_path, feedback_iter, i, 0
         )
         video2 = get_gemini_video_ids(
             segments, pair[1], target_viewpoints, video_path, feedback_iter, i, 1
         )
-        pair_indices.append(pair)
         videos.append(video1)
         videos.append(video2)
-        comparison_fn.increment()
 
     videos = [(videos[i], videos[i + 1]) for i in range(0, len(videos), 2)]
     responses = await _collect_manipulation_feedback(
@@ -302,6 +360,7 @@ async def collect_gemini_locomotion_preferences(
     task_description: str,
     video_path: Path,
     feedback_iter: int,
+    query_renderer: QueryRenderer = None,
 ):
     target_viewpoints = gemini_model_config.target_viewpoints
     tot_queries = range(num_queries)
@@ -311,24 +370,26 @@ async def collect_gemini_locomotion_preferences(
     feedbacks = []
     total_metadata = []
 
+    pair_indices = _select_query_pairs(segments, tot_queries, comparison_fn)
+    if query_renderer is not None:
+        segments = {
+            **segments,
+            **query_renderer.render(segments, np.concatenate(pair_indices)),
+        }
+
     # upload videos in linear way
-    pair_indices = []
     videos = []
-    for i in tqdm(tot_queries, desc="Uploading videos", position=0, leave=False):
-        pair = comparison_fn()
-        while not check_valid_pair(segments, pair):
-            comparison_fn.increment()
-            pair = comparison_fn()
+    for i, pair in enumerate(
+        tqdm(pair_indices, desc="Uploading videos", position=0, leave=False)
+    ):
         video1 = get_gemini_video_ids(
             segments, pair[0], target_viewpoints, video_path, feedback_iter, i, 0
         )
         video2 = get_gemini_video_ids(
             segments, pair[1], target_viewpoints, video_path, feedback_iter, i, 1
         )
-        pair_indices.append(pair)
         videos.append(video1)
         videos.append(video2)
-        comparison_fn.increment()
 
     videos = [(videos[i], videos[i + 1]) for i in range(0, len(videos), 2)]
     responses = await _collect_locomotion_feedback(
@@ -427,9 +488,15 @@ async def collect_gemini_locomotion_preferences(
 
 
 def get_rlhf_iter_fn(
-    work_dir: Path, cfg: DictConfig, env_factory: EnvFactory, reward_model: RewardMethod
+    work_dir: Path,
+    cfg: DictConfig,
+    env_factory: EnvFactory,
+    reward_model: RewardMethod,
+    query_renderer: QueryRenderer = None,
 ):
-    comparison_fn = get_comparison_fn(cfg.rlhf.comparison_type, reward_model)
+    comparison_fn = get_comparison_fn(
+        cfg.rlhf.comparison_type, reward_model, cfg.rlhf.num_candidate_pairs
+    )
     feedback_fn = get_feedback_fn(cfg.env.env_name, cfg.rlhf.feedback_type)
 
     match cfg.rlhf.feedback_type:
@@ -455,6 +522,7 @@ def get_rlhf_iter_fn(
                     general_criteria=general_criteria,
                     subtasks=subtasks,
                     video_path=video_path,
+                    query_renderer=query_renderer,
                 )
             elif cfg.env.env_name in ["dmc", "locomujoco"]:
                 return partial(
@@ -465,8 +533,18 @@ def get_rlhf_iter_fn(
                     gemini_model_config=gemini_model_config,
                     task_description=task_description,
                     video_path=video_path,
+                    query_renderer=query_renderer,
                 )
-        case "human" | "random" | "script":
+        case "human":
+            return partial(
+                collect_human_preferences,
+                num_queries=cfg.rlhf_replay.num_queries,
+                comparison_fn=comparison_fn,
+                feedback_fn=feedback_fn,
+                num_prefetch=cfg.rlhf.video_prefetch,
+                num_video_workers=cfg.rlhf.num_video_workers,
+            )
+        case "random" | "script":
             return partial(
                 collect_basic_preferences,
                 num_queries=cfg.rlhf_replay.num_queries,
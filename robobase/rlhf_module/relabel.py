@@ -0,0 +1,105 @@
+import queue
+import threading
+from typing import Any
+
+import numpy as np
+
+from robobase.replay_buffer.uniform_replay_buffer import REWARD
+from robobase.reward_method.core import RewardMethod
+
+"""
+Relabeling of finished episodes with the reward model on a background thread
+"""
+
+
+class RewardRelabeler:
+    """Relabels finished episodes with the reward model on a background thread.
+
+    Episodes are submitted as dicts of (T, ...) arrays, as popped from
+    `EpisodeRollouts`, together with a payload that is handed back with them. The
+    worker takes all episodes waiting in the queue, up to `max_batch_episodes`, and
+    relabels them with a single `compute_reward` call if the reward model predicts
+    per-step rewards. Relabelled
+    episodes are returned by `collect` in the order they were submitted.
+    """
+
+    def __init__(self, reward_model: RewardMethod, max_batch_episodes: int = 8):
+        """Init.
+
+        Args:
+            reward_model: Reward model relabeling the episodes.
+            max_batch_episodes: Maximum number of episodes relabelled in one call.
+        """
+        if max_batch_episodes < 1:
+            raise ValueError("max_batch_episodes must be >= 1.")
+        self._reward_model = reward_model
+        self._max_batch_episodes = max_batch_episodes
+        self._episodes = queue.Queue()
+        self._results = queue.Queue()
+        self._num_pending = 0
+        self._thread = threading.Thread(
+            target=self._loop, name="robobase-relabeler", daemon=True
+        )
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            items = [self._episodes.get()]
+            while items[-1] is not None and len(items) < self._max_batch_episodes:
+                try:
+                    items.append(self._episodes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = items[-1] is None
+            items = [item for item in items if item is not None]
+            try:
+                episodes = self._relabel([episode for episode, _ in items])
+            except Exception as e:
+                self._results.put(e)
+                return
+            for episode, (_, payload) in zip(episodes, items):
+                self._results.put((episode, payload))
+            if stop:
+                return
+
+    def _relabel(self, episodes: list[dict]) -> list[dict]:
+        if not episodes:
+            return episodes
+        if not self._reward_model.per_step_reward or len(episodes) == 1:
+            return [self._reward_model.compute_reward(episode) for episode in episodes]
+        batch = {
+            k: np.concatenate([episode[k] for episode in episodes])
+            for k in episodes[0].keys()
+        }
+        rewards = self._reward_model.compute_reward(batch)[REWARD]
+        splits = np.cumsum([len(episode[REWARD]) for episode in episodes])[:-1]
+        for episode, reward in zip(episodes, np.split(rewards, splits)):
+            episode[REWARD] = reward
+        return episodes
+
+    def submit(self, episode: dict, payload: Any = None):
+        """Queues a finished episode for relabeling."""
+        self._num_pending += 1
+        self._episodes.put((episode, payload))
+
+    def collect(self, block: bool = False) -> list[tuple[dict, Any]]:
+        """Returns the relabelled episodes with their payloads.
+
+        Args:
+            block: If true, wait until all submitted episodes are relabelled.
+        """
+        collected = []
+        while self._num_pending > 0:
+            try:
+                result = self._results.get(block=block)
+            except queue.Empty:
+                break
+            if isinstance(result, Exception):
+                raise RuntimeError("Reward relabeler failed.") from result
+            self._num_pending -= 1
+            collected.append(result)
+        return collected
+
+    def close(self):
+        self._episodes.put(None)
+        self._thread.join()
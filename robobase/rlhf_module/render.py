@@ -0,0 +1,77 @@
+import multiprocessing
+from typing import Sequence
+
+import numpy as np
+from omegaconf import DictConfig
+
+from robobase.envs.env import EnvFactory
+
+"""
+Re-rendering of query videos from simulator states
+"""
+
+QUERY_STATE = "query_state"
+QUERY_RENDER_MODES = ["step", "state"]
+
+_worker_env = None
+
+
+def _init_worker(env_factory: EnvFactory, cfg: DictConfig):
+    global _worker_env
+    _worker_env = env_factory.make_eval_env(cfg)
+    _worker_env.reset()
+
+
+def _render_segment(states: np.ndarray) -> dict[str, np.ndarray]:
+    frames = [_worker_env.unwrapped.render_sim_state(state) for state in states]
+    return {key: np.stack([f[key] for f in frames]) for key in frames[0]}
+
+
+class QueryRenderer:
+    """Renders query videos from the simulator states stored in the segments.
+
+    With `rlhf.query_render: state`, envs observe a flat simulator state under
+    `query_state` instead of rendering `query_pixels_{key}` at every step. Only the
+    segments that are sent to a labeler are then rendered, by restoring each state in
+    a pool of worker processes that own an env each.
+    """
+
+    def __init__(self, env_factory: EnvFactory, cfg: DictConfig, num_workers: int):
+        self._env_factory = env_factory
+        self._cfg = cfg
+        self._num_workers = num_workers
+        self._pool = None
+
+    def render(
+        self, segments: dict, indices: Sequence[int]
+    ) -> dict[str, dict[int, np.ndarray]]:
+        """Renders the query videos of the given segments.
+
+        Args:
+            segments: Batch of query segments containing `query_state`.
+            indices: Indices of the segments to render.
+
+        Returns:
+            Mapping from `query_pixels_{key}` to a dict of (T, H, W, 3) videos keyed by
+            segment index.
+        """
+        if self._pool is None:
+            # Spawn, as simulators and renderers are not fork-safe.
+            self._pool = multiprocessing.get_context("spawn").Pool(
+                self._num_workers,
+                initializer=_init_worker,
+                initargs=(self._env_factory, self._cfg),
+            )
+        indices = sorted(set(int(i) for i in indices))
+        states = [np.asarray(segments[QUERY_STATE][i]) for i in indices]
+        videos = {}
+        for idx, frames in zip(indices, self._pool.map(_render_segment, states)):
+            for key, video in frames.items():
+                videos.setdefault(f"query_pixels_{key}", {})[idx] = video
+        return videos
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
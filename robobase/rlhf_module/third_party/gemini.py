@@ -2,18 +2,21 @@ import logging
 import os
 import time
 
-import google.generativeai as genai
 import imageio
 
 from robobase.rlhf_module.utils import retry_on_error
 
 
 def configure_gemini():
+    import google.generativeai as genai
+
     api_key = os.getenv("GEMINI_API_KEY")
     genai.configure(api_key=api_key)
 
 
 def load_gemini_model(cfg):
+    import google.generativeai as genai
+
     generation_config = {
         "temperature": cfg.temperature,
         "top_p": cfg.top_p,
@@ -40,6 +43,8 @@ def load_gemini_model(cfg):
     10, callback_fn=lambda *_: ValueError("Failed to upload video to Gemini")
 )
 def upload_video_to_genai(video_path, verbose=False):
+    import google.generativeai as genai
+
     video_file = genai.upload_file(path=video_path)
     while video_file.state.name == "PROCESSING":
         if verbose:
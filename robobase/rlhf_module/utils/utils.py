@@ -2,9 +2,7 @@ import logging
 import time
 from typing import Dict, Sequence
 
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib import animation
 
 
 def return_random_label(*_, **kwargs):
@@ -55,6 +53,9 @@ def timeout_callback(max_time=20):
 
 
 def get_video_embed(video, num_pairs=2, num_cameras=3):
+    import matplotlib.pyplot as plt
+    from matplotlib import animation
+
     # Video shape must be (N, H, W, C)
     fig = plt.figure(figsize=(num_pairs * 2, num_cameras * 2))
     im = plt.imshow(video[0, :, :, :])
@@ -105,3 +106,12 @@ def check_valid_pair(segments, pair):
         segments["episode_number"][pair[1]],
     )
     return index_1 != index_2 or ep_num_1 != ep_num_2
+
+
+def valid_pair_mask(segments, pairs: np.ndarray) -> np.ndarray:
+    """Vectorized `check_valid_pair` over (P, 2) segment index pairs."""
+    indices = np.asarray(segments["indices"]).reshape(-1)
+    ep_nums = np.asarray(segments["episode_number"]).reshape(-1)
+    return (indices[pairs[:, 0]] != indices[pairs[:, 1]]) | (
+        ep_nums[pairs[:, 0]] != ep_nums[pairs[:, 1]]
+    )
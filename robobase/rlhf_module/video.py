@@ -0,0 +1,104 @@
+import base64
+import multiprocessing
+from typing import Sequence
+
+import imageio.v3 as iio
+import numpy as np
+
+from robobase.rlhf_module.utils import preprocess_video
+
+"""
+Encoding of query videos for human labelers
+"""
+
+
+def query_video(segments: dict, pair: Sequence[int]) -> np.ndarray:
+    """Returns the (T, H, W, C) video of a query, with the cameras of each segment
+    stacked vertically and the segments side by side."""
+    camera_keys = [key for key in segments.keys() if "rgb" in key]
+    return preprocess_video(segments, idxs=pair, camera_keys=camera_keys)
+
+
+def encode_html_video(video: np.ndarray, fps: int = 20, width: int = None) -> str:
+    """Encodes a (T, H, W, C) video as an autoplaying, looping HTML5 video.
+
+    Args:
+        video: The uint8 frames to encode.
+        fps: Frames per second.
+        width: Display width in pixels. Defaults to the width of the frames.
+
+    Returns:
+        A `<video>` tag with the mp4 embedded as a base64 data URI.
+    """
+    mp4 = iio.imwrite(
+        "<bytes>",
+        np.asarray(video, dtype=np.uint8),
+        extension=".mp4",
+        fps=fps,
+        macro_block_size=2,
+    )
+    src = base64.b64encode(mp4).decode("ascii")
+    width = "" if width is None else f' width="{width}"'
+    return (
+        f"<video{width} autoplay muted loop controls>"
+        f'<source type="video/mp4" src="data:video/mp4;base64,{src}"></video>'
+    )
+
+
+class QueryVideoEncoder:
+    """Encodes the videos of upcoming queries in a pool of worker processes.
+
+    Queries are submitted as soon as their pair is known, and encoded while the
+    labeler is still labeling earlier ones, so `get` returns immediately once the
+    labeler reaches them. With `num_workers=0`, videos are encoded on `get`.
+    """
+
+    def __init__(self, num_workers: int, fps: int = 20):
+        """Init.
+
+        Args:
+            num_workers: Number of encoding processes.
+            fps: Frames per second of the encoded videos.
+        """
+        self._num_workers = num_workers
+        self._fps = fps
+        self._pool = None
+        self._pending = {}
+
+    def _width(self, pair: Sequence[int]) -> int:
+        return 200 * len(pair)
+
+    def submit(self, segments: dict, pair: Sequence[int]):
+        """Starts encoding the video of a query, if not already started."""
+        key = tuple(int(i) for i in pair)
+        if self._num_workers == 0 or key in self._pending:
+            return
+        if self._pool is None:
+            self._pool = multiprocessing.get_context("spawn").Pool(self._num_workers)
+        self._pending[key] = self._pool.apply_async(
+            encode_html_video,
+            (query_video(segments, pair), self._fps, self._width(pair)),
+        )
+
+    def get(self, segments: dict, pair: Sequence[int]) -> str:
+        """Returns the HTML video of a query, waiting for it if still encoding."""
+        key = tuple(int(i) for i in pair)
+        if self._num_workers == 0:
+            return encode_html_video(
+                query_video(segments, pair), self._fps, self._width(pair)
+            )
+        self.submit(segments, pair)
+        return self._pending.pop(key).get()
+
+    def close(self):
+        self._pending = {}
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
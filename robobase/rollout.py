@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class EpisodeRollouts:
+    """Columnar buffers of the ongoing episodes of a vector env.
+
+    Every element of a transition (e.g. action, reward, each observation) is stored
+    in one preallocated (num_envs, capacity, ...) array, so a step of all envs is
+    written with a single assignment per element. Arrays are allocated on the first
+    `add` and grow when an episode outlasts the capacity.
+    """
+
+    def __init__(self, num_envs: int, capacity: int):
+        """Init.
+
+        Args:
+            num_envs: Number of envs of the vector env.
+            capacity: Expected maximum number of transitions in an episode.
+        """
+        self._num_envs = num_envs
+        self._capacity = max(1, capacity)
+        self._env_indices = np.arange(num_envs)
+        self._lengths = np.zeros(num_envs, dtype=np.int64)
+        self._columns = {}
+
+    def add(self, transitions: dict[str, np.ndarray]):
+        """Appends a transition to the episode of each env.
+
+        Args:
+            transitions: (num_envs, ...) array of each element. Elements missing
+                from this step are zero-filled.
+        """
+        if np.any(self._lengths == self._capacity):
+            self._grow()
+        for name, value in transitions.items():
+            if name not in self._columns:
+                value = np.asarray(value)
+                self._columns[name] = np.zeros(
+                    (self._num_envs, self._capacity) + value.shape[1:], value.dtype
+                )
+            self._columns[name][self._env_indices, self._lengths] = value
+        for name in self._columns.keys() - transitions.keys():
+            self._columns[name][self._env_indices, self._lengths] = 0
+        self._lengths += 1
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.zeros(
+                (self._num_envs, self._capacity) + column.shape[2:], column.dtype
+            )
+            grown[:, : column.shape[1]] = column
+            self._columns[name] = grown
+
+    def pop(self, env_index: int) -> dict[str, np.ndarray]:
+        """Returns the transitions of the episode of an env, and starts a new one.
+
+        Returns:
+            (T, ...) array of each element.
+        """
+        length = self._lengths[env_index]
+        episode = {
+            name: column[env_index, :length].copy()
+            for name, column in self._columns.items()
+        }
+        self._lengths[env_index] = 0
+        return episode
@@ -729,24 +729,6 @@ def convert_numpy_to_torch(array, device="cuda"):
         return array
 
 
-def compute_state_entropy(obs, full_obs, k):
-    batch_size = 1024
-    with torch.no_grad():
-        dists = []
-        for idx in range(len(full_obs) // batch_size + 1):
-            start = idx * batch_size
-            end = (idx + 1) * batch_size
-            dist = torch.norm(
-                obs[:, None, :] - full_obs[None, start:end, :], dim=-1, p=2
-            )
-            dists.append(dist)
-
-        dists = torch.cat(dists, dim=1)
-        knn_dists = torch.kthvalue(dists, k=k + 1, dim=1).values
-        state_entropy = knn_dists
-    return state_entropy.unsqueeze(1)
-
-
 class TorchRunningMeanStd:
     def __init__(self, epsilon=1e-4, shape=(), device=None):
         self.mean = torch.zeros(shape, device=device)
@@ -1,9 +1,11 @@
 import asyncio
+import contextlib
+import copy
 import logging
 import random
-import shutil
 import signal
 import sys
+import threading
 import time
 from functools import partial
 from pathlib import Path
@@ -20,20 +22,43 @@ from torch.utils.data import DataLoader
 from tqdm import tqdm
 
 from robobase import utils
+from robobase.actor_learner import Actor
+from robobase.checkpoint import (
+    Checkpointer,
+    load_optimizer_state_dicts,
+    optimizer_state_dicts,
+)
+from robobase.compiler import ModuleCompiler
 from robobase.envs.env import EnvFactory
 from robobase.logger import Logger
+from robobase.method.core import Method
+from robobase.profiler import PhaseProfiler
+from robobase.replay_buffer.episode_codec import EpisodeCodec
 from robobase.replay_buffer.prioritized_replay_buffer import PrioritizedReplayBuffer
-from robobase.replay_buffer.replay_buffer import ReplayBuffer
+from robobase.replay_buffer.replay_buffer import (
+    ReplayBuffer,
+    project_observation_space,
+)
 from robobase.replay_buffer.rlhf.feedback_replay_buffer import FeedbackReplayBuffer
+from robobase.replay_buffer.rlhf.feedback_sampler import (
+    FEEDBACK_SAMPLER_MODES,
+    FeedbackEpochSampler,
+)
 from robobase.replay_buffer.rlhf.query_replay_buffer import QueryReplayBuffer
 from robobase.replay_buffer.uniform_replay_buffer import (
+    ACTION,
+    REWARD,
+    TERMINAL,
+    TRUNCATED,
     UniformReplayBuffer,
     load_episode,
-    save_episode,
 )
 from robobase.rlhf_module.iter import get_rlhf_iter_fn
 from robobase.rlhf_module.query import get_query_fn
+from robobase.rlhf_module.relabel import RewardRelabeler
+from robobase.rlhf_module.render import QUERY_RENDER_MODES, QueryRenderer
 from robobase.rlhf_module.third_party.gemini import configure_gemini
+from robobase.rollout import EpisodeRollouts
 
 torch.backends.cudnn.benchmark = True
 
@@ -59,11 +84,20 @@ def relabel_with_predictor(reward_model, replay_buffer, is_initial: bool = False
     ):
         episode = load_episode(ep_fn)
         new_episode = reward_model.compute_reward(episode)
-        save_episode(new_episode, ep_fn)
+        # Only the rewards are rewritten, other arrays are copied still compressed.
+        replay_buffer._episode_codec.update(ep_fn, {REWARD: new_episode[REWARD]})
 
     replay_buffer._try_fetch()
 
 
+def _create_episode_codec(cfg: DictConfig) -> EpisodeCodec:
+    return EpisodeCodec(
+        cfg.replay.episode_codec.name,
+        level=cfg.replay.episode_codec.level,
+        num_threads=cfg.replay.episode_codec.num_threads,
+    )
+
+
 def _create_default_replay_buffer(
     cfg: DictConfig,
     observation_space: gym.Space,
@@ -104,6 +138,7 @@ def _create_default_replay_buffer(
         sequential=cfg.replay.sequential,
         max_episode_number=max_episode_number,
         purge_replay_on_shutdown=True,
+        episode_codec=_create_episode_codec(cfg),
     )
 
 
@@ -152,6 +187,7 @@ def _create_default_query_replay_buffer(
         transition_seq_len=cfg.rlhf_replay.seq_len,
         max_episode_number=cfg.rlhf_replay.max_episode_number if not use_demo else 0,
         upload_gemini=cfg.rlhf.feedback_type == "gemini",
+        episode_codec=_create_episode_codec(cfg),
     )
 
 
@@ -175,43 +211,27 @@ def _create_default_feedback_replay_buffer(
         transition_seq_len=cfg.rlhf_replay.seq_len,
         num_labels=cfg.rlhf_replay.num_labels,
         purge_replay_on_shutdown=False,
+        episode_codec=_create_episode_codec(cfg),
     )
 
 
-def _create_default_envs(cfg: DictConfig) -> EnvFactory:
-    factory = None
-    if cfg.env.env_name == "rlbench":
-        from robobase.envs.rlbench import RLBenchEnvFactory
-
-        factory = RLBenchEnvFactory()
-    elif cfg.env.env_name == "dmc":
-        from robobase.envs.dmc import DMCEnvFactory
-
-        factory = DMCEnvFactory()
-    elif cfg.env.env_name == "bigym":
-        from robobase.envs.bigym import BiGymEnvFactory
+# Env factory of each `env.env_name`, imported on first use so that a run only
+# imports the simulator of its own suite.
+ENV_FACTORIES = {
+    "rlbench": "robobase.envs.rlbench.RLBenchEnvFactory",
+    "dmc": "robobase.envs.dmc.DMCEnvFactory",
+    "bigym": "robobase.envs.bigym.BiGymEnvFactory",
+    "d4rl": "robobase.envs.d4rl.D4RLEnvFactory",
+    "agym": "robobase.envs.agym.AGymEnvFactory",
+    "humanoidbench": "robobase.envs.humanoidbench.HumanoidBenchEnvFactory",
+    "locomujoco": "robobase.envs.locomujoco.LocoMujocoEnvFactory",
+}
 
-        factory = BiGymEnvFactory()
-    elif cfg.env.env_name == "d4rl":
-        from robobase.envs.d4rl import D4RLEnvFactory
 
-        factory = D4RLEnvFactory()
-    elif cfg.env.env_name == "agym":
-        from robobase.envs.agym import AGymEnvFactory
-
-        factory = AGymEnvFactory()
-    elif cfg.env.env_name == "humanoidbench":
-        from robobase.envs.humanoidbench import HumanoidBenchEnvFactory
-
-        factory = HumanoidBenchEnvFactory()
-
-    elif cfg.env.env_name == "locomujoco":
-        from robobase.envs.locomujoco import LocoMujocoEnvFactory
-
-        factory = LocoMujocoEnvFactory()
-    else:
-        ValueError()
-    return factory
+def _create_default_envs(cfg: DictConfig) -> EnvFactory:
+    if cfg.env.env_name not in ENV_FACTORIES:
+        raise ValueError(f"Unknown env: {cfg.env.env_name}.")
+    return hydra.utils.get_class(ENV_FACTORIES[cfg.env.env_name])()
 
 
 class Workspace:
@@ -273,6 +293,7 @@ class Workspace:
 
         # create logger
         self.logger = Logger(self.work_dir, cfg=self.cfg)
+        self._checkpointer = Checkpointer(asynchronous=cfg.async_snapshot)
         self.env_factory = env_factory
 
         if (num_demos := cfg.demos) != 0:
@@ -310,8 +331,16 @@ class Workspace:
             replay_beta=cfg.replay.beta,
             frame_stack_on_channel=cfg.frame_stack_on_channel,
             intrinsic_reward_module=intrinsic_reward_module,
+            amp_dtype=cfg.amp_dtype,
         )
         self.agent.train(False)
+        self._compiler = ModuleCompiler(
+            mode=cfg.compile.mode,
+            fullgraph=cfg.compile.fullgraph,
+            max_signatures=cfg.compile.max_signatures,
+        )
+        if cfg.compile.enabled:
+            self.agent.compile_modules(self._compiler)
 
         # Make training environment
         if cfg.num_train_envs > 0:
@@ -320,7 +349,11 @@ class Workspace:
             self.train_envs = None
             logging.warning("Train env is not created. Training will not be supported ")
 
+        # Each replay buffer only stores the observations its consumers read.
+        replay_observation_keys = self.agent.observation_keys
         self.use_rlhf = cfg.rlhf.use_rlhf
+        self._query_renderer = None
+        self._relabeler = None
         if self.use_rlhf:
             reward_space = self.eval_env.unwrapped.reward_space
             extra_replay_elements = reward_space
@@ -331,11 +364,26 @@ class Workspace:
                 observation_space=observation_space,
                 action_space=action_space,
                 reward_space=reward_space,
+                amp_dtype=cfg.amp_dtype,
             )
             self.reward_model.train(False)
+            if cfg.compile.enabled:
+                self.reward_model.compile_modules(self._compiler)
+            reward_observation_keys = self.reward_model.observation_keys
+            # Replay is relabelled by the reward model, and query segments also
+            # carry the observations only shown to labelers, e.g. query videos.
+            replay_observation_keys = replay_observation_keys + reward_observation_keys
+            query_observation_space = project_observation_space(
+                observation_space,
+                reward_observation_keys
+                + [k for k in observation_space.keys() if k.startswith("query_")],
+            )
+            feedback_observation_space = project_observation_space(
+                observation_space, reward_observation_keys
+            )
             self.query_replay_buffer = _create_default_query_replay_buffer(
                 cfg,
-                observation_space,
+                query_observation_space,
                 action_space,
                 save_dir=self.work_dir,
                 extra_replay_elements=extra_replay_elements,
@@ -343,7 +391,7 @@ class Workspace:
 
             self.feedback_replay_buffer = _create_default_feedback_replay_buffer(
                 cfg,
-                observation_space,
+                feedback_observation_space,
                 action_space,
                 save_dir=self.work_dir,
                 extra_replay_elements=extra_replay_elements,
@@ -363,16 +411,53 @@ class Workspace:
                 worker_init_fn=partial(_worker_init_fn, offset=4567),
             )
             self._query_replay_iter, self._feedback_replay_iter = None, None
+            self._feedback_sampler = None
+            if cfg.rlhf_replay.feedback_sampler.mode not in FEEDBACK_SAMPLER_MODES:
+                raise ValueError(
+                    "rlhf_replay.feedback_sampler.mode must be one of "
+                    f"{FEEDBACK_SAMPLER_MODES}, got "
+                    f"{cfg.rlhf_replay.feedback_sampler.mode}."
+                )
+            if cfg.rlhf_replay.feedback_sampler.mode == "epoch":
+                self._feedback_sampler = FeedbackEpochSampler(
+                    self.feedback_replay_buffer.batch_size,
+                    # Ensembles draw one batch per member.
+                    num_streams=getattr(self.reward_model, "num_reward_models", 1),
+                    stratify_label=cfg.rlhf_replay.feedback_sampler.stratify_label,
+                    stratify_round=cfg.rlhf_replay.feedback_sampler.stratify_round,
+                    device=(
+                        self.device
+                        if cfg.rlhf_replay.feedback_sampler.on_device
+                        else "cpu"
+                    ),
+                )
 
             # RLHF settings
             self._reward_pretrain_step = 0
             self._total_feedback = 0
             self._feedback_iter = 0
 
+            if cfg.rlhf.query_render not in QUERY_RENDER_MODES:
+                raise ValueError(
+                    f"rlhf.query_render must be one of {QUERY_RENDER_MODES}, "
+                    f"got {cfg.rlhf.query_render}."
+                )
+            if cfg.rlhf.query_render == "state":
+                self._query_renderer = QueryRenderer(
+                    env_factory, cfg, cfg.rlhf.num_render_workers
+                )
             self._rlhf_iter_fn = get_rlhf_iter_fn(
-                self.work_dir, cfg, env_factory, self.reward_model
+                self.work_dir,
+                cfg,
+                env_factory,
+                self.reward_model,
+                query_renderer=self._query_renderer,
             )
             self._query_fn = get_query_fn(cfg.rlhf.query_type)
+            if cfg.rlhf.async_relabel:
+                self._relabeler = RewardRelabeler(
+                    self.reward_model, cfg.rlhf.relabel_batch_episodes
+                )
 
             if cfg.rlhf.feedback_type == "gemini":
                 configure_gemini()
@@ -384,9 +469,12 @@ class Workspace:
         else:
             extra_replay_elements = None
 
+        replay_observation_space = project_observation_space(
+            observation_space, replay_observation_keys
+        )
         self.replay_buffer = create_replay_fn(
             cfg,
-            observation_space,
+            replay_observation_space,
             action_space,
             save_dir=self.work_dir,
             extra_replay_elements=extra_replay_elements,
@@ -412,7 +500,7 @@ class Workspace:
         if self.use_demo_replay:
             self.demo_replay_buffer = create_replay_fn(
                 cfg,
-                observation_space,
+                replay_observation_space,
                 action_space,
                 save_dir=self.work_dir,
                 demo_replay=True,
@@ -428,7 +516,7 @@ class Workspace:
             if self.use_rlhf:
                 self.demo_query_replay_buffer = _create_default_query_replay_buffer(
                     cfg,
-                    observation_space,
+                    query_observation_space,
                     action_space,
                     save_dir=self.work_dir,
                     use_demo=True,
@@ -446,6 +534,21 @@ class Workspace:
                     "Demo replay is not compatible with prioritized replay"
                 )
 
+        if cfg.actor_learner.enabled:
+            # The actor thread adds to the replay buffers while the learner samples
+            # from them. This is only safe when sampling happens in the DataLoader
+            # workers and does not write to the buffers in this process.
+            if self.prioritized_replay:
+                raise NotImplementedError(
+                    "Actor-learner training is not compatible with prioritized "
+                    "replay, as priorities are updated while the actor adds to it."
+                )
+            if cfg.replay.num_workers == 0:
+                raise NotImplementedError(
+                    "Actor-learner training requires replay.num_workers > 0, so that "
+                    "the replay buffers are not sampled on the learner thread."
+                )
+
         # RLBench doesn't like it when we import cv2 before it, so moving
         # import here.
         from robobase.video import VideoRecorder
@@ -455,20 +558,54 @@ class Workspace:
         )
 
         self._timer = utils.Timer()
+        phases = ["env_step", "add_to_replay", "update", "replay_wait"]
+        phases += ["eval", "snapshot"]
+        if self.use_rlhf:
+            phases += ["collect_feedback", "query_replay_wait", "reward_update"]
+            phases += ["feedback_replay_wait", "relabel"]
+        self._profiler = PhaseProfiler(
+            phases,
+            enabled=cfg.profile.enabled,
+            device=self.device,
+            cuda_sync=cfg.profile.cuda_sync,
+            trace_dir=self.work_dir / "torch_profiler",
+            trace_start_iteration=cfg.profile.torch_profiler.start_iteration,
+            trace_warmup=cfg.profile.torch_profiler.warmup,
+            trace_iterations=cfg.profile.torch_profiler.num_iterations,
+        )
         self._pretrain_step = 0
         self._main_loop_iterations = 0
         self._global_env_episode = 0
         self._act_dim = self.eval_env.action_space.shape[0]
         if self.train_envs:
-            self._episode_rollouts = [[] for _ in range(self.train_envs.num_envs)]
+            self._episode_rollouts = EpisodeRollouts(
+                self.train_envs.num_envs, cfg.env.episode_length // cfg.action_repeat
+            )
+            self._train_observation_keys = list(self.eval_env.observation_space.keys())
         else:
-            self._episode_rollouts = []
+            self._episode_rollouts = None
+        # Infos stored with the transitions of an episode.
+        self._rollout_info_keys = [
+            k for k in self.extra_replay_elements.keys() if k != "demo"
+        ]
+        if self.use_rlhf:
+            self._rollout_info_keys.append("task_reward")
 
         if cfg.num_eval_episodes == 0:
             # We no longer need the eval env
             self.eval_env.close()
             self.eval_env = None
 
+        # Used when stepping envs on a separate actor thread, see `_start_actor`.
+        self._actor = None
+        self._actor_agent = None
+        # Copy of the learner's weights the actor agent is synced from, see
+        # `_publish_params`.
+        self._staged_params = None
+        self._staged_params_version = 0
+        self._actor_params_version = 0
+        self._params_lock = threading.Lock()
+
         self._shutting_down = False
 
     @property
@@ -522,7 +659,7 @@ class Workspace:
                 _replay_iter = utils.merge_replay_demo_iter(
                     _replay_iter, _demo_replay_iter
                 )
-            self._replay_iter = _replay_iter
+            self._replay_iter = self._profiler.iterator(_replay_iter, "replay_wait")
         return self._replay_iter
 
     @property
@@ -536,7 +673,9 @@ class Workspace:
                 _query_replay_iter = utils.merge_replay_demo_iter(
                     _query_replay_iter, _demo_query_replay_iter
                 )
-            self._query_replay_iter = _query_replay_iter
+            self._query_replay_iter = self._profiler.iterator(
+                _query_replay_iter, "query_replay_wait"
+            )
         return self._query_replay_iter
 
     @property
@@ -544,8 +683,13 @@ class Workspace:
         if not self.use_rlhf:
             raise ValueError("reward replay is not enabled")
         if self._feedback_replay_iter is None:
-            _feedback_replay_iter = iter(self.feedback_replay_loader)
-            self._feedback_replay_iter = _feedback_replay_iter
+            if self._feedback_sampler is not None:
+                _feedback_replay_iter = iter(self._feedback_sampler)
+            else:
+                _feedback_replay_iter = iter(self.feedback_replay_loader)
+            self._feedback_replay_iter = self._profiler.iterator(
+                _feedback_replay_iter, "feedback_replay_wait"
+            )
         return self._feedback_replay_iter
 
     def train(self):
@@ -694,6 +838,8 @@ class Workspace:
         truncations,
         infos,
         next_infos,
+        agent: Method = None,
+        step: int = None,
     ):
         # TODO: In future, this func could do with a further refactor
         # TODO: Add transitions into replay buffer in sliding window fashion??
@@ -701,106 +847,107 @@ class Workspace:
         #      total reward and final obs for the full sequence, we can't perform
         #      sliding window.
 
-        # Convert observation to list of observations ordered by train_env index
-        list_of_obs_dicts = [
-            dict(zip(observations, t)) for t in zip(*observations.values())
-        ]
-        agents_reset = []
-        for i in range(self.train_envs.num_envs):
-            # Add transitions to episode rollout
-            self._episode_rollouts[i].append(
-                [
-                    actions[i],
-                    list_of_obs_dicts[i],
-                    rewards[i],
-                    terminations[i],
-                    truncations[i],
-                    {k: infos[k][i] for k in infos.keys()},
-                    {k: next_infos[k][i] for k in next_infos.keys()},
-                ]
-            )
+        if self._relabeler is not None:
+            for ep, (final_obs, task_success) in self._relabeler.collect():
+                self._add_episode_to_replay(ep, final_obs, task_success)
 
-            # If episode finishes, add to replay buffer.
-            if terminations[i] or truncations[i]:
-                agents_reset.append(i)
-                ep = self._episode_rollouts[i]
-                last_next_info = ep[-1][-1]
-                assert last_next_info["_final_observation"]
-                # `next_info` containing `final_info` is the first info of next episode
-                # we need to extract `final_info` and use it as true next_info
-                final_obs = last_next_info["final_observation"]
-                final_info = last_next_info["final_info"]
-                task_success = int(final_info.get("task_success", 0) > 0.0)
+        # Only keep the last frames regardless of frame stacks because
+        # replay buffer always store single-step transitions
+        transitions = {k: v[:, -1] for k, v in observations.items()}
+        transitions.update(
+            {
+                ACTION: actions,
+                REWARD: rewards,
+                TERMINAL: terminations,
+                TRUNCATED: truncations,
+            }
+        )
+        transitions.update({k: infos[k] for k in self._rollout_info_keys if k in infos})
+        self._episode_rollouts.add(transitions)
 
+        agents_reset = []
+        for i in np.flatnonzero(terminations | truncations):
+            # If episode finishes, add to replay buffer.
+            agents_reset.append(i)
+            ep = self._episode_rollouts.pop(i)
+            assert next_infos["_final_observation"][i]
+            # `next_info` containing `final_info` is the first info of next episode
+            # we need to extract `final_info` and use it as true next_info
+            final_obs = next_infos["final_observation"][i]
+            final_info = next_infos["final_info"][i]
+            task_success = int(final_info.get("task_success", 0) > 0.0)
+
+            if self._relabeler is not None:
+                # The episode is added to replay once it is relabelled.
+                self._relabeler.submit(ep, (final_obs, task_success))
+            else:
                 # Re-labeling demonstrations with reward model
                 if self.use_rlhf:
                     ep = self.reward_model.compute_reward(ep)
+                self._add_episode_to_replay(ep, final_obs, task_success)
 
-                # Re-labeling successful demonstrations as success, following CQN
-                relabeling_as_demo = (
-                    task_success
-                    and self.use_demo_replay
-                    and self.cfg.use_self_imitation
-                )
-                ep_index = 0
-                for act, obs, rew, term, trunc, info, next_info in ep:
-                    # Only keep the last frames regardless of frame stacks because
-                    # replay buffer always store single-step transitions
-                    obs = {k: v[-1] for k, v in obs.items()}
+            self._global_env_episode += 1
 
-                    # Strip out temporal dimension as action_sequence = 1
-                    act = act[0]
+        agent = self.agent if agent is None else agent
+        step = self.main_loop_iterations if step is None else step
+        agent.reset(step, agents_reset)  # clear hidden dim
 
-                    if relabeling_as_demo:
-                        info["demo"] = 1
-                    else:
-                        info["demo"] = 0
-
-                    # Filter out unwanted keys in info
-                    extra_replay_elements = {
-                        k: v
-                        for k, v in info.items()
-                        if k in list(self.extra_replay_elements.keys())
-                    }
-
-                    self.replay_buffer.add(
-                        obs, act, rew, term, trunc, **extra_replay_elements
-                    )
-                    if relabeling_as_demo:
-                        self.demo_replay_buffer.add(
-                            obs, act, rew, term, trunc, **extra_replay_elements
-                        )
-                    if (
-                        self.use_rlhf
-                        and self.total_feedback < self.cfg.rlhf.max_feedback
-                    ):
-                        task_rew = info["task_reward"]
-                        self.query_replay_buffer.add(
-                            obs,
-                            act,
-                            task_rew,
-                            term,
-                            trunc,
-                            ep_index,
-                            **extra_replay_elements,
-                        )
-                    ep_index += 1
-
-                # Add final obs
-                # Only keep the last frames regardless of frame stacks because
-                # replay buffer always store single-step transitions
-                final_obs = {k: v[-1] for k, v in final_obs.items()}
-                self.replay_buffer.add_final(final_obs)
-                if relabeling_as_demo:
-                    self.demo_replay_buffer.add_final(final_obs)
-                if self.use_rlhf and self.total_feedback < self.cfg.rlhf.max_feedback:
-                    self.query_replay_buffer.add_final(final_obs)
-
-                # clean up
-                self._global_env_episode += 1
-                self._episode_rollouts[i].clear()
+    def _add_episode_to_replay(self, ep: dict, final_obs: dict, task_success: int):
+        # Re-labeling successful demonstrations as success, following CQN
+        relabeling_as_demo = (
+            task_success and self.use_demo_replay and self.cfg.use_self_imitation
+        )
+        episode_length = len(ep[ACTION])
+        observations = {k: ep[k] for k in self._train_observation_keys}
+        # Strip out temporal dimension as action_sequence = 1
+        actions = ep[ACTION][:, 0]
+        # Filter out unwanted keys in info
+        extra_replay_elements = {
+            k: v for k, v in ep.items() if k in self.extra_replay_elements.keys()
+        }
+        if "demo" in self.extra_replay_elements.keys():
+            extra_replay_elements["demo"] = np.full(
+                episode_length, int(relabeling_as_demo)
+            )
+        # Only keep the last frames regardless of frame stacks because
+        # replay buffer always store single-step transitions
+        final_obs = {k: v[-1] for k, v in final_obs.items()}
+
+        self.replay_buffer.add_episode(
+            observations,
+            actions,
+            ep[REWARD],
+            ep[TERMINAL],
+            ep[TRUNCATED],
+            final_obs,
+            **extra_replay_elements,
+        )
+        if relabeling_as_demo:
+            self.demo_replay_buffer.add_episode(
+                observations,
+                actions,
+                ep[REWARD],
+                ep[TERMINAL],
+                ep[TRUNCATED],
+                final_obs,
+                **extra_replay_elements,
+            )
+        if self.use_rlhf and self.total_feedback < self.cfg.rlhf.max_feedback:
+            self.query_replay_buffer.add_episode(
+                observations,
+                actions,
+                ep["task_reward"],
+                ep[TERMINAL],
+                ep[TRUNCATED],
+                final_obs,
+                **extra_replay_elements,
+            )
 
-        self.agent.reset(self.main_loop_iterations, agents_reset)  # clear hidden dim
+    def _flush_relabeler(self):
+        """Waits for all submitted episodes to be relabelled and adds them to replay."""
+        if self._relabeler is not None:
+            for ep, (final_obs, task_success) in self._relabeler.collect(block=True):
+                self._add_episode_to_replay(ep, final_obs, task_success)
 
     def _signal_handler(self, sig, frame):
         print("\nCtrl+C detected. Preparing to shutdown...")
@@ -848,6 +995,8 @@ class Workspace:
                 # Skip update
                 continue
             for _ in range(self.cfg.num_update_steps):
+                if self._actor is not None:
+                    self._actor.await_update()
                 metrics.update(
                     self.agent.update(
                         self.replay_iter,
@@ -855,6 +1004,8 @@ class Workspace:
                         self.replay_buffer,
                     )
                 )
+                if self._actor is not None:
+                    self._actor.updated()
         self.agent.train(False)
         if self.agent.logging:
             execution_time_for_update = time.time() - start_time
@@ -867,6 +1018,8 @@ class Workspace:
         return metrics
 
     def collect_feedback(self):
+        # Queries are sampled from, and relabelling rewrites, the episodes in replay.
+        self._flush_relabeler()
         query_batch = self._query_fn(next(self.query_replay_iter))
         if self.cfg.rlhf.feedback_type == "gemini":
             if not hasattr(self, "_loop"):
@@ -888,6 +1041,7 @@ class Workspace:
                     feedback["segment_1"],
                     feedback["label"],
                     metadatum,
+                    feedback_round=self.feedback_iter,
                 )
         else:
             for feedback in feedbacks:
@@ -895,6 +1049,7 @@ class Workspace:
                     feedback["segment_0"],
                     feedback["segment_1"],
                     feedback["label"],
+                    feedback_round=self.feedback_iter,
                 )
         self._total_feedback += len(feedbacks)
         self._feedback_iter += 1
@@ -904,9 +1059,18 @@ class Workspace:
             start_time = time.time()
         metrics = {}
         self.reward_model.train(True)
-        feedback_one_epoch = utils.Until(
-            max(self.total_feedback / self.cfg.rlhf_replay.feedback_batch_size, 1)
-        )
+        if self._feedback_sampler is not None:
+            # Runs until every stream of the sampler has completed one more epoch.
+            self._feedback_sampler.refresh(self.feedback_replay_buffer)
+            epochs = self._feedback_sampler.epochs_completed + 1
+
+            def feedback_one_epoch(_):
+                return self._feedback_sampler.epochs_completed < epochs
+
+        else:
+            feedback_one_epoch = utils.Until(
+                max(self.total_feedback / self.cfg.rlhf_replay.feedback_batch_size, 1)
+            )
         it = 0
         while feedback_one_epoch(it):
             metrics.update(
@@ -930,11 +1094,18 @@ class Workspace:
         return metrics
 
     def _perform_env_steps(
-        self, observations: dict[str, np.ndarray], env: gym.Env, eval_mode: bool
+        self,
+        observations: dict[str, np.ndarray],
+        env: gym.Env,
+        eval_mode: bool,
+        agent: Method = None,
+        step: int = None,
     ) -> tuple[np.ndarray, tuple, dict[str, Any]]:
-        if self.agent.logging:
+        agent = self.agent if agent is None else agent
+        step = self.main_loop_iterations if step is None else step
+        if agent.logging:
             start_time = time.time()
-        with torch.no_grad(), utils.eval_mode(self.agent):
+        with torch.no_grad(), utils.eval_mode(agent):
             torch_observations = {
                 k: torch.from_numpy(v).to(self.device) for k, v in observations.items()
             }
@@ -942,9 +1113,7 @@ class Workspace:
                 torch_observations = {
                     k: v.unsqueeze(0) for k, v in torch_observations.items()
                 }
-            action = self.agent.act(
-                torch_observations, self.main_loop_iterations, eval_mode=eval_mode
-            )
+            action = agent.act(torch_observations, step, eval_mode=eval_mode)
             metrics = {}
             # Below is testing a feature which can be enforced in v6.
             # The ability will allow agent info to be passed to environments.
@@ -961,7 +1130,7 @@ class Workspace:
             if eval_mode:
                 action = action[0]  # we expect batch of 1 for eval
 
-        if self.agent.logging:
+        if agent.logging:
             execution_time_for_act = time.time() - start_time
             metrics["agent_act_steps_per_second"] = (
                 self.train_envs.num_envs / execution_time_for_act
@@ -970,7 +1139,7 @@ class Workspace:
 
         *env_step_tuple, next_info = env.step(action)
 
-        if self.agent.logging:
+        if agent.logging:
             execution_time_for_env_step = time.time() - start_time
             metrics["env_steps_per_second"] = (
                 self.train_envs.num_envs / execution_time_for_env_step
@@ -1053,6 +1222,103 @@ class Workspace:
             if self.use_demo_replay:
                 relabel_with_predictor(self.reward_model, self.demo_replay_buffer)
 
+    def _env_step(self, step: int, agent: Method = None) -> tuple:
+        """Steps the train envs and adds finished episodes to replay.
+
+        Args:
+            step: Index of the main loop iteration the env step belongs to.
+            agent: Agent acting in the envs. Defaults to `self.agent`.
+
+        Returns:
+            The rewards, terminations, truncations and next infos of the envs,
+            followed by the env step metrics.
+        """
+        with self._profiler.phase("env_step"):
+            (
+                action,
+                (next_observations, rewards, terminations, truncations, next_info),
+                env_metrics,
+            ) = self._perform_env_steps(
+                self._train_observations,
+                self.train_envs,
+                False,
+                agent=agent,
+                step=step,
+            )
+        with self._profiler.phase("add_to_replay"):
+            self._add_to_replay(
+                action,
+                self._train_observations,
+                rewards,
+                terminations,
+                truncations,
+                self._train_info,
+                next_info,
+                agent=agent,
+                step=step,
+            )
+        self._train_observations = next_observations
+        self._train_info = next_info
+        return rewards, terminations, truncations, next_info, env_metrics
+
+    def _start_actor(self):
+        """Start stepping the train envs on an actor thread.
+
+        The actor acts with a copy of the agent, synced with the weights the learner
+        publishes every `actor_learner.sync_every` iterations. The actor and learner
+        keep to the ratio of updates to env steps of stepping and updating
+        alternately, within `actor_learner.ratio_tolerance` env steps.
+        """
+        self._actor_agent = copy.deepcopy(self.agent)
+        self._actor_agent.train(False)
+        self._staged_params = {
+            k: v.detach().clone() for k, v in self.agent.state_dict().items()
+        }
+        self._staged_params_version = self._actor_params_version = 0
+        updates_per_step = (
+            self.train_envs.num_envs
+            * self.cfg.num_update_steps
+            / self.cfg.update_every_steps
+        )
+        self._actor = Actor(
+            self._actor_step,
+            start_step=self.main_loop_iterations,
+            updates_per_step=updates_per_step,
+            tolerance=self.cfg.actor_learner.ratio_tolerance,
+        )
+        self._actor.start()
+
+    def _publish_params(self):
+        """Copy the learner's weights into the staging copy the actor syncs from.
+
+        The lock is only held for the copy, so neither the learner's updates nor the
+        actor's env steps wait for each other.
+        """
+        with self._params_lock:
+            for k, v in self.agent.state_dict().items():
+                self._staged_params[k].copy_(v)
+            self._staged_params_version += 1
+
+    def _actor_step(self, step: int) -> tuple:
+        if self._actor_params_version != self._staged_params_version:
+            with self._params_lock:
+                self._actor_agent.load_state_dict(self._staged_params)
+                self._actor_params_version = self._staged_params_version
+        self._actor_agent.logging = self.agent.logging
+        return self._env_step(step, agent=self._actor_agent)
+
+    def _pause_actor(self):
+        if self._actor is None:
+            return contextlib.nullcontext()
+        return self._actor.paused()
+
+    def _stop_actor(self):
+        if self._actor is not None:
+            self._actor.close()
+            self._actor = None
+            self._actor_agent = None
+            self._staged_params = None
+
     def _online_rl(self):
         train_until_frame = utils.Until(self.cfg.num_train_frames)
         seed_until_size = utils.Until(self.cfg.replay_size_before_train)
@@ -1072,25 +1338,48 @@ class Workspace:
                 snapshot_reward_model_every_n
             )
 
-        observations, info = self.train_envs.reset()
+        self._train_observations, self._train_info = self.train_envs.reset()
+        if self.cfg.actor_learner.enabled:
+            self._start_actor()
         #  We use agent 0 to accumulate stats about how the training agents are doing
         agent_0_ep_len = agent_0_reward = 0
         agent_0_prev_ep_len = agent_0_prev_reward = None
+        # Phases timed before the loop, e.g. in pretraining, are not reported.
+        self._profiler.report()
         while train_until_frame(self.global_env_steps):
             metrics = {}
+            self._profiler.step(self.main_loop_iterations)
 
             self.agent.logging = False
             if should_log(self.main_loop_iterations):
                 self.agent.logging = True
             if not seed_until_size(len(self.replay_buffer)):
-                update_metrics = self._perform_updates()
+                with self._profiler.phase("update"):
+                    update_metrics = self._perform_updates()
                 metrics.update(update_metrics)
+                if self._actor is not None and (
+                    self.main_loop_iterations % self.cfg.actor_learner.sync_every == 0
+                ):
+                    self._publish_params()
 
-            (
-                action,
-                (next_observations, rewards, terminations, truncations, next_info),
-                env_metrics,
-            ) = self._perform_env_steps(observations, self.train_envs, False)
+            if self._actor is not None:
+                # The env step has been taken on the actor thread, concurrently with
+                # the updates above.
+                (
+                    rewards,
+                    terminations,
+                    truncations,
+                    next_info,
+                    env_metrics,
+                ) = self._actor.next()
+            else:
+                (
+                    rewards,
+                    terminations,
+                    truncations,
+                    next_info,
+                    env_metrics,
+                ) = self._env_step(self.main_loop_iterations)
 
             agent_0_reward += next_info.get("task_reward", rewards)[0]
             agent_0_ep_len += 1
@@ -1100,19 +1389,10 @@ class Workspace:
                 agent_0_ep_len = agent_0_reward = 0
 
             metrics.update(env_metrics)
-            self._add_to_replay(
-                action,
-                observations,
-                rewards,
-                terminations,
-                truncations,
-                info,
-                next_info,
-            )
-            observations = next_observations
-            info = next_info
             if should_log(self.main_loop_iterations):
                 metrics.update(self._get_common_metrics())
+                if self.cfg.compile.enabled:
+                    metrics.update(self._compiler.metrics())
                 if agent_0_prev_reward is not None and agent_0_prev_ep_len is not None:
                     metrics.update(
                         {
@@ -1122,16 +1402,20 @@ class Workspace:
                         }
                     )
                 self.logger.log_metrics(metrics, self.global_env_steps, prefix="train")
+                if self._profiler.enabled:
+                    self._log_profile()
 
             if should_eval(self.main_loop_iterations):
-                eval_metrics = self._eval(eval_record_all_episode=True)
+                with self._profiler.phase("eval"):
+                    eval_metrics = self._eval(eval_record_all_episode=True)
                 eval_metrics.update(self._get_common_metrics())
                 self.logger.log_metrics(
                     eval_metrics, self.global_env_steps, prefix="eval"
                 )
 
             if should_save_snapshot(self.main_loop_iterations):
-                self.save_snapshot()
+                with self._pause_actor(), self._profiler.phase("snapshot"):
+                    self.save_snapshot()
 
             if self.use_rlhf:
                 if (
@@ -1142,70 +1426,96 @@ class Workspace:
                     and not reward_until_frame(self.global_env_steps)
                     and not seed_until_size(len(self.query_replay_buffer))
                 ):
-                    self.reward_model.logging = True
-                    logging.info(
-                        f"[Feedback {self.total_feedback} / {self.cfg.rlhf.max_feedback}] Collecting feedback for {self.cfg.rlhf_replay.num_queries} queries"  # noqa
-                    )
-                    self.collect_feedback()
-
-                    # reward model reset must be after feedback collection,
-                    # as reward model is used for disagreement-based query selection
-                    if self.cfg.rlhf.initialize_reward_model_per_session:
-                        self.reward_model.build_reward_model()
-
-                    for it in range(self.cfg.rlhf.num_train_frames):
-                        reward_update_metrics = self._perform_reward_model_updates()
-                        reward_update_metrics.update(
-                            {
-                                "iteration": self.global_env_steps + it,
-                            }
-                        )
-                        _, total_time = self._timer.reset()
-                        reward_update_metrics.update(
-                            {
-                                "total_time": total_time,
-                                "iteration": self.main_loop_iterations + it,
-                                "buffer_size": len(self.feedback_replay_buffer),
-                            }
+                    # Collecting feedback and relabelling read and rewrite the
+                    # replay buffers, so the actor must not add episodes meanwhile.
+                    with self._pause_actor():
+                        self.reward_model.logging = True
+                        logging.info(
+                            f"[Feedback {self.total_feedback} / {self.cfg.rlhf.max_feedback}] Collecting feedback for {self.cfg.rlhf_replay.num_queries} queries"  # noqa
                         )
-                        if should_reward_log(it):
-                            self.logger.log_metrics(
-                                reward_update_metrics,
-                                self.global_env_steps,
-                                prefix="train_reward",
+                        with self._profiler.phase("collect_feedback"):
+                            self.collect_feedback()
+
+                        # reward model reset must be after feedback collection,
+                        # as reward model is used for disagreement-based query selection
+                        if self.cfg.rlhf.initialize_reward_model_per_session:
+                            self.reward_model.build_reward_model()
+                            if self.cfg.compile.enabled:
+                                self.reward_model.compile_modules(self._compiler)
+
+                        for it in range(self.cfg.rlhf.num_train_frames):
+                            with self._profiler.phase("reward_update"):
+                                reward_update_metrics = (
+                                    self._perform_reward_model_updates()
+                                )
+                            reward_update_metrics.update(
+                                {
+                                    "iteration": self.global_env_steps + it,
+                                }
                             )
-                        if reward_update_metrics["pref_acc_label_0"] > 0.97:
-                            break
-
-                    if not self.reward_model.activated:
-                        self.reward_model.set_activated(True)
-
-                    relabel_with_predictor(self.reward_model, self.replay_buffer)
-                    if self.use_demo_replay:
-                        relabel_with_predictor(
-                            self.reward_model, self.demo_replay_buffer
-                        )
-                    metrics = {}
-
-                    if self.cfg.rlhf.initialize_agent_per_session:
-                        if hasattr(self.agent, "reset_critic"):
-                            self.agent.reset_critic()
-                        if hasattr(self.agent, "reset_actor"):
-                            self.agent.reset_actor()
-                        if hasattr(self.agent, "reset_temperature"):
-                            self.agent.reset_temperature()
+                            _, total_time = self._timer.reset()
+                            reward_update_metrics.update(
+                                {
+                                    "total_time": total_time,
+                                    "iteration": self.main_loop_iterations + it,
+                                    "buffer_size": len(self.feedback_replay_buffer),
+                                }
+                            )
+                            if should_reward_log(it):
+                                self.logger.log_metrics(
+                                    reward_update_metrics,
+                                    self.global_env_steps,
+                                    prefix="train_reward",
+                                )
+                            if reward_update_metrics["pref_acc_label_0"] > 0.97:
+                                break
+
+                        if not self.reward_model.activated:
+                            self.reward_model.set_activated(True)
+
+                        with self._profiler.phase("relabel"):
+                            relabel_with_predictor(
+                                self.reward_model, self.replay_buffer
+                            )
+                            if self.use_demo_replay:
+                                relabel_with_predictor(
+                                    self.reward_model, self.demo_replay_buffer
+                                )
+                        metrics = {}
+
+                        if self.cfg.rlhf.initialize_agent_per_session:
+                            if hasattr(self.agent, "reset_critic"):
+                                self.agent.reset_critic()
+                            if hasattr(self.agent, "reset_actor"):
+                                self.agent.reset_actor()
+                            if hasattr(self.agent, "reset_temperature"):
+                                self.agent.reset_temperature()
+                            if self.cfg.compile.enabled:
+                                # Compile the rebuilt networks.
+                                self.agent.compile_modules(self._compiler)
 
                 if (
                     self.total_feedback <= self.cfg.rlhf.max_feedback
                     and should_save_reward_model_snapshot(self.main_loop_iterations)
                 ):
-                    self.save_reward_model_snapshot()
+                    with self._pause_actor():
+                        self.save_reward_model_snapshot()
 
             if self._shutting_down:
                 break
 
             self._main_loop_iterations += 1
 
+        self._stop_actor()
+        self._profiler.close()
+
+    def _log_profile(self):
+        """Logs the time spent in each phase of the main loop since the last log."""
+        metrics, histograms = self._profiler.report()
+        metrics["iteration"] = self.main_loop_iterations
+        self.logger.log_histograms(histograms, self.global_env_steps, prefix="profile")
+        self.logger.log_metrics(metrics, self.global_env_steps, prefix="profile")
+
     def _get_common_metrics(self) -> dict[str, Any]:
         _, total_time = self._timer.reset()
         metrics = {
@@ -1225,6 +1535,16 @@ class Workspace:
         if hasattr(self, "_loop"):
             self._loop.close()
 
+        self._stop_actor()
+        self._profiler.close()
+
+        if self._relabeler is not None:
+            self._flush_relabeler()
+            self._relabeler.close()
+
+        if self._query_renderer is not None:
+            self._query_renderer.close()
+
         if self.eval_env:
             self.eval_env.close()
 
@@ -1232,10 +1552,12 @@ class Workspace:
         self.replay_buffer.shutdown()
         if self.use_demo_replay:
             self.demo_replay_buffer.shutdown()
+        self.logger.close()
+        self._checkpointer.close()
 
     def save_snapshot(self):
+        self._flush_relabeler()
         snapshot = self.work_dir / "snapshots" / f"{self.global_env_steps}_snapshot.pt"
-        snapshot.parent.mkdir(parents=True, exist_ok=True)
         keys_to_save = [
             "_pretrain_step",
             "_main_loop_iterations",
@@ -1244,10 +1566,12 @@ class Workspace:
         ]
         payload = {k: self.__dict__[k] for k in keys_to_save}
         payload["agent"] = self.agent.state_dict()
-        with snapshot.open("wb") as f:
-            torch.save(payload, f)
+        payload["agent_optimizers"] = optimizer_state_dicts(self.agent)
+        payload["replay_buffers"] = self._replay_buffer_state_dicts(
+            ["replay_buffer", "demo_replay_buffer"]
+        )
         latest_snapshot = self.work_dir / "snapshots" / "latest_snapshot.pt"
-        shutil.copy(snapshot, latest_snapshot)
+        self._checkpointer.save(payload, snapshot, latest_snapshot)
 
     def load_snapshot(self, path_to_snapshot_to_load=None):
         if path_to_snapshot_to_load is None:
@@ -1263,6 +1587,8 @@ class Workspace:
         with path_to_snapshot_to_load.open("rb") as f:
             payload = torch.load(f, map_location="cpu")
         self.agent.load_state_dict(payload.pop("agent"))
+        load_optimizer_state_dicts(self.agent, payload.pop("agent_optimizers", {}))
+        self._load_replay_buffer_state_dicts(payload.pop("replay_buffers", {}))
         for k, v in payload.items():
             self.__dict__[k] = v
 
@@ -1272,22 +1598,29 @@ class Workspace:
             / "reward_model_snapshots"
             / f"{self.global_env_steps}_snapshot.pt"
         )
-        snapshot.parent.mkdir(parents=True, exist_ok=True)
         keys_to_save = [
             "_pretrain_step",
             "_main_loop_iterations",
             "_global_env_episode",
             "_total_feedback",
+            "_feedback_iter",
+            "_reward_pretrain_step",
             "cfg",
         ]
         payload = {k: self.__dict__[k] for k in keys_to_save}
         payload["reward_model"] = self.reward_model.state_dict()
-        with snapshot.open("wb") as f:
-            torch.save(payload, f)
+        payload["reward_model_optimizers"] = optimizer_state_dicts(self.reward_model)
+        payload["replay_buffers"] = self._replay_buffer_state_dicts(
+            [
+                "query_replay_buffer",
+                "demo_query_replay_buffer",
+                "feedback_replay_buffer",
+            ]
+        )
         latest_snapshot = (
             self.work_dir / "reward_model_snapshots" / "latest_snapshot.pt"
         )
-        shutil.copy(snapshot, latest_snapshot)
+        self._checkpointer.save(payload, snapshot, latest_snapshot)
 
     def load_reward_model_snapshot(self, path_to_snapshot_to_load=None):
         if path_to_snapshot_to_load is None:
@@ -1303,5 +1636,29 @@ class Workspace:
         with path_to_snapshot_to_load.open("rb") as f:
             payload = torch.load(f, map_location="cpu")
         self.reward_model.load_state_dict(payload.pop("reward_model"))
+        load_optimizer_state_dicts(
+            self.reward_model, payload.pop("reward_model_optimizers", {})
+        )
+        self._load_replay_buffer_state_dicts(payload.pop("replay_buffers", {}))
         for k, v in payload.items():
             self.__dict__[k] = v
+
+    def _replay_buffer_state_dicts(self, names: list[str]) -> dict[str, dict]:
+        """Manifests of the episodes stored by the given replay buffers.
+
+        Episodes are already on disk, so only the file names and counters are
+        stored in the snapshot. This lets a resumed run start with warm buffers.
+        """
+        return {
+            name: getattr(self, name).state_dict()
+            for name in names
+            if getattr(self, name, None) is not None
+        }
+
+    def _load_replay_buffer_state_dicts(self, state_dicts: dict[str, dict]):
+        for name, state_dict in state_dicts.items():
+            replay_buffer = getattr(self, name, None)
+            if replay_buffer is None:
+                logging.warning(f"Snapshot has state for unknown buffer '{name}'.")
+                continue
+            replay_buffer.load_state_dict(state_dict)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from robobase.envs.env import make_vector_env
+from robobase.envs.wrappers import FrameStack, RescaleFromTanh
+from tests.unit.wrappers.utils import DummyEnv, OBS_NAME_FLAT1, OBS_NAME_IMG1
+
+NUM_ENVS = 3
+NUM_STACK = 2
+EPISODE_LEN = 4
+
+
+def _make_env():
+    return FrameStack(DummyEnv(episode_len=EPISODE_LEN), NUM_STACK)
+
+
+def _rollout(env, num_steps):
+    obs, _ = env.reset(seed=0)
+    trajectory = [obs]
+    final_observations = []
+    for _ in range(num_steps):
+        actions = np.zeros(env.action_space.shape, dtype=env.action_space.dtype)
+        obs, _, terminations, truncations, info = env.step(actions)
+        trajectory.append(obs)
+        if np.any(terminations | truncations):
+            final_observations.append(info["final_observation"])
+    env.close()
+    return trajectory, final_observations
+
+
+@pytest.mark.parametrize("context", [None, "spawn"])
+def test_async_matches_sync(context):
+    sync_traj, sync_final = _rollout(
+        make_vector_env([_make_env] * NUM_ENVS, backend="sync"), 2 * EPISODE_LEN
+    )
+    async_traj, async_final = _rollout(
+        make_vector_env([_make_env] * NUM_ENVS, backend="async", context=context),
+        2 * EPISODE_LEN,
+    )
+    for sync_obs, async_obs in zip(sync_traj, async_traj):
+        for k in sync_obs.keys():
+            assert async_obs[k].shape[0] == NUM_ENVS
+            np.testing.assert_array_equal(sync_obs[k], async_obs[k])
+    # Autoreset returns the last observation of each episode in the info.
+    assert len(sync_final) == len(async_final) == 2
+    for sync_obs, async_obs in zip(sync_final, async_final):
+        for i in range(NUM_ENVS):
+            for k in [OBS_NAME_FLAT1, OBS_NAME_IMG1]:
+                np.testing.assert_array_equal(sync_obs[i][k], async_obs[i][k])
+
+
+def test_async_returns_copies():
+    env = make_vector_env([_make_env] * NUM_ENVS, backend="async")
+    obs, _ = env.reset(seed=0)
+    actions = np.zeros(env.action_space.shape, dtype=env.action_space.dtype)
+    next_obs, *_ = env.step(actions)
+    # Observations read from shared memory must not be overwritten by later steps.
+    assert not np.array_equal(obs[OBS_NAME_FLAT1], next_obs[OBS_NAME_FLAT1])
+    env.close()
+
+
+def test_vector_wrappers_match_per_env_wrappers():
+    per_env = make_vector_env(
+        [lambda: FrameStack(RescaleFromTanh(DummyEnv(EPISODE_LEN)), NUM_STACK)]
+        * NUM_ENVS,
+        backend="sync",
+    )
+    vectorized = FrameStack(
+        RescaleFromTanh(
+            make_vector_env([lambda: DummyEnv(EPISODE_LEN)] * NUM_ENVS, backend="sync")
+        ),
+        NUM_STACK,
+    )
+    assert vectorized.action_space == per_env.action_space
+    for k, space in per_env.observation_space.items():
+        assert vectorized.observation_space[k].shape == space.shape
+    # Tanh actions are rescaled on the stacked (num_envs, ...) array.
+    np.testing.assert_allclose(
+        vectorized.env.action(np.ones(vectorized.action_space.shape, np.float32)),
+        vectorized.unwrapped.action_space.high,
+    )
+    per_env_traj, per_env_final = _rollout(per_env, 2 * EPISODE_LEN)
+    vectorized_traj, vectorized_final = _rollout(vectorized, 2 * EPISODE_LEN)
+    for per_env_obs, vectorized_obs in zip(per_env_traj, vectorized_traj):
+        for k in per_env_obs.keys():
+            np.testing.assert_array_equal(per_env_obs[k], vectorized_obs[k])
+    assert len(per_env_final) == len(vectorized_final) == 2
+    for per_env_obs, vectorized_obs in zip(per_env_final, vectorized_final):
+        for i in range(NUM_ENVS):
+            for k in [OBS_NAME_FLAT1, OBS_NAME_IMG1]:
+                np.testing.assert_array_equal(per_env_obs[i][k], vectorized_obs[i][k])
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_vector_env([_make_env], backend="threads")
@@ -17,7 +17,7 @@ TIME_SIZE = 2
 
 
 @pytest.mark.parametrize(
-    "intrinsic_module_cls,",
+    "intrinsic_module_cls",
     [RND, ICM],
 )
 class TestIntrinsicRewards:
@@ -91,3 +91,46 @@ class TestIntrinsicRewards:
         rew.update(batch)
         assert rewards.shape == (BATCH_SIZE, 1)
         assert rewards.dtype == torch.float32
+
+    @pytest.mark.parametrize("low_dim", [True, False])
+    def test_compute_irs_and_update(
+        self, intrinsic_module_cls: type[IntrinsicRewardModule], low_dim: bool
+    ):
+        if low_dim:
+            shapes = {OBS_LOW_DIM: (TIME_SIZE, OBS_LOW_DIM_SIZE)}
+        else:
+            shapes = {k: (TIME_SIZE, *IMG_SHAPE) for k in [OBS_PIXELS_1, OBS_PIXELS_2]}
+        observation_space = spaces.Dict(
+            {k: spaces.Box(-1, 1, shape) for k, shape in shapes.items()}
+        )
+        rew = intrinsic_module_cls(
+            observation_space=observation_space,
+            action_space=spaces.Box(-2, 2, ACTION_SHAPE),
+            device=torch.device("cpu"),
+        )
+        batch = self._sample_fake_batch(low_dim=low_dim, pixels=not low_dim)
+        expected = rew.compute_irs(batch, step=10)
+        rewards = rew.compute_irs_and_update(batch, step=10)
+        # Rewards are computed before the update.
+        torch.testing.assert_close(rewards, expected)
+        assert not torch.equal(rew.compute_irs(batch, step=10), expected)
+
+    def test_agent_features(self, intrinsic_module_cls: type[IntrinsicRewardModule]):
+        observation_space = spaces.Dict(
+            {OBS_PIXELS_1: spaces.Box(-1, 1, (TIME_SIZE, *IMG_SHAPE))}
+        )
+        rew = intrinsic_module_cls(
+            observation_space=observation_space,
+            action_space=spaces.Box(-2, 2, ACTION_SHAPE),
+            device=torch.device("cpu"),
+            use_agent_features=True,
+        )
+        batch = self._sample_fake_batch(pixels=True)
+        feats = torch.rand(BATCH_SIZE, TIME_SIZE, 16, requires_grad=True)
+        next_feats = torch.rand(BATCH_SIZE, TIME_SIZE, 16, requires_grad=True)
+        rewards = rew.compute_irs_and_update(batch, 0, feats, next_feats)
+        assert rewards.shape == (BATCH_SIZE, 1)
+        # Gradients do not flow back into the agent's encoder.
+        assert feats.grad is None and next_feats.grad is None
+        with pytest.raises(ValueError):
+            rew.compute_irs_and_update(batch)
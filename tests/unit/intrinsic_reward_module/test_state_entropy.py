@@ -0,0 +1,62 @@
+import pytest
+import torch
+
+from robobase.intrinsic_reward_module.state_entropy import StateEntropy, knn_distances
+
+
+FEATURE_DIM = 16
+BATCH_SIZE = 32
+
+
+@pytest.mark.parametrize("tile_size", [1, 7, 4096])
+def test_knn_distances_matches_full_matrix(tile_size: int):
+    queries = torch.rand(BATCH_SIZE, FEATURE_DIM)
+    keys = torch.rand(100, FEATURE_DIM)
+    expected = torch.kthvalue(torch.cdist(queries, keys), k=3, dim=1).values
+    dists = knn_distances(queries, keys, k=3, tile_size=tile_size)
+    assert torch.allclose(dists, expected)
+
+
+def test_bank_wraps_around():
+    ent = StateEntropy(FEATURE_DIM, torch.device("cpu"), capacity=50)
+    for _ in range(3):
+        ent.add(torch.rand(BATCH_SIZE, FEATURE_DIM))
+    assert len(ent) == 50
+    assert ent._index == (3 * BATCH_SIZE) % 50
+
+
+def test_compute_matches_brute_force():
+    ent = StateEntropy(FEATURE_DIM, torch.device("cpu"), capacity=1000, k=5)
+    history = torch.rand(200, FEATURE_DIM)
+    ent.add(history)
+    states = torch.rand(BATCH_SIZE, FEATURE_DIM)
+    rewards = ent.compute(states)
+    expected = torch.kthvalue(
+        torch.cdist(states, torch.cat([history, states])), k=6, dim=1
+    ).values
+    assert rewards.shape == (BATCH_SIZE, 1)
+    assert torch.allclose(rewards[:, 0], expected)
+
+
+def test_compute_with_projection():
+    ent = StateEntropy(FEATURE_DIM, torch.device("cpu"), projection_dim=4)
+    assert ent.bank.shape[1] == 4
+    rewards = ent.compute(torch.rand(BATCH_SIZE, 2, FEATURE_DIM // 2))
+    assert rewards.shape == (BATCH_SIZE, 1)
+    assert torch.all(rewards >= 0)
+
+
+def test_rewards_of_resampled_states_do_not_collapse():
+    # States are added once when collected, and queried from batches sampled with
+    # replacement, as from a replay buffer.
+    ent = StateEntropy(FEATURE_DIM, torch.device("cpu"), capacity=100000, k=5)
+    replay = torch.rand(2000, FEATURE_DIM)
+    for states in replay.split(BATCH_SIZE):
+        ent.add(states)
+    for _ in range(10):
+        states = replay[torch.randint(len(replay), (256,))]
+        rewards = ent.compute(states, update=False)
+        expected = torch.kthvalue(torch.cdist(states, replay), k=6, dim=1).values
+        assert torch.allclose(rewards[:, 0], expected)
+        assert torch.all(rewards > 0)
+    assert len(ent) == len(replay)
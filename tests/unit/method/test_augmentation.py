@@ -0,0 +1,33 @@
+import pytest
+import torch
+
+from robobase.method.utils import RandomShiftsAug, TimeConsistentRandomShiftsAug
+
+
+@pytest.mark.parametrize(
+    "aug_cls,input_shape",
+    [
+        (RandomShiftsAug, (8, 3, 16, 16)),
+        (TimeConsistentRandomShiftsAug, (4, 3, 3, 16, 16)),
+    ],
+)
+def test_crop_matches_grid_sample(aug_cls, input_shape):
+    x = torch.rand(*input_shape)
+    torch.manual_seed(0)
+    expected = aug_cls(pad=4, mode="grid_sample")(x)
+    torch.manual_seed(0)
+    out = aug_cls(pad=4, mode="crop")(x)
+    assert out.shape == x.shape
+    assert out.is_contiguous()
+    assert torch.allclose(out, expected, atol=1e-4)
+
+
+def test_time_consistent_crop_shares_shift_across_frames():
+    frame = torch.rand(2, 1, 3, 16, 16)
+    out = TimeConsistentRandomShiftsAug(pad=4, mode="crop")(frame.repeat(1, 5, 1, 1, 1))
+    assert torch.equal(out, out[:, :1].expand_as(out))
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        RandomShiftsAug(pad=4, mode="bilinear")
@@ -257,6 +257,26 @@ class TestRLMethods(Base):
             p.join()
             assert not p.exitcode
 
+    def test_dmc_with_pixels_amp(self, method, cfg_params):
+        GlobalHydra.instance().clear()
+        initialize(config_path="../../../robobase/cfgs")
+        method = ["method=" + method]
+        cfg = compose(
+            config_name="robobase_config",
+            overrides=method
+            + cfg_params
+            + [
+                "pixels=true",
+                "env=dmc/acrobot_swingup",
+                "amp_dtype=bfloat16",
+            ],
+        )
+        with tempfile.TemporaryDirectory() as tempdir:
+            p = multiprocessing.Process(target=train_and_shutdown, args=(cfg, tempdir))
+            p.start()
+            p.join()
+            assert not p.exitcode
+
     def test_dmc_with_pixels_stack_frames_rnn(self, method, cfg_params):
         GlobalHydra.instance().clear()
         initialize(config_path="../../../robobase/cfgs")
@@ -0,0 +1,66 @@
+import pytest
+import torch
+
+from robobase.models.model_based.utils import lambda_return, static_scan
+
+T, B = 15, 4
+
+
+def _sequential_lambda_return(reward, value, pcont, bootstrap, lambda_):
+    next_values = torch.cat([value[1:], bootstrap[None]], 0)
+    inputs = reward + pcont * next_values * (1 - lambda_)
+    returns, last = [], bootstrap
+    for t in reversed(range(len(reward))):
+        last = inputs[t] + pcont[t] * lambda_ * last
+        returns.append(last)
+    return torch.stack(returns[::-1], 0)
+
+
+@pytest.mark.parametrize("length", [1, 2, T])
+def test_lambda_return_matches_sequential_recurrence(length):
+    reward = torch.randn(length, B, requires_grad=True)
+    value = torch.randn(length, B)
+    pcont = 0.99 * torch.ones(length, B)
+    pcont[length // 2, 0] = 0.0  # Terminal state
+    bootstrap = torch.randn(B)
+    returns = lambda_return(reward, value, pcont, bootstrap, lambda_=0.95, axis=0)
+    expected = _sequential_lambda_return(reward, value, pcont, bootstrap, 0.95)
+    torch.testing.assert_close(returns, expected)
+
+    (grad,) = torch.autograd.grad(returns.sum(), reward)
+    (expected_grad,) = torch.autograd.grad(expected.sum(), reward)
+    torch.testing.assert_close(grad, expected_grad)
+
+
+def test_lambda_return_batch_first():
+    reward, value = torch.randn(B, T), torch.randn(B, T)
+    bootstrap = torch.randn(B)
+    returns = lambda_return(reward, value, 0.99, bootstrap, lambda_=0.95, axis=1)
+    expected = _sequential_lambda_return(
+        reward.T, value.T, 0.99 * torch.ones(T, B), bootstrap, 0.95
+    )
+    torch.testing.assert_close(returns, expected.T)
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_static_scan_nested_outputs(reverse):
+    weight = torch.randn(3, requires_grad=True)
+    inputs = torch.randn(T, B, 3)
+    start = ({"h": torch.zeros(B, 3), "count": torch.zeros(B)}, torch.zeros(B, 3))
+
+    def step(prev, x):
+        # Keys are returned in a different order than in start.
+        h = torch.tanh(prev[0]["h"] * weight + x)
+        return {"count": prev[0]["count"] + 1, "h": h}, x
+
+    states, xs = static_scan(step, (inputs,), start, reverse=reverse)
+    assert list(states.keys()) == ["h", "count"]
+    indices = list(reversed(range(T))) if reverse else list(range(T))
+    h, expected_h = torch.zeros(B, 3), torch.zeros(T, B, 3)
+    for n, t in enumerate(indices):
+        h = torch.tanh(h * weight + inputs[t])
+        expected_h[t] = h
+        assert torch.all(states["count"][t] == n + 1)
+    torch.testing.assert_close(states["h"], expected_h)
+    torch.testing.assert_close(xs, inputs)
+    assert states["h"].requires_grad and not states["count"].requires_grad
@@ -0,0 +1,85 @@
+"""Tests for episode_codec.py."""
+
+import numpy as np
+import pytest
+
+from robobase.replay_buffer.episode_codec import (
+    MAGIC,
+    EpisodeCodec,
+    read_episode,
+    read_raw_chunks,
+)
+
+
+def _episode(length: int = 10) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(0)
+    return {
+        "rgb": rng.integers(0, 255, (length + 1, 3, 84, 84), dtype=np.uint8),
+        "state": rng.random((length + 1, 9), dtype=np.float32),
+        "action": rng.random((length, 1, 2), dtype=np.float32),
+        "reward": np.arange(length, dtype=np.float32),
+        "terminal": np.zeros(length, dtype=np.int8),
+    }
+
+
+def _assert_episodes_equal(expected: dict, actual: dict):
+    assert expected.keys() == actual.keys()
+    for key in expected:
+        np.testing.assert_array_equal(expected[key], actual[key])
+        assert expected[key].dtype == actual[key].dtype
+
+
+@pytest.mark.parametrize("name", ["npz", "zlib", "lz4", "zstd"])
+def test_roundtrip(name, tmp_path):
+    if name == "lz4":
+        pytest.importorskip("lz4")
+    elif name == "zstd":
+        pytest.importorskip("zstandard")
+    episode = _episode()
+    # Small chunks split arrays into several chunks.
+    codec = EpisodeCodec(name, num_threads=2, chunk_size=4096)
+    fn = tmp_path / "episode.npz"
+    codec.write(episode, fn)
+    assert (fn.read_bytes()[: len(MAGIC)] == MAGIC) == (name != "npz")
+    _assert_episodes_equal(episode, read_episode(fn))
+    assert list(tmp_path.iterdir()) == [fn]
+
+
+@pytest.mark.parametrize("name", ["npz", "zlib"])
+def test_read_keys(name, tmp_path):
+    episode = _episode()
+    fn = tmp_path / "episode.npz"
+    EpisodeCodec(name).write(episode, fn)
+    rewards = read_episode(fn, keys=["reward"])
+    assert list(rewards.keys()) == ["reward"]
+    np.testing.assert_array_equal(rewards["reward"], episode["reward"])
+
+
+def test_update_copies_other_arrays(tmp_path):
+    episode = _episode()
+    codec = EpisodeCodec("zlib", chunk_size=4096)
+    fn = tmp_path / "episode.npz"
+    codec.write(episode, fn)
+    _, before = read_raw_chunks(fn)
+    new_rewards = -episode["reward"]
+    codec.update(fn, {"reward": new_rewards})
+    _, after = read_raw_chunks(fn)
+    assert after["rgb"] == before["rgb"]
+    _assert_episodes_equal(dict(episode, reward=new_rewards), read_episode(fn))
+
+
+def test_update_npz_episode(tmp_path):
+    episode = _episode()
+    fn = tmp_path / "episode.npz"
+    EpisodeCodec("npz").write(episode, fn)
+    assert read_raw_chunks(fn) is None
+    new_rewards = -episode["reward"]
+    # Episodes written with another codec are rewritten with this one.
+    EpisodeCodec("zlib").update(fn, {"reward": new_rewards})
+    assert read_raw_chunks(fn)[0] == "zlib"
+    _assert_episodes_equal(dict(episode, reward=new_rewards), read_episode(fn))
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        EpisodeCodec("gzip")
@@ -0,0 +1,125 @@
+"""Tests for feedback_sampler.py."""
+
+import numpy as np
+import pytest
+import torch
+from gymnasium import spaces
+from torch.utils.data import DataLoader
+
+from robobase.replay_buffer.rlhf.feedback_replay_buffer import FeedbackReplayBuffer
+from robobase.replay_buffer.rlhf.feedback_sampler import FeedbackEpochSampler
+from robobase.replay_buffer.uniform_replay_buffer import INDICES
+
+SEQ_LEN = 4
+ACTION_SHAPE = (1, 2)
+BATCH_SIZE = 8
+
+
+def _segment(value: float) -> dict:
+    return {
+        "state": np.full((SEQ_LEN, 3), value, dtype=np.float32),
+        "action": np.full((SEQ_LEN, 2), value, dtype=np.float32),
+    }
+
+
+class TestFeedbackEpochSampler:
+    def setup_method(self, method):
+        self._buffer = FeedbackReplayBuffer(
+            batch_size=BATCH_SIZE,
+            replay_capacity=1000,
+            action_shape=ACTION_SHAPE,
+            observation_elements=spaces.Dict(
+                {"state": spaces.Box(-1, 1, (1, 3), np.float32)}
+            ),
+            transition_seq_len=SEQ_LEN,
+        )
+
+    def teardown_method(self, method):
+        self._buffer.shutdown()
+
+    def _add(self, labels: list[int], feedback_round: int = 0):
+        for label in labels:
+            self._buffer.add_feedback(
+                _segment(label),
+                _segment(-label),
+                np.array([label], dtype=np.int64),
+                feedback_round=feedback_round,
+            )
+
+    def test_epoch_visits_each_pair_once(self):
+        self._add([0, 1] * 10)
+        sampler = FeedbackEpochSampler(BATCH_SIZE, num_streams=2, seed=0)
+        sampler.refresh(self._buffer)
+        assert len(sampler) == 20 and sampler.num_batches == 3
+        indices = [[], []]
+        while sampler.epochs_completed < 1:
+            for stream in range(2):
+                indices[stream].append(next(sampler)[INDICES])
+        for stream_indices in indices:
+            stream_indices = torch.cat(stream_indices).numpy()
+            assert len(stream_indices) == 20
+            assert len(np.unique(stream_indices)) == 20
+
+    def test_batches_match_dataloader(self):
+        self._add([0, 1, -1])
+        sampler = FeedbackEpochSampler(BATCH_SIZE, seed=0)
+        sampler.refresh(self._buffer)
+        batch = next(sampler)
+        expected = next(iter(DataLoader(self._buffer, batch_size=3)))
+        assert batch.keys() == expected.keys()
+        for key in batch:
+            assert batch[key].shape == expected[key].shape
+            assert batch[key].dtype == expected[key].dtype
+        # Segments are loaded with their labels.
+        np.testing.assert_array_equal(
+            batch["seg0_state"][:, 0, 0].numpy(), batch["label"][:, 0].numpy()
+        )
+
+    @pytest.mark.parametrize("stratify", ["label", "round"])
+    def test_stratified_batches(self, stratify):
+        if stratify == "label":
+            # Ties are labelled -1.
+            self._add([0] * 16 + [1] * 8 + [-1] * 8)
+        else:
+            self._add([0] * 16, feedback_round=0)
+            self._add([0] * 8, feedback_round=1)
+            self._add([0] * 8, feedback_round=2)
+        sampler = FeedbackEpochSampler(
+            BATCH_SIZE,
+            stratify_label=stratify == "label",
+            stratify_round=stratify == "round",
+            seed=0,
+        )
+        sampler.refresh(self._buffer)
+        for _ in range(sampler.num_batches):
+            values = next(sampler)[INDICES].numpy() // SEQ_LEN
+            # Pairs 0-15, 16-23 and 24-31 are the three strata.
+            counts = np.bincount(np.digitize(values, [16, 24]), minlength=3)
+            np.testing.assert_array_equal(counts, [4, 2, 2])
+
+    def test_refresh(self):
+        self._add([0] * 4)
+        sampler = FeedbackEpochSampler(BATCH_SIZE, seed=0)
+        sampler.refresh(self._buffer)
+        self._add([1] * 4)
+        sampler.refresh(self._buffer)
+        assert len(sampler) == 8
+        labels = next(sampler)["label"][:, 0]
+        assert sorted(labels.tolist()) == [0] * 4 + [1] * 4
+
+    def test_capacity(self):
+        self._add([0] * 4)
+        self._add([1] * 4)
+        # Each pair holds SEQ_LEN - 1 transitions, so only the newest pairs fit.
+        self._buffer._replay_capacity = 4 * (SEQ_LEN - 1)
+        sampler = FeedbackEpochSampler(BATCH_SIZE, seed=0)
+        sampler.refresh(self._buffer)
+        assert len(sampler) == 4
+        assert next(sampler)["label"][:, 0].tolist() == [1] * 4
+
+    def test_state_dict_keeps_rounds(self):
+        self._add([0], feedback_round=3)
+        state_dict = self._buffer.state_dict()
+        self._buffer._feedback_rounds.clear()
+        self._buffer.load_state_dict(state_dict)
+        assert [r for _, r in self._buffer.stored_feedback()] == [3]
@@ -0,0 +1,66 @@
+"""Tests for transition_index."""
+
+import numpy as np
+
+from robobase.replay_buffer.transition_index import TransitionIndex
+
+
+class TestTransitionIndex:
+    def setup_method(self, method):
+        self._index = TransitionIndex(capacity=100)
+
+    def test_empty(self):
+        keys, transition_idxs = self._index.locate([0, 50])
+        assert keys == [None, None]
+        assert len(self._index) == 0
+
+    def test_locate(self):
+        self._index.add("a", 0, 10)
+        self._index.add("b", 10, 5)
+        keys, transition_idxs = self._index.locate([0, 9, 10, 14, 15])
+        assert keys == ["a", "a", "b", "b", None]
+        np.testing.assert_array_equal(transition_idxs[:4], [0, 9, 0, 4])
+        assert len(self._index) == 15
+
+    def test_wrap_around(self):
+        self._index.add("a", 95, 10)
+        keys, transition_idxs = self._index.locate([94, 95, 99, 0, 4, 5])
+        assert keys == [None, "a", "a", "a", "a", None]
+        np.testing.assert_array_equal(transition_idxs[1:5], [0, 4, 5, 9])
+
+    def test_overwrite_and_remove(self):
+        self._index.add("a", 0, 50)
+        # Overwrites the middle of "a", splitting it in two.
+        self._index.add("b", 120, 10)
+        keys, transition_idxs = self._index.locate([19, 20, 29, 30])
+        assert keys == ["a", "b", "b", "a"]
+        np.testing.assert_array_equal(transition_idxs, [19, 0, 9, 30])
+        self._index.remove("a")
+        keys, _ = self._index.locate([19, 20, 30])
+        assert keys == [None, "b", None]
+        assert "a" not in self._index and "b" in self._index
+
+    def test_matches_dict(self):
+        # Reference: a dict from wrapped global index to (key, transition index).
+        rng = np.random.default_rng(0)
+        expected = {}
+        keys, global_index = [], 0
+        for episode in range(200):
+            length = int(rng.integers(1, 40))
+            self._index.add(episode, global_index, length)
+            for i in range(length):
+                expected[(global_index + i) % 100] = (episode, i)
+            keys.append(episode)
+            global_index += length
+            while len(keys) > 5:
+                evicted = keys.pop(0)
+                self._index.remove(evicted)
+                expected = {k: v for k, v in expected.items() if v[0] != evicted}
+            indices = np.arange(100)
+            located, transition_idxs = self._index.locate(indices)
+            for i, key, transition_idx in zip(indices, located, transition_idxs):
+                if i in expected:
+                    assert (key, transition_idx) == expected[i]
+                else:
+                    assert key is None
+            assert len(self._index) == len(expected)
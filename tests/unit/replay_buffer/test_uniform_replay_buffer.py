@@ -5,7 +5,12 @@ import pytest
 from gymnasium import spaces
 from torch.utils.data import DataLoader
 
-from robobase.replay_buffer.uniform_replay_buffer import UniformReplayBuffer
+from robobase.replay_buffer.replay_buffer import project_observation_space
+from robobase.replay_buffer.uniform_replay_buffer import (
+    EXCLUDED_EPISODES_DIR,
+    UniformReplayBuffer,
+    load_episode,
+)
 
 # Default parameters used when creating the replay self._memory.
 FRAME_STACKS = 4
@@ -221,6 +226,197 @@ class TestUniformReplayBuffer:
         self._memory.add_final({"rgb": self._test_single_obs * (i + 1)})
         assert self._memory.add_count == 20
 
+    def test_state_dict(self, tmp_path):
+        self._memory = UniformReplayBuffer(
+            observation_elements=self._test_single_obs_space,
+            replay_capacity=30,
+            action_shape=ACTION_SHAPE,
+            batch_size=BATCH_SIZE,
+            save_dir=tmp_path / "replay",
+        )
+        episode_length = 5
+        for _ in range(2):
+            for i in range(episode_length):
+                self._memory.add(
+                    {"rgb": self._test_single_obs * i},
+                    self._test_action,
+                    self._test_reward,
+                    self._test_terminal + float(i == (episode_length - 1)),
+                    self._test_truncated,
+                )
+            self._memory.add_final({"rgb": self._test_single_obs * (i + 1)})
+        # Unfinished episode, which is not on disk yet.
+        self._memory.add(
+            {"rgb": self._test_single_obs},
+            self._test_action,
+            self._test_reward,
+            self._test_terminal,
+            self._test_truncated,
+        )
+        state_dict = self._memory.state_dict()
+        assert len(state_dict["episode_files"]) == 2
+        assert state_dict["add_count"] == 10
+
+        # Restore into a buffer that lives in a different directory.
+        memory = UniformReplayBuffer(
+            observation_elements=self._test_single_obs_space,
+            replay_capacity=30,
+            action_shape=ACTION_SHAPE,
+            batch_size=BATCH_SIZE,
+            save_dir=tmp_path / "resumed_replay",
+        )
+        memory.load_state_dict(state_dict)
+        assert memory.add_count == 10
+        assert sorted(
+            f.name for f in (tmp_path / "resumed_replay").glob("*.npz")
+        ) == sorted(state_dict["episode_files"])
+        batch = memory.sample()
+        assert batch["rgb"].shape == (BATCH_SIZE,) + RGB_OBS_SHAPE
+
+    def test_load_state_dict_keeps_unlisted_episodes(self, tmp_path):
+        self._memory = UniformReplayBuffer(
+            observation_elements=self._test_single_obs_space,
+            replay_capacity=30,
+            action_shape=ACTION_SHAPE,
+            batch_size=BATCH_SIZE,
+            save_dir=tmp_path / "replay",
+        )
+        episode_length = 5
+
+        def add_episode():
+            for i in range(episode_length):
+                self._memory.add(
+                    {"rgb": self._test_single_obs * i},
+                    self._test_action,
+                    self._test_reward,
+                    self._test_terminal + float(i == (episode_length - 1)),
+                    self._test_truncated,
+                )
+            self._memory.add_final({"rgb": self._test_single_obs * (i + 1)})
+
+        add_episode()
+        state_dict = self._memory.state_dict()
+        add_episode()
+        unlisted = sorted(
+            f.name
+            for f in (tmp_path / "replay").glob("*.npz")
+            if f.name not in state_dict["episode_files"]
+        )
+        assert len(unlisted) == 1
+
+        self._memory.load_state_dict(state_dict)
+        assert sorted(f.name for f in (tmp_path / "replay").glob("*.npz")) == sorted(
+            state_dict["episode_files"]
+        )
+        excluded_dir = tmp_path / "replay" / EXCLUDED_EPISODES_DIR
+        assert sorted(f.name for f in excluded_dir.glob("*.npz")) == unlisted
+
+    def test_add_episode_matches_add(self, tmp_path):
+        memories = [
+            UniformReplayBuffer(
+                observation_elements=self._test_multi_obs_space,
+                extra_replay_elements=spaces.Dict(
+                    {"extra": spaces.Box(-1, 1, (2,), np.float32)}
+                ),
+                replay_capacity=30,
+                action_shape=ACTION_SHAPE,
+                batch_size=BATCH_SIZE,
+                save_dir=tmp_path / name,
+            )
+            for name in ["add", "add_episode"]
+        ]
+        episode_length = 5
+        observations = {
+            "rgb": np.stack([self._test_single_obs * i for i in range(episode_length)]),
+            "state": np.random.rand(episode_length, *STATE_OBS_SHAPE[1:]).astype(
+                STATE_OBS_DTYPE
+            ),
+        }
+        actions = np.random.rand(episode_length, *ACTION_SHAPE[1:]).astype(np.float32)
+        rewards = np.arange(episode_length, dtype=np.float32)
+        terminals = np.zeros(episode_length, dtype=np.int8)
+        terminals[-1] = 1
+        truncateds = np.zeros(episode_length, dtype=np.int8)
+        extras = np.random.rand(episode_length, 2).astype(np.float32)
+        final_obs = {
+            "rgb": self._test_single_obs * 9,
+            "state": observations["state"][0],
+        }
+        for i in range(episode_length):
+            memories[0].add(
+                {k: v[i] for k, v in observations.items()},
+                actions[i],
+                rewards[i],
+                terminals[i],
+                truncateds[i],
+                extra=extras[i],
+            )
+        memories[0].add_final(final_obs)
+        memories[1].add_episode(
+            observations,
+            actions,
+            rewards,
+            terminals,
+            truncateds,
+            final_obs,
+            extra=extras,
+        )
+        episodes = [
+            load_episode(next((tmp_path / name).glob("*.npz")))
+            for name in ["add", "add_episode"]
+        ]
+        assert memories[0].add_count == memories[1].add_count == episode_length
+        assert episodes[0].keys() == episodes[1].keys()
+        for name in episodes[0]:
+            np.testing.assert_array_equal(episodes[0][name], episodes[1][name])
+            assert episodes[0][name].dtype == episodes[1][name].dtype
+        with pytest.raises(ValueError):
+            # The last transition must end the episode.
+            memories[1].add_episode(
+                observations,
+                actions,
+                rewards,
+                truncateds,
+                truncateds,
+                final_obs,
+                extra=extras,
+            )
+        for memory in memories:
+            memory.shutdown()
+
+    def test_projected_observations(self):
+        self._memory = UniformReplayBuffer(
+            observation_elements=project_observation_space(
+                self._test_multi_obs_space, ["state"]
+            ),
+            replay_capacity=30,
+            action_shape=ACTION_SHAPE,
+            batch_size=BATCH_SIZE,
+        )
+        state = np.ones(STATE_OBS_SHAPE[1:], dtype=STATE_OBS_DTYPE)
+        episode_length = 5
+        for i in range(episode_length):
+            self._memory.add(
+                {"rgb": self._test_single_obs, "state": state * i},
+                self._test_action,
+                self._test_reward,
+                self._test_terminal + float(i == (episode_length - 1)),
+                self._test_truncated,
+            )
+        self._memory.add_final({"rgb": self._test_single_obs, "state": state * i})
+        batch = self._memory.sample()
+        assert "rgb" not in batch
+        assert batch["state"].shape == (BATCH_SIZE,) + STATE_OBS_SHAPE
+        with pytest.raises(ValueError):
+            # Observations the buffer stores can't be missing.
+            self._memory.add(
+                {"rgb": self._test_single_obs},
+                self._test_action,
+                self._test_reward,
+                self._test_terminal,
+                self._test_truncated,
+            )
+
     def test_pytorch_dataloader_multi_worker(self):
         num_workers = 1
         self._memory = UniformReplayBuffer(
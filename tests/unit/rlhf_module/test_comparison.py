@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+import pytest
+
+from robobase.rlhf_module.comparison import (
+    PAIR_SCORES,
+    get_comparison_fn,
+    sample_candidate_pairs,
+    score_pairs,
+)
+from robobase.rlhf_module.iter import _select_query_pairs
+from robobase.rlhf_module.utils.utils import check_valid_pair
+
+
+class FakeRewardModel:
+    def __init__(self, returns: np.ndarray, activated: bool = True):
+        self.returns = returns
+        self.activated = activated
+
+    def get_segment_returns(self, segments):
+        return self.returns
+
+
+def _segments(num_segments: int, num_duplicates: int = 1):
+    # Segment i and i + num_segments // num_duplicates are the same segment.
+    num_unique = num_segments // num_duplicates
+    return {
+        "indices": np.arange(num_segments) % num_unique,
+        "episode_number": np.zeros(num_segments, dtype=int).astype(str),
+    }
+
+
+def test_sample_candidate_pairs():
+    pairs = sample_candidate_pairs(10, 100)
+    assert len(pairs) == 45
+    pairs = sample_candidate_pairs(1000, 5000)
+    assert 0 < len(pairs) <= 5000
+    assert np.all(pairs[:, 0] < pairs[:, 1])
+    assert len(np.unique(pairs, axis=0)) == len(pairs)
+
+
+@pytest.mark.parametrize("score", PAIR_SCORES)
+def test_score_pairs(score):
+    # Members agree that 0 > 1, and disagree on whether 2 > 3.
+    returns = np.array([[2.0, -2.0, 1.0, 0.0], [2.0, -2.0, 0.0, 1.0]])
+    scores = score_pairs(returns, np.array([[0, 1], [2, 3]]), score)
+    assert scores[1] > scores[0]
+
+
+@pytest.mark.parametrize("comparison_type", PAIR_SCORES)
+def test_batched_comparison_selects_valid_top_pairs(comparison_type):
+    num_segments = 2000
+    segments = _segments(num_segments, num_duplicates=2)
+    returns = np.random.randn(5, num_segments)
+    comparison_fn = get_comparison_fn(comparison_type, FakeRewardModel(returns))
+    start = time.time()
+    comparison_fn.initialize(segments)
+    pairs = _select_query_pairs(segments, range(100), comparison_fn)
+    assert time.time() - start < 1.0
+    assert len(set(pairs)) == 100
+    assert all(check_valid_pair(segments, pair) for pair in pairs)
+    scores = score_pairs(returns, np.asarray(pairs), comparison_type)
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_batched_comparison_before_activation():
+    segments = _segments(10)
+    comparison_fn = get_comparison_fn(
+        "disagreement", FakeRewardModel(None, activated=False)
+    )
+    comparison_fn.initialize(segments)
+    assert _select_query_pairs(segments, range(3), comparison_fn) == [
+        (0, 5),
+        (1, 6),
+        (2, 7),
+    ]
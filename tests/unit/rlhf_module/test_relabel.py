@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+import pytest
+
+from robobase.rlhf_module.relabel import RewardRelabeler
+
+
+class FakeRewardModel:
+    def __init__(self, per_step_reward: bool = True):
+        self.per_step_reward = per_step_reward
+        self.batch_lengths = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def compute_reward(self, seq):
+        self.release.wait()
+        self.batch_lengths.append(len(seq["action"]))
+        if np.any(seq["action"] < 0):
+            raise ValueError("invalid action")
+        return dict(seq, reward=10.0 * seq["action"])
+
+
+def _episode(start: int, length: int):
+    return {
+        "action": np.arange(start, start + length),
+        "reward": np.zeros(length, dtype=np.float32),
+    }
+
+
+def test_relabeler_batches_episodes_in_order():
+    reward_model = FakeRewardModel()
+    reward_model.release.clear()
+    relabeler = RewardRelabeler(reward_model, max_batch_episodes=3)
+    # The first episode blocks the worker, so the others queue up and are batched.
+    for i in range(4):
+        relabeler.submit(_episode(100 * i, 5), payload=i)
+    reward_model.release.set()
+    results = relabeler.collect(block=True)
+    relabeler.close()
+    assert [payload for _, payload in results] == [0, 1, 2, 3]
+    for i, (episode, _) in enumerate(results):
+        np.testing.assert_array_equal(
+            episode["reward"], 10.0 * np.arange(100 * i, 100 * i + 5)
+        )
+    assert sum(reward_model.batch_lengths) == 20
+    assert max(reward_model.batch_lengths) > 5
+    assert max(reward_model.batch_lengths) <= 15
+
+
+def test_relabeler_sequence_reward_model_relabels_each_episode():
+    reward_model = FakeRewardModel(per_step_reward=False)
+    relabeler = RewardRelabeler(reward_model)
+    for i in range(3):
+        relabeler.submit(_episode(i, 4))
+    results = relabeler.collect(block=True)
+    relabeler.close()
+    assert reward_model.batch_lengths == [4, 4, 4]
+    for i, (episode, _) in enumerate(results):
+        np.testing.assert_array_equal(episode["reward"], 10.0 * np.arange(i, i + 4))
+
+
+def test_relabeler_error_is_raised():
+    relabeler = RewardRelabeler(FakeRewardModel())
+    relabeler.submit(_episode(-1, 2))
+    with pytest.raises(RuntimeError):
+        relabeler.collect(block=True)
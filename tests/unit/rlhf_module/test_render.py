@@ -0,0 +1,46 @@
+import gymnasium as gym
+import numpy as np
+import torch
+from gymnasium import spaces
+
+from robobase.envs.env import EnvFactory
+from robobase.rlhf_module.render import QUERY_STATE, QueryRenderer
+
+BATCH_SIZE = 6
+SEQ_LEN = 5
+
+
+class _StateEnv(gym.Env):
+    observation_space = spaces.Dict(
+        {QUERY_STATE: spaces.Box(-np.inf, np.inf, (2,), dtype=np.float64)}
+    )
+    action_space = spaces.Box(-1, 1, (1,), dtype=np.float32)
+
+    def reset(self, seed=None, options=None):
+        return {QUERY_STATE: np.zeros(2)}, {}
+
+    def render_sim_state(self, state):
+        return {"pixels": np.full((4, 4, 3), state[0], dtype=np.uint8)}
+
+
+class _StateEnvFactory(EnvFactory):
+    def make_train_env(self, cfg):
+        raise NotImplementedError
+
+    def make_eval_env(self, cfg):
+        return _StateEnv()
+
+
+def test_renders_selected_segments():
+    states = torch.zeros(BATCH_SIZE, SEQ_LEN, 2, dtype=torch.float64)
+    states[..., 0] = torch.arange(BATCH_SIZE * SEQ_LEN).reshape(BATCH_SIZE, SEQ_LEN)
+    renderer = QueryRenderer(_StateEnvFactory(), None, num_workers=2)
+    videos = renderer.render({QUERY_STATE: states}, np.array([4, 1, 4]))
+    renderer.close()
+
+    assert list(videos.keys()) == ["query_pixels_pixels"]
+    assert sorted(videos["query_pixels_pixels"].keys()) == [1, 4]
+    for idx in [1, 4]:
+        video = videos["query_pixels_pixels"][idx]
+        assert video.shape == (SEQ_LEN, 4, 4, 3)
+        np.testing.assert_array_equal(video[:, 0, 0, 0], states[idx, :, 0].numpy())
@@ -0,0 +1,66 @@
+import base64
+import re
+
+import imageio.v3 as iio
+import numpy as np
+import pytest
+import torch
+
+from robobase.rlhf_module.comparison import get_comparison_fn
+from robobase.rlhf_module.iter import collect_human_preferences
+from robobase.rlhf_module.video import encode_html_video
+
+BATCH_SIZE = 6
+SEQ_LEN = 5
+
+
+def _segments():
+    rgb = torch.zeros(BATCH_SIZE, SEQ_LEN, 3, 8, 10, dtype=torch.uint8)
+    rgb += torch.arange(BATCH_SIZE, dtype=torch.uint8).view(-1, 1, 1, 1, 1) * 40
+    return {
+        "rgb_front": rgb,
+        "rgb_wrist": rgb,
+        "action": torch.zeros(BATCH_SIZE, SEQ_LEN, 2),
+        "indices": torch.arange(BATCH_SIZE),
+        "episode_number": np.zeros(BATCH_SIZE, dtype=int).astype(str),
+    }
+
+
+def _decode(html_video: str) -> np.ndarray:
+    src = re.search(r"base64,([^\"]+)", html_video).group(1)
+    return iio.imread(base64.b64decode(src), extension=".mp4")
+
+
+def test_encode_html_video():
+    video = np.zeros((SEQ_LEN, 16, 20, 3), dtype=np.uint8)
+    html_video = encode_html_video(video, width=200)
+    assert html_video.startswith('<video width="200" autoplay muted loop controls>')
+    assert _decode(html_video).shape == video.shape
+
+
+@pytest.mark.parametrize("comparison_type", ["sequential", "root_pairwise"])
+@pytest.mark.parametrize("num_video_workers", [0, 2])
+def test_human_preferences_receive_encoded_videos(comparison_type, num_video_workers):
+    segments = _segments()
+    queried = []
+
+    def feedback_fn(segments, pair, **kwargs):
+        # Cameras are stacked vertically and the pair side by side.
+        frames = _decode(kwargs["html_video"])
+        assert frames.shape == (SEQ_LEN, 16, 20, 3)
+        np.testing.assert_allclose(frames[:, 4, 5, 0], 40 * pair[0], atol=8)
+        np.testing.assert_allclose(frames[:, 4, 15, 0], 40 * pair[1], atol=8)
+        queried.append(kwargs["index"])
+        return 0
+
+    feedbacks, _ = collect_human_preferences(
+        segments,
+        num_queries=3,
+        comparison_fn=get_comparison_fn(comparison_type, None),
+        feedback_fn=feedback_fn,
+        feedback_iter=0,
+        num_prefetch=2,
+        num_video_workers=num_video_workers,
+    )
+    assert queried == [0, 1, 2]
+    assert len(feedbacks) == 3
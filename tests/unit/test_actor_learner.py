@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from robobase.actor_learner import Actor
+
+
+def test_actor_results_are_in_order():
+    actor = Actor(lambda step: step * 2, start_step=3, tolerance=2)
+    actor.start()
+    assert [actor.next() for _ in range(5)] == [6, 8, 10, 12, 14]
+    actor.close()
+
+
+def _recording_step_fn():
+    steps = []
+    lock = threading.Lock()
+
+    def step_fn(step):
+        with lock:
+            steps.append(step)
+        return step
+
+    return steps, step_fn
+
+
+def test_actor_lead_is_bounded():
+    steps, step_fn = _recording_step_fn()
+    actor = Actor(step_fn, tolerance=3)
+    actor.start()
+    time.sleep(0.1)
+    # Until the learner updates, at most `tolerance` steps wait to be consumed.
+    assert len(steps) == 3
+    actor.next()
+    time.sleep(0.1)
+    assert len(steps) == 4
+    actor.close()
+
+
+def test_actor_keeps_update_to_data_ratio():
+    steps, step_fn = _recording_step_fn()
+    actor = Actor(step_fn, updates_per_step=2, tolerance=2)
+    actor.start()
+    time.sleep(0.1)
+    assert len(steps) == 2
+    actor.await_update()
+    actor.updated()
+    time.sleep(0.1)
+    # One update needs half a step. The actor runs up to 2 steps ahead of that.
+    assert len(steps) == 4
+    for _ in range(2):
+        actor.await_update()
+        actor.updated()
+    time.sleep(0.1)
+    assert len(steps) == 5
+    actor.close()
+
+
+def test_learner_waits_for_actor():
+    proceed = threading.Event()
+
+    def step_fn(step):
+        proceed.wait()
+        return step
+
+    actor = Actor(step_fn, updates_per_step=2, tolerance=2)
+    actor.start()
+    num_updates = []
+
+    def learn():
+        for _ in range(10):
+            actor.await_update()
+            actor.updated()
+            num_updates.append(1)
+
+    learner = threading.Thread(target=learn)
+    learner.start()
+    time.sleep(0.1)
+    # Without env steps, the learner runs 2 steps of updates ahead.
+    assert len(num_updates) == 4
+    proceed.set()
+    learner.join()
+    assert len(num_updates) == 10
+    actor.close()
+
+
+def test_actor_paused():
+    actor = Actor(lambda step: step, tolerance=10)
+    with actor.paused():
+        actor.start()
+        time.sleep(0.05)
+        assert len(actor._results) == 0
+    assert actor.next() == 0
+    actor.close()
+
+
+def test_actor_error_is_raised():
+    def step_fn(step):
+        if step == 1:
+            raise ValueError("env failed")
+        return step
+
+    actor = Actor(step_fn, tolerance=2)
+    actor.start()
+    assert actor.next() == 0
+    with pytest.raises(RuntimeError):
+        actor.next()
+    actor.close()
@@ -0,0 +1,63 @@
+import pytest
+import torch
+import torch.nn as nn
+
+from robobase.amp import MixedPrecision
+
+
+def _step(amp: MixedPrecision, model: nn.Module, opt: torch.optim.Optimizer):
+    with amp.autocast():
+        out = model(torch.ones(4, 3))
+    opt.zero_grad()
+    amp.backward(out.float().pow(2).mean())
+    norm = amp.clip_grad_norm_(opt, model.parameters(), 1.0)
+    amp.step(opt)
+    amp.update()
+    return out, norm
+
+
+def test_mixed_precision_on_cpu_uses_bfloat16():
+    amp = MixedPrecision("cpu", "float16")
+    assert amp.enabled
+    assert amp.dtype == torch.bfloat16
+
+    model = nn.Linear(3, 2)
+    opt = torch.optim.SGD(model.parameters(), lr=0.1)
+    prev_weight = model.weight.detach().clone()
+    out, norm = _step(amp, model, opt)
+    assert out.dtype == torch.bfloat16
+    assert torch.isfinite(norm)
+    # Master weights stay in float32.
+    assert model.weight.dtype == torch.float32
+    assert not torch.allclose(model.weight, prev_weight)
+
+
+def test_disabled_mixed_precision():
+    amp = MixedPrecision("cpu")
+    assert not amp.enabled
+    assert amp.dtype == torch.float32
+
+    model = nn.Linear(3, 2)
+    opt = torch.optim.SGD(model.parameters(), lr=0.1)
+    out, _ = _step(amp, model, opt)
+    assert out.dtype == torch.float32
+
+
+def test_unknown_mixed_precision_dtype():
+    with pytest.raises(ValueError, match="Unknown mixed precision dtype"):
+        MixedPrecision("cpu", "float8")
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="Requires CUDA.")
+def test_float16_skips_optimizers_without_gradients():
+    amp = MixedPrecision("cuda", "float16")
+    assert amp.dtype == torch.float16
+    model, unused = nn.Linear(3, 2).cuda(), nn.Linear(3, 2).cuda()
+    opt = torch.optim.SGD(model.parameters(), lr=0.1)
+    unused_opt = torch.optim.SGD(unused.parameters(), lr=0.1)
+    with amp.autocast():
+        loss = model(torch.ones(4, 3, device="cuda")).float().pow(2).mean()
+    amp.backward(loss)
+    amp.step(opt)
+    amp.step(unused_opt)
+    amp.update()
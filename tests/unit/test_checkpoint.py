@@ -0,0 +1,73 @@
+import pytest
+import torch
+from torch import nn
+
+from robobase.checkpoint import (
+    Checkpointer,
+    load_optimizer_state_dicts,
+    optimizer_state_dicts,
+    to_cpu,
+)
+
+
+class _Agent(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.actor = nn.Linear(4, 2)
+        self.actor_opt = torch.optim.Adam(self.actor.parameters(), lr=1e-3)
+
+    def step(self):
+        loss = self.actor(torch.randn(8, 4)).pow(2).mean()
+        self.actor_opt.zero_grad()
+        loss.backward()
+        self.actor_opt.step()
+
+
+def test_to_cpu_does_not_alias():
+    agent = _Agent()
+    state_dict = to_cpu(agent.state_dict())
+    with torch.no_grad():
+        agent.actor.weight.add_(1.0)
+    assert not torch.allclose(state_dict["actor.weight"], agent.actor.weight)
+    # Version metadata of module state dicts is kept.
+    assert hasattr(state_dict, "_metadata")
+
+
+def test_optimizer_state_dicts_roundtrip():
+    agent = _Agent()
+    agent.step()
+    state_dicts = optimizer_state_dicts(agent)
+    assert list(state_dicts.keys()) == ["actor_opt"]
+
+    new_agent = _Agent()
+    load_optimizer_state_dicts(new_agent, to_cpu(state_dicts))
+    exp_avg = agent.actor_opt.state_dict()["state"][0]["exp_avg"]
+    new_exp_avg = new_agent.actor_opt.state_dict()["state"][0]["exp_avg"]
+    assert torch.allclose(exp_avg, new_exp_avg)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_checkpointer_save(tmp_path, asynchronous):
+    checkpointer = Checkpointer(asynchronous=asynchronous)
+    latest = tmp_path / "snapshots" / "latest_snapshot.pt"
+    for step in range(3):
+        checkpointer.save(
+            {"step": step, "weight": torch.full((3,), float(step))},
+            tmp_path / "snapshots" / f"{step}_snapshot.pt",
+            latest,
+        )
+    checkpointer.close()
+
+    for step in range(3):
+        payload = torch.load(tmp_path / "snapshots" / f"{step}_snapshot.pt")
+        assert payload["step"] == step
+    payload = torch.load(latest)
+    assert payload["step"] == 2
+    assert torch.allclose(payload["weight"], torch.full((3,), 2.0))
+    # No temporary files are left behind.
+    assert sorted(p.name for p in (tmp_path / "snapshots").iterdir()) == [
+        "0_snapshot.pt",
+        "1_snapshot.pt",
+        "2_snapshot.pt",
+        "latest_snapshot.pt",
+    ]
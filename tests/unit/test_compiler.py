@@ -0,0 +1,70 @@
+import copy
+
+import torch
+import torch.nn as nn
+
+from robobase.compiler import ModuleCompiler
+
+
+class _GraphBreak(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = nn.Linear(3, 2)
+
+    def forward(self, x):
+        if x.sum().item() > 0:
+            return self.linear(x)
+        return -self.linear(x)
+
+
+def test_compiled_module_matches_eager():
+    compiler = ModuleCompiler()
+    module = nn.Linear(3, 2)
+    keys = list(module.state_dict().keys())
+    x = torch.randn(4, 3)
+    expected = module(x)
+    compiler.compile(module, "linear")
+    for _ in range(2):
+        torch.testing.assert_close(module(x), expected)
+    assert list(module.state_dict().keys()) == keys
+    metrics = compiler.metrics()
+    assert metrics["compiled_signatures"] == 1
+    assert metrics["compile_time"] > 0
+    assert metrics["eager_fallbacks"] == 0
+
+
+def test_new_signatures_run_eagerly_after_max_signatures():
+    compiler = ModuleCompiler(max_signatures=1)
+    module = nn.Linear(3, 2)
+    compiler.compile(module, "linear")
+    module(torch.randn(4, 3))
+    x = torch.randn(5, 3)
+    torch.testing.assert_close(module(x), module.forward._eager(x))
+    metrics = compiler.metrics()
+    assert metrics["compiled_signatures"] == 1
+    assert metrics["eager_fallbacks"] == 1
+
+
+def test_graph_break_falls_back_to_eager():
+    compiler = ModuleCompiler(fullgraph=True)
+    module = _GraphBreak()
+    x = torch.ones(4, 3)
+    expected = module(x)
+    compiler.compile(module, "graph_break")
+    torch.testing.assert_close(module(x), expected)
+    assert compiler.metrics()["eager_fallbacks"] == 1
+    assert compiler.metrics()["compiled_signatures"] == 0
+
+
+def test_copies_of_compiled_modules_use_their_own_parameters():
+    compiler = ModuleCompiler()
+    module = nn.Linear(3, 2)
+    compiler.compile(module, "linear")
+    x = torch.randn(4, 3)
+    module(x)
+    module_copy = copy.deepcopy(module)
+    with torch.no_grad():
+        module_copy.weight.zero_()
+        module_copy.bias.zero_()
+    assert torch.all(module_copy(x) == 0)
+    assert not torch.all(module(x) == 0)
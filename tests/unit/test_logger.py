@@ -0,0 +1,119 @@
+import csv
+
+import pytest
+import torch
+from omegaconf import OmegaConf
+
+from robobase.logger import Logger
+
+
+def _make_cfg(async_logging: bool):
+    return OmegaConf.create(
+        {
+            "save_csv": True,
+            "csv_flush_every": 10,
+            "async_logging": async_logging,
+            "async_logging_queue_size": 4,
+            "rlhf": {"use_rlhf": False},
+            "wandb": {"use": False},
+            "tb": {"use": False},
+        }
+    )
+
+
+def _read_rows(path):
+    with path.open("r") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize("async_logging", [False, True])
+def test_log_metrics_to_csv(tmp_path, async_logging):
+    logger = Logger(tmp_path, _make_cfg(async_logging))
+    for i in range(20):
+        logger.log_metrics(
+            {"iteration": i, "loss": torch.tensor(0.5 * i), "fps": 1.0},
+            i,
+            prefix="train",
+        )
+    logger.close()
+    rows = _read_rows(tmp_path / "train.csv")
+    assert len(rows) == 20
+    assert float(rows[-1]["loss"]) == pytest.approx(9.5)
+
+
+def test_metrics_to_numpy_keeps_dtypes():
+    metrics = {
+        "steps": torch.tensor(2**24 + 1),
+        "loss": torch.tensor(0.5),
+        "done": torch.tensor(True),
+        "values": torch.arange(3),
+    }
+    if torch.cuda.is_available():
+        metrics["grad_norm"] = torch.tensor(1.5, device="cuda")
+    metrics = Logger._metrics_to_numpy(metrics)
+    assert metrics["steps"] == 2**24 + 1 and isinstance(metrics["steps"], int)
+    assert metrics["loss"] == 0.5
+    assert metrics["done"] is True
+    assert metrics["values"].tolist() == [0, 1, 2]
+    if torch.cuda.is_available():
+        assert metrics["grad_norm"] == 1.5
+
+
+def test_async_logging_copies_tensors(tmp_path):
+    logger = Logger(tmp_path, _make_cfg(True))
+    loss = torch.tensor(1.0)
+    values = torch.zeros(2)
+    for i in range(10):
+        logger.log_metrics(
+            {"iteration": i, "loss": loss, "values": values}, i, prefix="train"
+        )
+        # Metrics are written after being updated in place.
+        loss += 1
+        values += 1
+    logger.close()
+    rows = _read_rows(tmp_path / "train.csv")
+    assert [float(row["loss"]) for row in rows] == [1.0 + i for i in range(10)]
+    assert [float(row["values1"]) for row in rows] == list(range(10))
+
+
+def test_resume_truncates_old_entries(tmp_path):
+    logger = Logger(tmp_path, _make_cfg(False))
+    for i in range(10):
+        logger.log_metrics({"iteration": i, "loss": 1.0}, i, prefix="train")
+    logger.close()
+
+    logger = Logger(tmp_path, _make_cfg(False))
+    logger.log_metrics({"iteration": 5, "loss": 2.0}, 5, prefix="train")
+    logger.close()
+    rows = _read_rows(tmp_path / "train.csv")
+    assert [int(float(r["iteration"])) for r in rows] == [0, 1, 2, 3, 4, 5]
+    assert float(rows[-1]["loss"]) == 2.0
+
+
+def test_resume_with_new_columns(tmp_path):
+    logger = Logger(tmp_path, _make_cfg(False))
+    for i in range(4):
+        logger.log_metrics({"iteration": i, "loss": 1.0}, i, prefix="train")
+    logger.close()
+
+    logger = Logger(tmp_path, _make_cfg(False))
+    logger.log_metrics({"iteration": 2, "loss": 2.0, "acc": 0.5}, 2, prefix="train")
+    logger.close()
+    rows = _read_rows(tmp_path / "train.csv")
+    assert len(rows) == 3
+    assert rows[-1]["acc"] == "0.5"
+
+
+@pytest.mark.parametrize("async_logging", [False, True])
+def test_log_profile(tmp_path, async_logging):
+    logger = Logger(tmp_path, _make_cfg(async_logging))
+    for i in range(3):
+        # Without W&B or TensorBoard, histograms are dropped.
+        logger.log_histograms({"update_ms": torch.rand(10)}, i, prefix="profile")
+        logger.log_metrics(
+            {"iteration": i, "update_fraction": 0.5}, i, prefix="profile"
+        )
+    logger.close()
+    rows = _read_rows(tmp_path / "profile.csv")
+    assert len(rows) == 3
+    assert float(rows[-1]["update_fraction"]) == 0.5
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from robobase.profiler import PhaseProfiler
+
+
+def test_phase_profiler_report():
+    profiler = PhaseProfiler(["update", "relabel"])
+    for _ in range(3):
+        with profiler.phase("update"):
+            time.sleep(0.01)
+    batches = profiler.iterator(iter(range(2)), "replay_wait")
+    assert list(batches) == [0, 1]
+
+    metrics, histograms = profiler.report()
+    assert metrics["update_count"] == 3
+    assert metrics["update_ms_mean"] >= 10
+    assert 0 < metrics["update_fraction"] <= 1
+    assert metrics["replay_wait_count"] == 2
+    # Declared phases are reported even if they have not been timed.
+    assert metrics["relabel_count"] == 0
+    assert metrics["relabel_ms_mean"] == 0
+    assert histograms["update_ms"].shape == (3,)
+    assert "relabel_ms" not in histograms
+
+    metrics, _ = profiler.report()
+    assert metrics["update_count"] == 0
+
+
+def test_disabled_phase_profiler():
+    profiler = PhaseProfiler(["update"], enabled=False)
+    with profiler.phase("update"):
+        pass
+    batches = iter(range(2))
+    assert profiler.iterator(batches, "replay_wait") is batches
+    metrics, _ = profiler.report()
+    assert metrics["update_count"] == 0
+
+
+def test_phase_profiler_records_failed_phases():
+    profiler = PhaseProfiler()
+    with pytest.raises(RuntimeError):
+        with profiler.phase("update"):
+            raise RuntimeError
+    metrics, _ = profiler.report()
+    assert metrics["update_count"] == 1
+
+
+def test_torch_profiler_trace(tmp_path):
+    profiler = PhaseProfiler(
+        trace_dir=tmp_path,
+        trace_start_iteration=1,
+        trace_warmup=1,
+        trace_iterations=2,
+    )
+    for i in range(6):
+        profiler.step(i)
+        with profiler.phase("update"):
+            pass
+    profiler.close()
+    assert len(list(tmp_path.glob("*.json"))) == 1
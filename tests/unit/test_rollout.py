@@ -0,0 +1,35 @@
+import numpy as np
+
+from robobase.rollout import EpisodeRollouts
+
+
+def test_episode_rollouts_grow_and_pop():
+    num_envs = 3
+    rollouts = EpisodeRollouts(num_envs, capacity=2)
+    for t in range(5):
+        rollouts.add(
+            {
+                "action": np.full((num_envs, 2), t, dtype=np.float32),
+                "reward": np.arange(num_envs) + 10 * t,
+            }
+        )
+        if t == 1:
+            # Env 1 finishes an episode early, the others outlast the capacity.
+            episode = rollouts.pop(1)
+            np.testing.assert_array_equal(episode["reward"], [1, 11])
+            assert episode["action"].shape == (2, 2)
+            assert episode["action"].dtype == np.float32
+    episode = rollouts.pop(0)
+    np.testing.assert_array_equal(episode["reward"], [0, 10, 20, 30, 40])
+    np.testing.assert_array_equal(episode["action"][:, 0], np.arange(5))
+    np.testing.assert_array_equal(rollouts.pop(1)["reward"], [21, 31, 41])
+    # Popped episodes are copies, so they outlive the next episode.
+    rollouts.add({"action": np.zeros((num_envs, 2)), "reward": np.zeros(num_envs)})
+    np.testing.assert_array_equal(episode["reward"], [0, 10, 20, 30, 40])
+
+
+def test_episode_rollouts_zero_fills_missing_elements():
+    rollouts = EpisodeRollouts(2, capacity=4)
+    rollouts.add({"reward": np.ones(2), "task_reward": np.ones(2)})
+    rollouts.add({"reward": np.ones(2)})
+    np.testing.assert_array_equal(rollouts.pop(0)["task_reward"], [1, 0])
@@ -1 +1,27 @@
 # TODO: Test if workspace does pre-training steps, etc
+import json
+import subprocess
+import sys
+
+# Optional stacks that are imported on first use only.
+OPTIONAL_MODULES = [
+    "diffusers",
+    "google.generativeai",
+    "IPython",
+    "matplotlib",
+    "timm",
+    "wandb",
+]
+
+
+def test_workspace_does_not_import_optional_stacks():
+    code = (
+        "import json, sys\n"
+        "import robobase.workspace, robobase.method.drqv2\n"
+        "import robobase.reward_method.markovian\n"
+        f"print(json.dumps([m for m in {OPTIONAL_MODULES} if m in sys.modules]))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert json.loads(proc.stdout.strip().splitlines()[-1]) == []
@@ -1,7 +1,12 @@
+import numpy as np
 import pytest
 from gymnasium.vector import SyncVectorEnv
 from tests.unit.wrappers.utils import DummyEnv, ACTION_SHAPE
-from robobase.envs.wrappers import ActionSequence, RecedingHorizonControl
+from robobase.envs.wrappers import (
+    ActionSequence,
+    RecedingHorizonControl,
+    TemporalEnsemble,
+)
 
 NUM_ENVS = 2
 SEQ_LEN = 5
@@ -104,3 +109,85 @@ def test_receding_horizon_cant_be_used_with_vec_env():
             execution_length=EXE_LEN,
             temporal_ensemble=True,
         )
+
+
+class _RecordActionEnv(DummyEnv):
+    def __init__(self, episode_len: int):
+        super().__init__(episode_len)
+        self.actions = []
+
+    def step(self, action):
+        self.actions.append(np.array(action))
+        return super().step(action)
+
+
+def _ensemble_with_full_history(sequences, execution_length, gain):
+    # Reference: keeps a [T, T + L, A] history of all predicted sequences.
+    seq_len = sequences.shape[1]
+    history = np.full((len(sequences) * execution_length, seq_len, 2), np.nan)
+    actions = []
+    for i, sequence in enumerate(sequences):
+        start = i * execution_length
+        history[start] = sequence
+        for step in range(start, start + execution_length):
+            predictions = [
+                history[s, step - s]
+                for s in range(max(0, step - seq_len + 1), step + 1)
+                if not np.isnan(history[s, step - s]).any()
+            ]
+            weights = np.exp(-gain * np.arange(len(predictions)))
+            weights /= weights.sum()
+            actions.append((np.stack(predictions) * weights[:, None]).sum(axis=0))
+    return np.stack(actions)
+
+
+@pytest.mark.parametrize("execution_length", [1, 2])
+def test_receding_horizon_temporal_ensemble_matches_full_history(execution_length):
+    num_sequences, gain = 20, 0.1
+    env = _RecordActionEnv(episode_len=num_sequences * execution_length)
+    env = RecedingHorizonControl(
+        env,
+        sequence_length=SEQ_LEN,
+        time_limit=TIME_LIMIT,
+        execution_length=execution_length,
+        temporal_ensemble=True,
+        gain=gain,
+    )
+    sequences = np.random.uniform(-2, 2, (num_sequences, SEQ_LEN) + ACTION_SHAPE)
+    for _ in range(2):
+        # The second episode must not see the predictions of the first.
+        env.reset()
+        env.unwrapped.actions.clear()
+        for sequence in sequences:
+            env.step(sequence.astype(np.float32))
+        np.testing.assert_allclose(
+            np.stack(env.unwrapped.actions),
+            _ensemble_with_full_history(sequences, execution_length, gain),
+            rtol=1e-5,
+            atol=1e-6,
+        )
+
+
+def test_temporal_ensemble_is_batched_across_envs():
+    num_steps, gain = 12, 0.1
+    ensemble = TemporalEnsemble(NUM_ENVS, SEQ_LEN, ACTION_SHAPE[0], gain)
+    sequences = np.random.uniform(-2, 2, (NUM_ENVS, num_steps, SEQ_LEN, 2))
+    actions = np.zeros((NUM_ENVS, num_steps, 2))
+    for t in range(num_steps):
+        if t == 4:
+            # Env 1 starts a new episode.
+            ensemble.reset([1])
+        ensemble.add(sequences[:, t])
+        actions[:, t] = ensemble.step()
+    np.testing.assert_allclose(
+        actions[0],
+        _ensemble_with_full_history(sequences[0], 1, gain),
+        rtol=1e-5,
+        atol=1e-6,
+    )
+    np.testing.assert_allclose(
+        actions[1, 4:],
+        _ensemble_with_full_history(sequences[1, 4:], 1, gain),
+        rtol=1e-5,
+        atol=1e-6,
+    )